@@ -0,0 +1,26 @@
+-- CreateTable
+CREATE TABLE "public"."Normativa" (
+    "id" TEXT NOT NULL,
+    "url" TEXT NOT NULL,
+    "tipo" TEXT NOT NULL,
+    "anio" INTEGER,
+    "numero" TEXT,
+    "fecha" TIMESTAMP(3),
+    "materia" TEXT,
+    "leyesReferidas" TEXT,
+    "sha256" TEXT,
+    "rutaLocal" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "Normativa_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "Normativa_url_key" ON "public"."Normativa"("url");
+
+-- CreateIndex
+CREATE INDEX "Normativa_tipo_anio_numero_idx" ON "public"."Normativa"("tipo", "anio", "numero");
+
+-- CreateIndex
+CREATE INDEX "Normativa_fecha_idx" ON "public"."Normativa"("fecha");
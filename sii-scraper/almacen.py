@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Almacén de documentos direccionado por contenido: cada PDF se guarda una sola vez en data/blobs/ab/cd/<sha256>
+Las carpetas resoluciones/{año}/, circulares/{año}/ y leyes/ son vistas de hardlinks hacia los blobs,
+y el catálogo del manifiesto asocia cada URL de origen (tipo, año, número) a su blob
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import uuid
+
+from escritura import guardar_respuesta, sincronizar_carpeta
+from manifiesto import Manifiesto, clasificar_ruta, sha256_archivo
+
+CARPETA_BLOBS = 'data/blobs'
+CARPETAS_VISTA = ('resoluciones', 'circulares', 'oficios', 'schemas', 'leyes')
+# XSD desempaquetados por esquemas_dte.py desde los ZIP de schemas/: se regeneran, no son documentos descargados
+CARPETAS_GENERADAS = (os.path.join('schemas', 'xsd'),)
+
+
+class AlmacenContenido:
+    def __init__(self, manifiesto=None, carpeta=CARPETA_BLOBS):
+        self.manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        self.carpeta = carpeta
+        self.carpeta_entrantes = os.path.join(carpeta, 'entrantes')
+        os.makedirs(self.carpeta_entrantes, exist_ok=True)
+
+    def ruta_blob(self, sha256):
+        """Ruta del blob: dos niveles de carpetas con los primeros bytes del hash"""
+        return os.path.join(self.carpeta, sha256[:2], sha256[2:4], sha256)
+
+    def existe(self, sha256):
+        return os.path.isfile(self.ruta_blob(sha256))
+
+    def _incorporar(self, ruta, sha256):
+        """Mueve un archivo recién escrito a su blob; si el contenido ya estaba, lo descarta"""
+        destino = self.ruta_blob(sha256)
+        if os.path.exists(destino):
+            os.remove(ruta)
+            return destino
+        carpeta = os.path.dirname(destino)
+        os.makedirs(carpeta, exist_ok=True)
+        os.replace(ruta, destino)
+        sincronizar_carpeta(carpeta)
+        # Los blobs son inmutables: una escritura sobre una vista no debe alterar otras
+        os.chmod(destino, 0o444)
+        return destino
+
+    def guardar_respuesta(self, response, tiempos=None, validar=None):
+        """Guarda el cuerpo de una respuesta `stream=True` como blob; retorna (sha256, bytes)
+
+        `validar(ruta, sha256, bytes)` revisa el temporal antes de incorporarlo: si lanza una excepción,
+        el temporal se descarta y el almacén queda como estaba
+        """
+        entrante = os.path.join(self.carpeta_entrantes, f"{uuid.uuid4().hex}.pdf")
+        sha256, tamaño = guardar_respuesta(response, entrante, tiempos=tiempos)
+        if validar is not None:
+            try:
+                validar(entrante, sha256, tamaño)
+            except BaseException:
+                os.remove(entrante)
+                raise
+        self._incorporar(entrante, sha256)
+        return sha256, tamaño
+
+    def importar(self, ruta, sha256=None):
+        """Incorpora al almacén un archivo que ya está en una vista y lo reemplaza por un hardlink al blob"""
+        sha256 = sha256 or sha256_archivo(ruta)
+        if not self.existe(sha256):
+            entrante = os.path.join(self.carpeta_entrantes, f"{uuid.uuid4().hex}.pdf")
+            try:
+                os.link(ruta, entrante)
+            except OSError:
+                shutil.copyfile(ruta, entrante)
+            self._incorporar(entrante, sha256)
+        self.enlazar(sha256, ruta)
+        return sha256
+
+    def enlazar(self, sha256, ruta_vista):
+        """Publica el blob en la vista por tipo y año (hardlink; copia si el sistema de archivos no los admite)"""
+        blob = self.ruta_blob(sha256)
+        try:
+            if os.path.samefile(blob, ruta_vista):
+                return
+        except OSError:
+            pass
+        carpeta = os.path.dirname(ruta_vista) or '.'
+        os.makedirs(carpeta, exist_ok=True)
+        temporal = os.path.join(carpeta, f".{uuid.uuid4().hex}.enlace")
+        try:
+            os.link(blob, temporal)
+        except OSError:
+            shutil.copyfile(blob, temporal)
+        os.replace(temporal, ruta_vista)
+
+    def ruta_libre(self, ruta_vista, url):
+        """La ruta de la vista, o una variante con sufijo si otra URL ya la ocupa (nombres que colisionan)"""
+        dueño = self.manifiesto.dueño_vista(ruta_vista)
+        if dueño is None or dueño == url:
+            return ruta_vista
+        base, extension = os.path.splitext(ruta_vista)
+        return f"{base}_{uuid.uuid5(uuid.NAMESPACE_URL, url).hex[:8]}{extension}"
+
+    def registrar(self, url, sha256, ruta_vista, numero=None):
+        """Publica el blob en la vista y lo cataloga bajo su URL de origen (tipo y año salen de la ruta)"""
+        self.enlazar(sha256, ruta_vista)
+        tipo, año = clasificar_ruta(ruta_vista)
+        self.manifiesto.catalogar(url, sha256, tipo=tipo, año=año, numero=numero, ruta_vista=ruta_vista)
+
+    def estadisticas(self):
+        """Blobs, bytes almacenados y bytes que ocuparían las vistas sin deduplicar"""
+        blobs = 0
+        bytes_blobs = 0
+        for raiz, carpetas, archivos in os.walk(self.carpeta):
+            if raiz == self.carpeta and 'entrantes' in carpetas:
+                carpetas.remove('entrantes')
+            for archivo in archivos:
+                blobs += 1
+                bytes_blobs += os.path.getsize(os.path.join(raiz, archivo))
+        catalogo = self.manifiesto.catalogados()
+        bytes_catalogados = 0
+        for entrada in catalogo:
+            blob = self.ruta_blob(entrada['sha256'])
+            if os.path.exists(blob):
+                bytes_catalogados += os.path.getsize(blob)
+        return {'blobs': blobs, 'bytes': bytes_blobs, 'urls': len(catalogo),
+                'bytes_sin_deduplicar': bytes_catalogados,
+                'bytes_ahorrados': max(0, bytes_catalogados - bytes_blobs)}
+
+
+def migrar(almacen, carpetas=CARPETAS_VISTA):
+    """Pasa al almacén los archivos descargados con el esquema anterior, catalogando los que están en el manifiesto"""
+    urls_por_ruta = {os.path.normpath(e['ruta_local']): e['url']
+                     for e in almacen.manifiesto.entradas() if e['ruta_local']}
+    migrados = 0
+    for carpeta in carpetas:
+        for raiz, subcarpetas, archivos in os.walk(carpeta):
+            subcarpetas[:] = [c for c in subcarpetas
+                                 if os.path.normpath(os.path.join(raiz, c)) not in CARPETAS_GENERADAS]
+            for archivo in archivos:
+                if archivo.startswith('.'):
+                    continue
+                ruta = os.path.join(raiz, archivo)
+                sha256 = almacen.importar(ruta)
+                url = urls_por_ruta.get(os.path.normpath(ruta))
+                if url:
+                    almacen.registrar(url, sha256, ruta)
+                migrados += 1
+    return migrados
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Almacén de documentos direccionado por contenido")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('migrar', help="Incorporar al almacén los documentos ya descargados")
+    subparsers.add_parser('estado', help="Blobs almacenados y espacio ahorrado por deduplicación")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    almacen = AlmacenContenido()
+
+    if args.comando == 'migrar':
+        print(f"✅ {migrar(almacen)} archivos incorporados al almacén")
+    estado = almacen.estadisticas()
+    print(f"📦 Blobs: {estado['blobs']} ({estado['bytes'] / 1024 / 1024:.1f} MiB)  "
+          f"🔗 URLs catalogadas: {estado['urls']}  "
+          f"💾 Ahorro por deduplicación: {estado['bytes_ahorrados'] / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
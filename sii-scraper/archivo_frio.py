@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Archivo frío: empaqueta cada (tipo, año) en un solo archivo zstd con diccionario entrenado e índice de acceso directo
+Cada documento es un frame independiente, así que leer uno cuesta una búsqueda en la tabla hash del índice y
+una descompresión, sin recorrer el paquete; los años que ya no cambian se mueven al paquete automáticamente
+"""
+
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import zstandard as zstd
+
+from almacen import AlmacenContenido
+from escritura import escribir_atomico
+from manifiesto import Manifiesto
+
+CARPETA_ARCHIVO = 'data/archivo'
+
+# Pie: magia, documentos, ranuras de la tabla hash, bytes del diccionario, offset del índice
+MAGIA = b'SIIPACK1'
+PIE = struct.Struct('<8sIIIQ')
+# Ranura: sha256, offset del frame, bytes comprimidos, bytes originales
+RANURA = struct.Struct('<32sQII')
+RANURA_VACIA = b'\0' * RANURA.size
+
+NIVEL = 19
+TAMAÑO_DICCIONARIO = 112 * 1024
+# Las muestras de entrenamiento son el comienzo de cada documento, donde se repiten encabezados y fórmulas
+BYTES_MUESTRA = 128 * 1024
+# zstd recomienda unas 100 veces el tamaño del diccionario en muestras; más solo ocupa memoria
+MAX_BYTES_MUESTRAS = 100 * TAMAÑO_DICCIONARIO
+MIN_MUESTRAS = 8
+AÑOS_CALIENTES = 2
+
+
+def nombre_paquete(tipo, año):
+    return f"{tipo}_{año}.pack"
+
+
+def entrenar_diccionario(muestras, tamaño=TAMAÑO_DICCIONARIO):
+    """Diccionario zstd para un grupo de documentos, o None si hay pocos o el entrenamiento falla"""
+    muestras = [m[:BYTES_MUESTRA] for m in muestras if m]
+    if len(muestras) < MIN_MUESTRAS:
+        return None
+    try:
+        return zstd.train_dictionary(min(tamaño, sum(len(m) for m in muestras) // 10 or 1), muestras)
+    except zstd.ZstdError as e:
+        logging.warning(f"No se pudo entrenar el diccionario: {str(e)}")
+        return None
+
+
+def _ranura(sha, mascara):
+    return int.from_bytes(sha[:8], 'little') & mascara
+
+
+def escribir_paquete(hashes, leer, ruta, nivel=NIVEL):
+    """Escribe un paquete con los documentos `hashes`, leídos de a uno con `leer(sha256)`; retorna
+    (bytes originales, bytes del paquete)
+
+    Formato: [diccionario][un frame zstd por documento][tabla hash de ranuras][pie]
+    Solo el comienzo de cada documento (las muestras del diccionario) y un documento a la vez pasan por memoria
+    """
+    hashes = list(hashes)
+    muestras = []
+    bytes_muestras = 0
+    for sha256 in hashes:
+        if bytes_muestras >= MAX_BYTES_MUESTRAS:
+            break
+        muestra = leer(sha256)[:BYTES_MUESTRA]
+        muestras.append(muestra)
+        bytes_muestras += len(muestra)
+    diccionario = entrenar_diccionario(muestras)
+    del muestras
+    datos_diccionario = diccionario.as_bytes() if diccionario else b''
+    compresor = zstd.ZstdCompressor(level=nivel, dict_data=diccionario, write_checksum=True)
+
+    ranuras = 1
+    while ranuras < 2 * len(hashes):
+        ranuras *= 2
+    tabla = bytearray(RANURA_VACIA * ranuras)
+    mascara = ranuras - 1
+    totales = {'originales': 0, 'paquete': 0}
+
+    def bloques():
+        offset = len(datos_diccionario)
+        yield datos_diccionario
+        for sha256 in hashes:
+            contenido = leer(sha256)
+            frame = compresor.compress(contenido)
+            sha = bytes.fromhex(sha256)
+            # Sondeo lineal: con la tabla a lo más a la mitad, una búsqueda toca una o dos ranuras
+            posicion = _ranura(sha, mascara)
+            while tabla[posicion * RANURA.size:(posicion + 1) * RANURA.size] != RANURA_VACIA:
+                posicion = (posicion + 1) & mascara
+            RANURA.pack_into(tabla, posicion * RANURA.size, sha, offset, len(frame), len(contenido))
+            offset += len(frame)
+            totales['originales'] += len(contenido)
+            yield frame
+        yield bytes(tabla)
+        yield PIE.pack(MAGIA, len(hashes), ranuras, len(datos_diccionario), offset)
+        totales['paquete'] = offset + len(tabla) + PIE.size
+
+    escribir_atomico(bloques(), ruta)
+    return totales['originales'], totales['paquete']
+
+
+class LectorPaquete:
+    """Lectura directa de documentos de un paquete sobre un mapa de memoria (segura entre hilos)"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            self.mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, self.documentos, self.ranuras, largo_diccionario, self.offset_indice = \
+            PIE.unpack_from(self.mapa, len(self.mapa) - PIE.size)
+        if magia != MAGIA:
+            self.mapa.close()
+            raise ValueError(f"{ruta} no es un paquete del archivo frío")
+        self.mascara = self.ranuras - 1
+        self.diccionario = (zstd.ZstdCompressionDict(self.mapa[:largo_diccionario])
+                            if largo_diccionario else None)
+        # Los descompresores de zstandard no se comparten entre hilos
+        self.local = threading.local()
+
+    def _descompresor(self):
+        if not hasattr(self.local, 'descompresor'):
+            self.local.descompresor = zstd.ZstdDecompressor(dict_data=self.diccionario)
+        return self.local.descompresor
+
+    def _buscar(self, sha256):
+        sha = bytes.fromhex(sha256)
+        posicion = _ranura(sha, self.mascara)
+        for _ in range(self.ranuras):
+            ranura = RANURA.unpack_from(self.mapa, self.offset_indice + posicion * RANURA.size)
+            # La vacía primero: su hash en ceros no debe confundirse con un documento
+            if ranura[0] == RANURA_VACIA[:32]:
+                return None
+            if ranura[0] == sha:
+                return ranura
+            posicion = (posicion + 1) & self.mascara
+        return None
+
+    def __contains__(self, sha256):
+        return self._buscar(sha256) is not None
+
+    def __len__(self):
+        return self.documentos
+
+    def hashes(self):
+        """Contenidos del paquete, en el orden de la tabla"""
+        for posicion in range(self.ranuras):
+            sha = self.mapa[self.offset_indice + posicion * RANURA.size:][:32]
+            if sha != RANURA_VACIA[:32]:
+                yield sha.hex()
+
+    def leer(self, sha256):
+        """Contenido de un documento; KeyError si no está en el paquete"""
+        ranura = self._buscar(sha256)
+        if ranura is None:
+            raise KeyError(sha256)
+        _, offset, comprimidos, originales = ranura
+        return self._descompresor().decompress(self.mapa[offset:offset + comprimidos], max_output_size=originales)
+
+    def cerrar(self):
+        self.mapa.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+class ArchivoFrio:
+    def __init__(self, manifiesto=None, almacen=None, carpeta=CARPETA_ARCHIVO, nivel=NIVEL):
+        self.manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        self.almacen = almacen if almacen is not None else AlmacenContenido(self.manifiesto)
+        self.carpeta = carpeta
+        self.nivel = nivel
+        os.makedirs(carpeta, exist_ok=True)
+        self.lectores = {}
+        self.lock = threading.Lock()
+
+    def ruta_paquete(self, paquete):
+        return os.path.join(self.carpeta, paquete)
+
+    def lector(self, paquete):
+        """Lector abierto (y reutilizado) de un paquete"""
+        with self.lock:
+            if paquete not in self.lectores:
+                self.lectores[paquete] = LectorPaquete(self.ruta_paquete(paquete))
+            return self.lectores[paquete]
+
+    def _olvidar(self, paquete):
+        with self.lock:
+            lector = self.lectores.pop(paquete, None)
+        if lector is not None:
+            lector.cerrar()
+
+    def leer(self, sha256):
+        """Contenido de un documento: desde su blob si sigue suelto, si no desde su paquete"""
+        try:
+            with open(self.almacen.ruta_blob(sha256), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        paquete = self.manifiesto.paquete_de(sha256)
+        if paquete is None:
+            raise KeyError(sha256)
+        return self.lector(paquete).leer(sha256)
+
+    @contextmanager
+    def ruta_legible(self, sha256, ruta=None):
+        """Ruta de un archivo con el contenido de un documento, para herramientas que leen de disco (pdfplumber,
+        pdftoppm): su vista o su blob si siguen sueltos; si no, un temporal extraído del paquete que se borra al salir
+        """
+        for candidata in (ruta, self.almacen.ruta_blob(sha256)):
+            if candidata and os.path.exists(candidata):
+                yield candidata
+                return
+        extension = os.path.splitext(ruta)[1] if ruta else '.pdf'
+        fd, temporal = tempfile.mkstemp(dir=self.almacen.carpeta_entrantes, prefix='.frio_', suffix=extension)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.leer(sha256))
+            yield temporal
+        finally:
+            os.remove(temporal)
+
+    def años_empaquetables(self, años_calientes=AÑOS_CALIENTES):
+        """(tipo, año) del catálogo anteriores a los `años_calientes` más recientes"""
+        limite = datetime.now().year - años_calientes
+        grupos = {(e['tipo'], e['año']) for e in self.manifiesto.catalogados() if e['tipo'] and e['año']}
+        return sorted((tipo, año) for tipo, año in grupos if año <= limite)
+
+    def empaquetar(self, tipo, año):
+        """Crea o rehace el paquete de un (tipo, año); no hace nada si su contenido no cambió"""
+        paquete = nombre_paquete(tipo, año)
+        ruta = self.ruta_paquete(paquete)
+        hashes = sorted({e['sha256'] for e in self.manifiesto.catalogados(tipo=tipo, año=año)})
+        resultado = {'paquete': paquete, 'documentos': len(hashes), 'reconstruido': False}
+        if not hashes:
+            return resultado
+        if os.path.exists(ruta) and self.manifiesto.empaquetados(paquete) == set(hashes):
+            resultado['bytes_paquete'] = os.path.getsize(ruta)
+            return resultado
+
+        # Los ya archivados salen del paquete anterior (sigue abierto hasta _olvidar); los nuevos, de sus blobs
+        originales, bytes_paquete = escribir_paquete(hashes, self.leer, ruta, self.nivel)
+        self._olvidar(paquete)
+
+        # Nada se borra sin comprobar que el paquete nuevo devuelve cada documento intacto
+        lector = self.lector(paquete)
+        for sha256 in hashes:
+            if hashlib.sha256(lector.leer(sha256)).hexdigest() != sha256:
+                raise RuntimeError(f"El paquete {paquete} no reproduce {sha256}")
+        self.manifiesto.registrar_paquete(paquete, hashes)
+        resultado.update({'reconstruido': True, 'bytes_originales': originales, 'bytes_paquete': bytes_paquete})
+        logging.info(f"Paquete {paquete}: {len(hashes)} documentos, {originales} → {bytes_paquete} bytes")
+        return resultado
+
+    def procesamiento_pendiente(self, entrada):
+        """True si un PDF del catálogo aún no tiene texto extraído o tiene páginas esperando OCR"""
+        if not (entrada['ruta_vista'] or '').lower().endswith('.pdf'):
+            return False
+        extraccion = self.manifiesto.extraccion(entrada['sha256'])
+        if extraccion is None:
+            return True
+        from extraccion_texto import cargar_texto
+        from ocr import paginas_sin_texto
+
+        try:
+            return bool(paginas_sin_texto(cargar_texto(extraccion['ruta_texto'])))
+        except (OSError, ValueError):
+            return True
+
+    def liberar(self, tipo, año):
+        """Quita las vistas y los blobs de un (tipo, año) ya empaquetado; retorna los bytes liberados
+
+        Los documentos con extracción u OCR pendiente se quedan sueltos hasta una pasada posterior
+        """
+        paquete = nombre_paquete(tipo, año)
+        empaquetados = self.manifiesto.empaquetados(paquete)
+        liberados = 0
+        retenidos = 0
+        for entrada in self.manifiesto.catalogados(tipo=tipo, año=año):
+            if entrada['sha256'] not in empaquetados:
+                continue
+            if self.procesamiento_pendiente(entrada):
+                retenidos += 1
+                continue
+            if entrada['ruta_vista'] and os.path.exists(entrada['ruta_vista']):
+                os.remove(entrada['ruta_vista'])
+            # Un blob compartido con otro (tipo, año) todavía caliente se queda suelto
+            blob = self.almacen.ruta_blob(entrada['sha256'])
+            if os.path.exists(blob) and all((e['tipo'], e['año']) == (tipo, año)
+                                            for e in self.manifiesto.catalogados(sha256=entrada['sha256'])):
+                liberados += os.path.getsize(blob)
+                os.remove(blob)
+        if retenidos:
+            logging.info(f"{paquete}: {retenidos} documentos quedan sueltos con extracción u OCR pendiente")
+        return liberados
+
+    def empaquetar_frios(self, años_calientes=AÑOS_CALIENTES):
+        """Mueve al archivo frío todos los (tipo, año) anteriores a los años calientes"""
+        resultados = []
+        for tipo, año in self.años_empaquetables(años_calientes):
+            resultado = self.empaquetar(tipo, año)
+            resultado['bytes_liberados'] = self.liberar(tipo, año)
+            resultados.append(resultado)
+        return resultados
+
+    def restaurar(self, tipo, año):
+        """Vuelve a publicar como archivos sueltos (blob y vista) los documentos de un paquete"""
+        restaurados = 0
+        for entrada in self.manifiesto.catalogados(tipo=tipo, año=año):
+            if not self.almacen.existe(entrada['sha256']):
+                temporal = os.path.join(self.almacen.carpeta_entrantes, f"{entrada['sha256']}.pdf")
+                escribir_atomico([self.leer(entrada['sha256'])], temporal)
+                self.almacen._incorporar(temporal, entrada['sha256'])
+            if entrada['ruta_vista']:
+                self.almacen.enlazar(entrada['sha256'], entrada['ruta_vista'])
+            restaurados += 1
+        return restaurados
+
+    def estadisticas(self):
+        """Documentos y tamaño de cada paquete"""
+        estado = []
+        for archivo in sorted(os.listdir(self.carpeta)):
+            if archivo.endswith('.pack'):
+                ruta = self.ruta_paquete(archivo)
+                estado.append({'paquete': archivo, 'documentos': len(self.lector(archivo)),
+                               'bytes': os.path.getsize(ruta)})
+        return estado
+
+    def cerrar(self):
+        with self.lock:
+            for lector in self.lectores.values():
+                lector.cerrar()
+            self.lectores.clear()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Archivo frío de normativa: paquetes zstd por tipo y año")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    frios_parser = subparsers.add_parser('frios', help="Empaquetar y liberar los años fríos")
+    frios_parser.add_argument('--años-calientes', type=int, default=AÑOS_CALIENTES,
+                              help="Años recientes que se mantienen como archivos sueltos (por defecto: 2)")
+    for comando, ayuda in (('empaquetar', "Empaquetar un tipo y año sin quitar sus archivos"),
+                           ('restaurar', "Volver a publicar los archivos sueltos de un paquete")):
+        subparser = subparsers.add_parser(comando, help=ayuda)
+        subparser.add_argument('tipo', help="resoluciones, circulares, ...")
+        subparser.add_argument('año', type=int)
+    leer_parser = subparsers.add_parser('leer', help="Escribir un documento archivado en un archivo")
+    leer_parser.add_argument('sha256')
+    leer_parser.add_argument('destino')
+    subparsers.add_parser('estado', help="Paquetes y su tamaño")
+    parser.add_argument('--nivel', type=int, default=NIVEL, help="Nivel de compresión zstd (por defecto: 19)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    archivo = ArchivoFrio(nivel=args.nivel)
+
+    if args.comando == 'frios':
+        for r in archivo.empaquetar_frios(args.años_calientes):
+            print(f"🧊 {r['paquete']}: {r['documentos']} documentos, "
+                  f"{r.get('bytes_paquete', 0) / 1024 / 1024:.1f} MiB, "
+                  f"{r['bytes_liberados'] / 1024 / 1024:.1f} MiB liberados")
+    elif args.comando == 'empaquetar':
+        r = archivo.empaquetar(args.tipo, args.año)
+        print(f"🧊 {r['paquete']}: {r['documentos']} documentos"
+              f"{'' if r['reconstruido'] else ' (sin cambios)'}")
+    elif args.comando == 'restaurar':
+        print(f"♻️  {archivo.restaurar(args.tipo, args.año)} documentos restaurados")
+    elif args.comando == 'leer':
+        escribir_atomico([archivo.leer(args.sha256)], args.destino)
+        print(f"📄 {args.destino}")
+    else:
+        for p in archivo.estadisticas():
+            print(f"{p['paquete']:28} {p['documentos']:6} documentos  {p['bytes'] / 1024 / 1024:8.1f} MiB")
+    archivo.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark del descubrimiento de enlaces en las páginas índice del SII
+Compara por página el parseo anterior (BeautifulSoup html.parser + dedup cuadrático) con extraer_enlaces (lxml)
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from manifiesto import Manifiesto
+from sii_scraper import SIIScraper
+
+
+def extraer_enlaces_anterior(html, url_indice, base_url='https://www.sii.cl'):
+    """Implementación previa, conservada solo como referencia del benchmark"""
+    soup = BeautifulSoup(html, 'html.parser')
+    enlaces = []
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        texto = link.get_text(strip=True)
+        if any(ext in href.lower() for ext in ['.pdf', '.doc', '.docx']) or \
+           any(keyword in href.lower() for keyword in ['resolucion', 'circular', 'oficio', 'res_', 'cir_']):
+            if href.startswith('/'):
+                url_completa = urljoin(base_url, href)
+            elif href.startswith('http'):
+                url_completa = href
+            else:
+                url_completa = urljoin(url_indice, href)
+            if url_completa not in [e['url'] for e in enlaces] and texto:
+                enlaces.append({'url': url_completa, 'texto': texto, 'href_original': href})
+    return enlaces
+
+
+def indice_sintetico(filas):
+    """Índice con la estructura de res_indAAAA.htm: una tabla con número, fecha, materia y enlace por fila"""
+    cuerpo = ''.join(
+        f'<tr><td><a href="reso{n}.pdf">Resolución Ex. SII N° {n}</a></td><td>{n % 28 + 1:02d}/01/2024</td>'
+        f'<td><font size="2">Materia de la resolución {n}, modifica '
+        f'<a href="../2023/reso{n}.pdf#anexo">Res. {n} de 2023</a></font></td></tr>\n'
+        for n in range(1, filas + 1)
+    )
+    return (f'<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1">'
+            f'</head><body><table>{cuerpo}</table></body></html>').encode('latin-1')
+
+
+def paginas_en_cache(manifiesto):
+    """(url, html) de las páginas índice guardadas por la caché HTTP en ejecuciones anteriores"""
+    paginas = []
+    for entrada in manifiesto.entradas():
+        url = entrada['url']
+        if entrada['ruta_cache'] and ('res_ind' in url or 'indcir' in url) and os.path.exists(entrada['ruta_cache']):
+            with open(entrada['ruta_cache'], 'rb') as f:
+                paginas.append((url, f.read()))
+    return paginas
+
+
+def medir(funcion, html, url, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        enlaces = funcion(html, url)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), len(enlaces)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Tiempo de parseo por página índice del SII")
+    parser.add_argument('archivos', nargs='*', help="Páginas índice guardadas (por defecto: las de data/cache)")
+    parser.add_argument('--url', default='https://www.sii.cl/normativa_legislacion/resoluciones/2024/res_ind2024.htm',
+                        help="URL con la que se resuelven los enlaces relativos de los archivos indicados")
+    parser.add_argument('--filas', type=int, default=2000, help="Filas del índice sintético si no hay páginas reales")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.archivos:
+        paginas = []
+        for ruta in args.archivos:
+            with open(ruta, 'rb') as f:
+                paginas.append((args.url, f.read()))
+    else:
+        paginas = paginas_en_cache(Manifiesto())
+        if not paginas:
+            print(f"Sin índices en data/cache; se usa un índice sintético de {args.filas} filas")
+            paginas = [(args.url, indice_sintetico(args.filas))]
+
+    scraper = SIIScraper.__new__(SIIScraper)
+    nueva = lambda html, url: scraper.extraer_enlaces(html, url, 'benchmark')
+
+    print(f"{'página':60} {'KiB':>7} {'enlaces':>8} {'anterior ms':>12} {'lxml ms':>9} {'x':>6}")
+    totales = [0.0, 0.0]
+    for url, html in paginas:
+        ms_anterior, _ = medir(extraer_enlaces_anterior, html, url, args.repeticiones)
+        ms_nueva, cantidad = medir(nueva, html, url, args.repeticiones)
+        totales[0] += ms_anterior
+        totales[1] += ms_nueva
+        print(f"{url[-60:]:60} {len(html) / 1024:7.1f} {cantidad:8d} {ms_anterior:12.2f} {ms_nueva:9.2f} "
+              f"{ms_anterior / ms_nueva:6.1f}")
+    print(f"\nTotal {len(paginas)} páginas: anterior {totales[0]:.1f} ms, lxml {totales[1]:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Benchmark de rastreo de punta a punta contra un sii.cl / LeyChile simulado en local
+Ejecuta SIIScraper y LeyChileScraper reales y reporta documentos/s, bytes/s, latencia p50/p99 por documento
+y pico de memoria (RSS), para detectar regresiones en las etapas de descarga, parseo y escritura
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+DIRECTORIO_SCRAPER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORIO_SCRAPER)
+
+from leychile_scraper import LeyChileScraper
+from manifiesto import Manifiesto
+from nucleo_scraper import cargar_configuracion
+from servidor_simulado import HOST_LEYCHILE, HOST_SII, ServidorSimulado
+from sii_scraper import SIIScraper
+
+CARPETAS_FUENTE = {
+    'sii': ('resoluciones', 'circulares', 'oficios', 'schemas'),
+    'leyes': ('leyes',)
+}
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (valores sin ordenar)"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def pico_rss_mib():
+    """Máximo de memoria residente del proceso hasta ahora (ru_maxrss está en KiB en Linux y en bytes en macOS)"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def bytes_en(carpetas):
+    total = 0
+    for carpeta in carpetas:
+        for raiz, _, archivos in os.walk(carpeta):
+            total += sum(os.path.getsize(os.path.join(raiz, a)) for a in archivos)
+    return total
+
+
+def paginas_grabadas(ruta_manifiesto):
+    """Páginas índice guardadas por la caché HTTP en rastreos reales, por URL"""
+    if not os.path.exists(ruta_manifiesto):
+        return {}
+    manifiesto = Manifiesto(ruta_manifiesto)
+    paginas = {}
+    for entrada in manifiesto.entradas():
+        ruta_cache = entrada['ruta_cache']
+        if ruta_cache and not os.path.isabs(ruta_cache):
+            ruta_cache = os.path.join(os.path.dirname(os.path.dirname(ruta_manifiesto)), ruta_cache)
+        if ruta_cache and os.path.exists(ruta_cache) and entrada['url'].startswith((HOST_SII, HOST_LEYCHILE)):
+            with open(ruta_cache, 'rb') as f:
+                paginas[entrada['url']] = f.read()
+    manifiesto.cerrar()
+    return paginas
+
+
+def _servir(puerto, opciones):
+    ServidorSimulado(puerto=puerto, **opciones).servir()
+
+
+def iniciar_servidor(opciones):
+    """Levanta el servidor en otro proceso para que no cuente en la memoria ni en la CPU del rastreo"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        puerto = s.getsockname()[1]
+    proceso = multiprocessing.Process(target=_servir, args=(puerto, opciones), daemon=True)
+    proceso.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=0.1).close()
+            return proceso, f"http://127.0.0.1:{puerto}"
+        except OSError:
+            time.sleep(0.05)
+    proceso.terminate()
+    raise RuntimeError("El servidor simulado no respondió")
+
+
+def cronometrar(metodo, latencias, lock):
+    """Envuelve el método de descarga de un documento para registrar su latencia y resultado"""
+    def envuelto(*args, **kwargs):
+        inicio = time.perf_counter()
+        exito = metodo(*args, **kwargs)
+        with lock:
+            latencias.append((time.perf_counter() - inicio, exito))
+        return exito
+    return envuelto
+
+
+def crear_fuente(nombre, url_servidor, años, args, configuracion, manifiesto):
+    if nombre == 'sii':
+        scraper = SIIScraper(max_workers=args.workers, solicitudes_por_segundo=args.solicitudes_por_segundo,
+                             manifiesto=manifiesto, años=años, configuracion=configuracion)
+        scraper.base_url = url_servidor
+        scraper.urls_base = {tipo: url.replace(HOST_SII, url_servidor) for tipo, url in scraper.urls_base.items()}
+        return scraper, 'descargar_documento'
+    scraper = LeyChileScraper(max_workers=args.workers, solicitudes_por_segundo=args.solicitudes_por_segundo,
+                              manifiesto=manifiesto, configuracion=configuracion)
+    scraper.base_url = url_servidor
+    for ley in scraper.leyes_tributarias.values():
+        ley['url'] = ley['url'].replace(HOST_LEYCHILE, url_servidor)
+    return scraper, 'descargar_pdf_ley'
+
+
+def medir_fuente(nombre, url_servidor, años, args, configuracion):
+    manifiesto = Manifiesto()
+    scraper, metodo = crear_fuente(nombre, url_servidor, años, args, configuracion, manifiesto)
+    latencias = []
+    setattr(scraper, metodo, cronometrar(getattr(scraper, metodo), latencias, threading.Lock()))
+
+    inicio = time.perf_counter()
+    scraper.ejecutar()
+    segundos = time.perf_counter() - inicio
+    manifiesto.cerrar()
+
+    exitosos = sum(1 for _, exito in latencias if exito)
+    total_bytes = bytes_en(CARPETAS_FUENTE[nombre])
+    milisegundos = [s * 1000 for s, _ in latencias]
+    return {
+        'fuente': nombre,
+        'documentos': len(latencias),
+        'exitosos': exitosos,
+        'fallidos': len(latencias) - exitosos,
+        'segundos': round(segundos, 3),
+        'documentos_por_segundo': round(exitosos / segundos, 2) if segundos else None,
+        'bytes': total_bytes,
+        'bytes_por_segundo': round(total_bytes / segundos) if segundos else None,
+        'latencia_p50_ms': round(percentil(milisegundos, 50), 1) if milisegundos else None,
+        'latencia_p99_ms': round(percentil(milisegundos, 99), 1) if milisegundos else None,
+        'pico_rss_mib': pico_rss_mib(),
+        'metricas': scraper.metricas.resumen()
+    }
+
+
+def años_del_corpus(corpus):
+    años = set()
+    for tipo in ('resoluciones', 'circulares'):
+        carpeta = os.path.join(corpus, tipo)
+        if os.path.isdir(carpeta):
+            años.update(int(a) for a in os.listdir(carpeta) if a.isdigit())
+    return sorted(años)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de rastreo contra un SII / LeyChile simulado")
+    parser.add_argument('--corpus', default=DIRECTORIO_SCRAPER,
+                        help="Carpeta con resoluciones/, circulares/ y leyes/ a servir (por defecto: sii-scraper/)")
+    parser.add_argument('--fuentes', nargs='+', choices=['sii', 'leyes'], default=['sii', 'leyes'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--solicitudes-por-segundo', type=float, default=0,
+                        help="Límite por host del scraper (por defecto: 0, sin límite)")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Milisegundos antes de cada respuesta")
+    parser.add_argument('--ancho-banda', type=float, help="KiB/s por conexión (por defecto: sin límite)")
+    parser.add_argument('--tasa-error', type=float, default=0.0, help="Fracción de respuestas 503 (0-1)")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--backoff-base', type=float, help="Sobrescribe backoff_base de config.json")
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--conservar', action='store_true', help="No borrar la carpeta temporal de descarga")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    corpus = os.path.abspath(args.corpus)
+    configuracion = cargar_configuracion(os.path.join(DIRECTORIO_SCRAPER, 'config.json'))
+    if args.backoff_base is not None:
+        configuracion['backoff_base'] = args.backoff_base
+
+    opciones = {
+        'corpus': corpus,
+        'paginas': paginas_grabadas(os.path.join(corpus, 'data', 'manifiesto.db')),
+        'latencia': args.latencia / 1000,
+        'ancho_banda': args.ancho_banda * 1024 if args.ancho_banda else None,
+        'tasa_error': args.tasa_error,
+        'semilla': args.semilla
+    }
+    proceso, url_servidor = iniciar_servidor(opciones)
+    años = años_del_corpus(corpus)
+
+    # Las fuentes escriben en rutas relativas (resoluciones/, data/...): se ejecutan en una carpeta temporal
+    directorio_original = os.getcwd()
+    temporal = tempfile.mkdtemp(prefix='bench_rastreo_')
+    os.chdir(temporal)
+    try:
+        resultados = [medir_fuente(nombre, url_servidor, años, args, configuracion) for nombre in args.fuentes]
+    finally:
+        os.chdir(directorio_original)
+        proceso.terminate()
+        if args.conservar:
+            print(f"Descargas en {temporal}")
+        else:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    print(f"{'fuente':8} {'docs':>6} {'fallidos':>9} {'docs/s':>8} {'MiB/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MiB':>8}")
+    for r in resultados:
+        print(f"{r['fuente']:8} {r['exitosos']:6d} {r['fallidos']:9d} {r['documentos_por_segundo'] or 0:8.1f} "
+              f"{(r['bytes_por_segundo'] or 0) / 1024 / 1024:8.2f} {r['latencia_p50_ms'] or 0:8.1f} "
+              f"{r['latencia_p99_ms'] or 0:8.1f} {r['pico_rss_mib']:8.1f}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fecha': datetime.now().isoformat(),
+                'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'conservar')},
+                'paginas_grabadas': len(opciones['paginas']),
+                'resultados': resultados
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
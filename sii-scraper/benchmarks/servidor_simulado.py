@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local que reemplaza a sii.cl y bcn.cl (LeyChile) en los benchmarks
+Sirve índices grabados o generados desde el corpus local y los PDFs de resoluciones/, con latencia,
+ancho de banda y tasa de errores configurables
+"""
+
+import argparse
+import email.utils
+import html
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+HOST_SII = 'https://www.sii.cl'
+HOST_LEYCHILE = 'https://www.bcn.cl'
+
+TAMAÑO_BLOQUE = 64 * 1024
+
+RUTA_INDICE = re.compile(r'^/normativa_legislacion/(resoluciones|circulares)/(\d{4})/(?:res_ind|indcir)\d{4}\.htm$')
+RUTA_DOCUMENTO = re.compile(r'^/normativa_legislacion/(resoluciones|circulares)/(\d{4})/([^/]+\.pdf)$')
+RUTA_LEY = re.compile(r'^/leychile/pdf/(\d+)\.pdf$')
+
+
+def _orden_natural(nombre):
+    return [int(parte) if parte.isdigit() else parte for parte in re.split(r'(\d+)', nombre)]
+
+
+class ServidorSimulado:
+    """Stand-in de sii.cl y bcn.cl; `paginas` mapea URLs reales a cuerpos grabados (p. ej. de data/cache)"""
+
+    def __init__(self, corpus='.', paginas=None, latencia=0.0, ancho_banda=None, tasa_error=0.0,
+                 semilla=None, puerto=0):
+        self.corpus = corpus
+        self.paginas = paginas or {}
+        self.latencia = latencia
+        self.ancho_banda = ancho_banda
+        self.tasa_error = tasa_error
+        self.azar = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.estadisticas = {'solicitudes': 0, 'errores_inyectados': 0, 'no_modificados': 0, 'bytes': 0}
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', puerto), self._manejador())
+        self.servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    # Contenido
+
+    def _carpeta(self, tipo, año):
+        return os.path.join(self.corpus, tipo, año)
+
+    def _grabada(self, ruta):
+        """Página grabada para la ruta solicitada, con los enlaces absolutos apuntando a este servidor"""
+        host = HOST_LEYCHILE if ruta.startswith('/leychile/') else HOST_SII
+        cuerpo = self.paginas.get(host + ruta)
+        if cuerpo is None:
+            return None
+        for original in (HOST_SII, HOST_LEYCHILE):
+            cuerpo = cuerpo.replace(original.encode(), self.url.encode())
+        return cuerpo
+
+    def _indice(self, tipo, año):
+        """Índice anual generado con la estructura de res_indAAAA.htm a partir de los PDFs del corpus"""
+        carpeta = self._carpeta(tipo, año)
+        if not os.path.isdir(carpeta):
+            return None
+        etiqueta = 'Resolución Ex. SII' if tipo == 'resoluciones' else 'Circular'
+        filas = []
+        for nombre in sorted(os.listdir(carpeta), key=_orden_natural):
+            if not nombre.lower().endswith('.pdf'):
+                continue
+            numero = re.sub(r'\D', '', nombre) or nombre
+            filas.append(f'<tr><td><a href="{html.escape(nombre)}">{etiqueta} N° {numero}</a></td>'
+                         f'<td><font size="2">{etiqueta} N° {numero} de {año}</font></td></tr>')
+        return ('<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1"></head>'
+                f'<body><table>{"".join(filas)}</table></body></html>').encode('latin-1')
+
+    def _pagina_ley(self, id_norma):
+        return (f'<html><body><h1>Norma {html.escape(id_norma)}</h1>'
+                f'<a id="linkPdf" href="/leychile/pdf/{html.escape(id_norma)}.pdf">Descargar PDF</a>'
+                '</body></html>').encode('utf-8')
+
+    def _pdf_ley(self, id_norma):
+        """PDF de una ley: leyes/<id>_*.pdf si existe en el corpus; si no, el PDF más grande de resoluciones/"""
+        carpeta_leyes = os.path.join(self.corpus, 'leyes')
+        if os.path.isdir(carpeta_leyes):
+            for nombre in sorted(os.listdir(carpeta_leyes)):
+                if nombre.startswith(f"{id_norma}_") and nombre.lower().endswith('.pdf'):
+                    return os.path.join(carpeta_leyes, nombre)
+        candidatos = []
+        for raiz, _, archivos in os.walk(os.path.join(self.corpus, 'resoluciones')):
+            candidatos.extend(os.path.join(raiz, a) for a in archivos if a.lower().endswith('.pdf'))
+        return max(candidatos, key=os.path.getsize) if candidatos else None
+
+    def _schemas(self):
+        carpeta = os.path.join(self.corpus, 'schemas')
+        nombres = sorted(n for n in os.listdir(carpeta) if n.lower().endswith('.zip')) if os.path.isdir(carpeta) else []
+        enlaces = ''.join(f'<li><a href="/factura_electronica/schemas/{html.escape(n)}">{html.escape(n)}</a></li>'
+                          for n in nombres)
+        return f'<html><body><ul>{enlaces}</ul></body></html>'.encode('utf-8')
+
+    def resolver(self, ruta, query):
+        """(cuerpo en bytes | ruta de archivo | None, content type) para una solicitud"""
+        grabada = self._grabada(ruta + (f'?{query}' if query else ''))
+        if grabada is not None:
+            return grabada, 'text/html'
+
+        coincidencia = RUTA_INDICE.match(ruta)
+        if coincidencia:
+            return self._indice(*coincidencia.groups()), 'text/html'
+        coincidencia = RUTA_DOCUMENTO.match(ruta)
+        if coincidencia:
+            archivo = os.path.join(self._carpeta(*coincidencia.groups()[:2]), coincidencia.group(3))
+            return (archivo if os.path.isfile(archivo) else None), 'application/pdf'
+        if ruta == '/leychile/navegar':
+            id_norma = parse_qs(query).get('idNorma', [''])[0]
+            return (self._pagina_ley(id_norma) if id_norma.isdigit() else None), 'text/html'
+        coincidencia = RUTA_LEY.match(ruta)
+        if coincidencia:
+            return self._pdf_ley(coincidencia.group(1)), 'application/pdf'
+        if ruta == '/factura_electronica/formato_xml.htm':
+            return self._schemas(), 'text/html'
+        if ruta.startswith('/factura_electronica/schemas/'):
+            archivo = os.path.join(self.corpus, 'schemas', os.path.basename(ruta))
+            return (archivo if os.path.isfile(archivo) else None), 'application/zip'
+        return None, None
+
+    # HTTP
+
+    def _inyectar_error(self):
+        with self.lock:
+            self.estadisticas['solicitudes'] += 1
+            if self.tasa_error and self.azar.random() < self.tasa_error:
+                self.estadisticas['errores_inyectados'] += 1
+                return True
+        return False
+
+    def _contar(self, campo, cantidad=1):
+        with self.lock:
+            self.estadisticas[campo] += cantidad
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            # Keep-alive, igual que los servidores reales
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                if servidor._inyectar_error():
+                    self.send_error(503)
+                    return
+
+                partes = urlsplit(self.path)
+                contenido, tipo = servidor.resolver(partes.path, partes.query)
+                if contenido is None:
+                    self.send_error(404)
+                    return
+
+                if isinstance(contenido, bytes):
+                    tamaño = len(contenido)
+                    etag = f'"{zlib.crc32(contenido):08x}-{tamaño:x}"'
+                    ultima_modificacion = None
+                else:
+                    estado = os.stat(contenido)
+                    tamaño = estado.st_size
+                    etag = f'"{int(estado.st_mtime):x}-{tamaño:x}"'
+                    ultima_modificacion = email.utils.formatdate(estado.st_mtime, usegmt=True)
+
+                if self.headers.get('If-None-Match') == etag:
+                    servidor._contar('no_modificados')
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(tamaño))
+                self.send_header('ETag', etag)
+                if ultima_modificacion:
+                    self.send_header('Last-Modified', ultima_modificacion)
+                self.end_headers()
+
+                if isinstance(contenido, bytes):
+                    self._enviar(contenido[i:i + TAMAÑO_BLOQUE] for i in range(0, tamaño, TAMAÑO_BLOQUE))
+                else:
+                    with open(contenido, 'rb') as f:
+                        self._enviar(iter(lambda: f.read(TAMAÑO_BLOQUE), b''))
+
+            def _enviar(self, bloques):
+                for bloque in bloques:
+                    self.wfile.write(bloque)
+                    servidor._contar('bytes', len(bloque))
+                    # Ancho de banda por conexión
+                    if servidor.ancho_banda:
+                        time.sleep(len(bloque) / servidor.ancho_banda)
+
+            def log_message(self, formato, *args):
+                logging.debug(formato % args)
+
+        return Manejador
+
+    def servir(self):
+        self.servidor.serve_forever()
+
+    def iniciar(self):
+        """Sirve en un hilo de fondo y retorna la URL base"""
+        threading.Thread(target=self.servir, daemon=True).start()
+        return self.url
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Servidor local que simula sii.cl y LeyChile")
+    parser.add_argument('--corpus', default='.', help="Carpeta con resoluciones/, circulares/, leyes/ y schemas/")
+    parser.add_argument('--puerto', type=int, default=8800)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Segundos antes de cada respuesta")
+    parser.add_argument('--ancho-banda', type=float, help="Bytes por segundo por conexión (por defecto: sin límite)")
+    parser.add_argument('--tasa-error', type=float, default=0.0, help="Fracción de solicitudes que responden 503")
+    parser.add_argument('--semilla', type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    servidor = ServidorSimulado(args.corpus, latencia=args.latencia, ancho_banda=args.ancho_banda,
+                                tasa_error=args.tasa_error, semilla=args.semilla, puerto=args.puerto)
+    print(f"🧪 sii.cl / bcn.cl simulados en {servidor.url}")
+    servidor.servir()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Capa de caché HTTP sobre la sesión resiliente, respaldada por el manifiesto
+Agrega encabezados condicionales (ETag / Last-Modified) y responde desde disco cuando el servidor contesta 304
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime
+
+from manifiesto import Manifiesto
+from resiliencia import SesionResiliente
+
+CARPETA_CACHE = 'data/cache'
+
+# Solo se guarda el cuerpo de las páginas (índices); los documentos los guarda el scraper
+TIPOS_CACHEABLES = ('text/html', 'application/xhtml+xml', 'text/xml', 'application/xml')
+
+
+class SesionCache(SesionResiliente):
+    def __init__(self, manifiesto=None, carpeta_cache=CARPETA_CACHE, **kwargs):
+        super().__init__(**kwargs)
+        self.manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        self.carpeta_cache = carpeta_cache
+        os.makedirs(carpeta_cache, exist_ok=True)
+
+    def _ruta_cache(self, url):
+        return os.path.join(self.carpeta_cache, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() != 'GET':
+            return super().request(method, url, *args, **kwargs)
+
+        entrada = self.manifiesto.obtener(url)
+        con_cuerpo = bool(entrada and entrada['ruta_cache'] and os.path.exists(entrada['ruta_cache']))
+        con_archivo = bool(entrada and entrada['ruta_local'] and os.path.exists(entrada['ruta_local']))
+
+        # Revalidar solo si hay algo local con qué responder un 304
+        headers = dict(kwargs.pop('headers', None) or {})
+        if con_cuerpo or con_archivo:
+            if entrada['etag'] and 'If-None-Match' not in headers:
+                headers['If-None-Match'] = entrada['etag']
+            if entrada['last_modified'] and 'If-Modified-Since' not in headers:
+                headers['If-Modified-Since'] = entrada['last_modified']
+
+        response = super().request(method, url, *args, headers=headers, **kwargs)
+        response.from_cache = False
+
+        if response.status_code == 304 and (con_cuerpo or con_archivo):
+            self.manifiesto.marcar_verificado(url)
+            if con_cuerpo and not kwargs.get('stream'):
+                with open(entrada['ruta_cache'], 'rb') as f:
+                    response._content = f.read()
+                response.status_code = 200
+                response.from_cache = True
+                self.metricas.incrementar('cache', resultado='acierto')
+                logging.debug(f"Respondido desde caché: {url}")
+            else:
+                self.metricas.incrementar('cache', resultado='no_modificado')
+            return response
+
+        self.metricas.incrementar('cache', resultado='descarga')
+
+        tipo = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if response.status_code == 200 and not kwargs.get('stream') and tipo in TIPOS_CACHEABLES:
+            self._guardar(url, response)
+
+        return response
+
+    def _guardar(self, url, response):
+        """Guarda el cuerpo de una página y la registra en el manifiesto"""
+        ruta = self._ruta_cache(url)
+        contenido = response.content
+        with open(ruta, 'wb') as f:
+            f.write(contenido)
+
+        self.manifiesto.registrar(
+            url,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            sha256=hashlib.sha256(contenido).hexdigest(),
+            bytes=len(contenido),
+            ruta_cache=ruta,
+            descargado_en=datetime.now().isoformat()
+        )
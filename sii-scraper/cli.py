@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Punto de entrada único de las herramientas de normativa: rastrear, estado y verificar
+Solo se importa lo que el subcomando necesita: `estado` y `verificar` trabajan sobre el manifiesto y los
+archivos en disco sin cargar requests, bs4 ni el logging a archivo
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from frontera import RUTA_COLA, RUTA_FRONTERA, FronteraRastreo
+from manifiesto import RUTA_MANIFIESTO, Manifiesto
+
+# Fuente -> (módulo, nombre en la ayuda); el módulo se importa al ejecutar el subcomando
+FUENTES = {
+    'sii': ('sii_scraper', "Resoluciones, circulares y schemas del SII"),
+    'leyes': ('leychile_scraper', "Leyes tributarias desde LeyChile"),
+}
+
+
+def rastrear(fuente, argumentos):
+    """Delega en el main de la fuente con el resto de los argumentos de la línea de comandos"""
+    if fuente == 'todo':
+        from nucleo_scraper import main as rastrear_todo
+        return rastrear_todo(argumentos, prog="cli.py rastrear todo")
+    modulo, _ = FUENTES[fuente]
+    return __import__(modulo).main(argumentos, prog=f"cli.py rastrear {fuente}")
+
+
+def _abrir_manifiesto(ruta):
+    if not os.path.exists(ruta):
+        print(f"📭 No hay manifiesto en {ruta}: aún no se ha descargado nada")
+        return None
+    return Manifiesto(ruta, solo_lectura=True)
+
+
+def _pendientes(ruta):
+    """Pendientes de una frontera, o None si no existe o es de una versión anterior"""
+    if not os.path.exists(ruta):
+        return None
+    frontera = FronteraRastreo(ruta, solo_lectura=True)
+    try:
+        return frontera.pendientes()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        frontera.cerrar()
+
+
+def estado(ruta=RUTA_MANIFIESTO, como_json=False):
+    """Resumen de lo descargado, sin red ni escrituras: documentos por tipo y año, extracciones, archivo frío y
+    frontera (el checkpoint y la cola distribuida junto al manifiesto)
+    """
+    inicio = time.perf_counter()
+    manifiesto = _abrir_manifiesto(ruta)
+    if manifiesto is None:
+        return 1
+    try:
+        resumen = manifiesto.resumen()
+    except sqlite3.OperationalError as e:
+        print(f"❌ {ruta} es de una versión anterior ({e}): ejecute cualquier etapa del scraper para migrarlo")
+        return 1
+    finally:
+        manifiesto.cerrar()
+    carpeta = os.path.dirname(ruta)
+    for clave, ruta_frontera in (('pendientes_frontera', RUTA_FRONTERA), ('pendientes_cola', RUTA_COLA)):
+        pendientes = _pendientes(os.path.join(carpeta, os.path.basename(ruta_frontera)))
+        if pendientes is not None:
+            resumen[clave] = pendientes
+    resumen['milisegundos'] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    if como_json:
+        print(json.dumps(resumen, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{'tipo':14} {'año':>4} {'documentos':>10} {'MiB':>8} {'archivados':>10}  último")
+    for fila in resumen['por_año']:
+        print(f"{fila['tipo'] or '?':14} {fila['año'] or '':>4} {fila['documentos']:>10} "
+              f"{fila['bytes'] / 1024 / 1024:>8.1f} {fila['empaquetados']:>10}  {(fila['ultimo'] or '')[:16]}")
+    print(f"\n📄 Recursos: {resumen['recursos']}  🔗 Catalogados: {resumen['catalogados']}  "
+          f"📝 Extracciones: {resumen['extracciones']}")
+    if resumen['reparaciones']:
+        print(f"🔧 Archivos en cola de reparación: {resumen['reparaciones']} (cli.py verificar --reparar)")
+    print(f"⚖️  Normas LeyChile: {resumen['normas_leychile']} ({resumen['articulos_leychile']} artículos)")
+    if 'pendientes_frontera' in resumen:
+        print(f"⏳ Pendientes en la frontera: {resumen['pendientes_frontera']}")
+    if 'pendientes_cola' in resumen:
+        print(f"⏳ Pendientes en la cola distribuida: {resumen['pendientes_cola']}")
+    print(f"🕒 Última descarga: {resumen['ultima_descarga'] or '-'}  "
+          f"Última verificación: {resumen['ultima_verificacion'] or '-'}")
+    print(f"⚡ {resumen['milisegundos']} ms")
+    return 0
+
+
+def main(argv=None):
+    """Función principal"""
+    parser = argparse.ArgumentParser(prog='cli.py', description="Herramientas de normativa SII y leyes tributarias")
+    parser.add_argument('--manifiesto', default=RUTA_MANIFIESTO,
+                        help="Manifiesto SQLite (por defecto: data/manifiesto.db)")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    rastrear_parser = subparsers.add_parser('rastrear', aliases=['crawl'], help="Descargar normativa")
+    fuentes = rastrear_parser.add_subparsers(dest='fuente', required=True)
+    for fuente, (_, ayuda) in FUENTES.items():
+        # Sin --help propio: las opciones, incluida la ayuda, son las del main de la fuente
+        fuentes.add_parser(fuente, help=f"{ayuda} (opciones: rastrear {fuente} --help)", add_help=False)
+    fuentes.add_parser('todo', aliases=['all'], add_help=False,
+                       help="SII y LeyChile en paralelo en un solo proceso (opciones: rastrear todo --help)")
+
+    estado_parser = subparsers.add_parser('estado', aliases=['status'], help="Resumen offline del manifiesto")
+    estado_parser.add_argument('--json', action='store_true', help="Salida en JSON para otras herramientas")
+    subparsers.add_parser('verificar', aliases=['verify'], add_help=False,
+                          help="Integridad del corpus y cola de reparación (opciones: verificar --help)")
+    args, resto = parser.parse_known_args(argv)
+
+    if args.comando in ('rastrear', 'crawl'):
+        # Los scrapers escriben en data/manifiesto.db; un --manifiesto distinto no se ignora en silencio
+        if args.manifiesto != RUTA_MANIFIESTO:
+            parser.error("--manifiesto solo aplica a estado y verificar")
+        return rastrear('todo' if args.fuente == 'all' else args.fuente, resto)
+    if args.comando in ('verificar', 'verify'):
+        from verificacion import main as verificar
+        return verificar(['--manifiesto', args.manifiesto] + resto, prog='cli.py verificar')
+    if resto:
+        parser.error(f"argumentos no reconocidos: {' '.join(resto)}")
+    return estado(args.manifiesto, args.json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
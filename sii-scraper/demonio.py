@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Modo demonio: sondea los índices del SII con solicitudes condicionales en vez de re-rastrear todo en cada ejecución
+El año en curso se consulta seguido y los anteriores rara vez; cada documento nuevo pasa por descarga, extracción
+de texto e indexación apenas aparece, y queda registrado en un log de eventos (data/eventos/documentos.jsonl)
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+from archivo_frio import AÑOS_CALIENTES, ArchivoFrio
+from extraccion_texto import ExtractorTexto
+from indice_texto import IndiceTexto
+from metricas import ruta_textfile
+from nucleo_scraper import configurar_logging
+from sii_scraper import SIIScraper
+
+RUTA_EVENTOS = 'data/eventos/documentos.jsonl'
+
+# Tipo de documento de cada índice anual, como lo usa SIIScraper para nombrar archivos
+TIPOS_INDICE = {'resoluciones': 'resolucion', 'circulares': 'circular'}
+
+INTERVALO_ACTUAL = 15 * 60
+INTERVALO_HISTORICO = 24 * 60 * 60
+# Un índice que falló se vuelve a intentar antes de su intervalo normal
+PAUSA_ERROR = 5 * 60
+# Los años fríos se mueven al archivo comprimido una vez al día
+INTERVALO_ARCHIVO = 24 * 60 * 60
+
+
+def registrar_eventos(eventos, ruta=RUTA_EVENTOS):
+    """Agrega eventos al log JSONL y hace fsync, para que un consumidor nunca lea un lote a medias"""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'ab') as f:
+        f.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in eventos).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def leer_eventos(desde=0, ruta=RUTA_EVENTOS):
+    """Eventos escritos desde el byte `desde`; retorna (eventos, posición) para continuar en la próxima lectura"""
+    eventos = []
+    posicion = desde
+    try:
+        with open(ruta, 'rb') as f:
+            f.seek(desde)
+            for linea in f:
+                # Una línea sin salto final todavía se está escribiendo
+                if not linea.endswith(b'\n'):
+                    break
+                eventos.append(json.loads(linea))
+                posicion += len(linea)
+    except FileNotFoundError:
+        pass
+    return eventos, posicion
+
+
+class DemonioNormativa:
+    def __init__(self, scraper=None, intervalo_actual=INTERVALO_ACTUAL, intervalo_historico=INTERVALO_HISTORICO,
+                 años_historicos=4, indexar=True, ruta_eventos=RUTA_EVENTOS, años_calientes=AÑOS_CALIENTES):
+        self.scraper = scraper if scraper is not None else SIIScraper()
+        self.manifiesto = self.scraper.manifiesto
+        self.metricas = self.scraper.metricas
+        self.extractor = ExtractorTexto(self.manifiesto)
+        self.indice = IndiceTexto() if indexar else None
+        self.intervalo_actual = intervalo_actual
+        self.intervalo_historico = intervalo_historico
+        self.años_historicos = años_historicos
+        self.ruta_eventos = ruta_eventos
+        # None desactiva el archivo frío
+        self.archivo = ArchivoFrio(self.manifiesto, self.scraper.almacen) if años_calientes is not None else None
+        self.años_calientes = años_calientes
+        self.proximo_archivo = 0
+
+        # Próximo sondeo de cada índice (tipo, año), en segundos desde epoch
+        self.proximo = {}
+        # Enlaces cuya descarga falló: se reintentan en el siguiente sondeo aunque el índice no cambie
+        self.reintentos = {}
+        self.detenido = threading.Event()
+
+    def plan(self):
+        """Intervalo de sondeo de cada índice; se recalcula en cada vuelta para seguir el cambio de año"""
+        año_actual = datetime.now().year
+        return {(tipo, año): self.intervalo_actual if año == año_actual else self.intervalo_historico
+                for tipo in TIPOS_INDICE
+                for año in range(año_actual - self.años_historicos, año_actual + 1)}
+
+    def vencimiento(self, clave, intervalo):
+        """Cuándo toca sondear un índice; al arrancar se parte de su última verificación en el manifiesto"""
+        if clave not in self.proximo:
+            entrada = self.manifiesto.obtener(self.scraper.url_indice(*clave))
+            ultima = entrada and (entrada['verificado_en'] or entrada['descargado_en'])
+            self.proximo[clave] = datetime.fromisoformat(ultima).timestamp() + intervalo if ultima else 0
+        return self.proximo[clave]
+
+    def sondear(self, tipo, año):
+        """GET condicional del índice; retorna los enlaces a documentos que aún no están en el catálogo"""
+        url = self.scraper.url_indice(tipo, año)
+        # Se leen sin sacarlos: si el sondeo o la descarga fallan, siguen para la próxima vuelta (procesar los
+        # reemplaza por los que vuelvan a fallar)
+        pendientes = list(self.reintentos.get((tipo, año), []))
+
+        response = self.scraper.obtener(url)
+        if response.status_code == 404:
+            self.metricas.incrementar('sondeos', resultado='inexistente')
+            return pendientes
+        response.raise_for_status()
+        # Con 304 el cuerpo viene de data/cache: se compara igual contra el catálogo, porque una descarga que falló
+        # antes de un reinicio (o en sii_scraper.py) no quedó en self.reintentos
+        self.metricas.incrementar('sondeos', resultado='sin_cambios' if response.from_cache else 'modificado')
+        with self.metricas.cronometro('parseo'):
+            enlaces = self.scraper.extraer_enlaces(response.content, url, f"{tipo}_{año}")
+        urls = {e['url'] for e in pendientes}
+        pendientes.extend(e for e in enlaces if e['url'] not in urls and self.manifiesto.catalogo(e['url']) is None)
+        return pendientes
+
+    def procesar(self, tipo, año, enlaces):
+        """Descarga, extrae e indexa los documentos nuevos de un índice y publica sus eventos"""
+        carpeta_destino = f"{tipo}/{año}"
+        os.makedirs(carpeta_destino, exist_ok=True)
+        self.scraper.descargar_enlaces(enlaces, carpeta_destino, TIPOS_INDICE[tipo])
+
+        nuevos = []
+        fallidos = []
+        for enlace in enlaces:
+            entrada = self.manifiesto.catalogo(enlace['url'])
+            if entrada is None:
+                fallidos.append(enlace)
+            else:
+                nuevos.append(entrada)
+        if fallidos:
+            self.reintentos[(tipo, año)] = fallidos
+        else:
+            self.reintentos.pop((tipo, año), None)
+        if not nuevos:
+            return []
+
+        pdfs = [e['ruta_vista'] for e in nuevos if e['ruta_vista'].lower().endswith('.pdf')]
+        if pdfs:
+            self.extractor.extraer(pdfs)
+        if self.indice is not None:
+            self.indice.construir(self.manifiesto)
+
+        ahora = datetime.now().isoformat()
+        eventos = []
+        for entrada in nuevos:
+            extraccion = self.manifiesto.extraccion(entrada['sha256'])
+            eventos.append({
+                'evento': 'documento_nuevo',
+                'fecha': ahora,
+                'url': entrada['url'],
+                'tipo': entrada['tipo'],
+                'año': entrada['año'],
+                'numero': entrada['numero'],
+                'sha256': entrada['sha256'],
+                'ruta': entrada['ruta_vista'],
+                'ruta_texto': extraccion['ruta_texto'] if extraccion else None,
+                'indexado': bool(extraccion) and self.indice is not None
+            })
+        registrar_eventos(eventos, self.ruta_eventos)
+        logging.info(f"{tipo.capitalize()} {año}: {len(nuevos)} documentos nuevos")
+        return eventos
+
+    def vuelta(self):
+        """Sondea los índices vencidos; retorna cuántos documentos nuevos se publicaron"""
+        plan = self.plan()
+        publicados = 0
+        # Tras una caída larga del SII el circuito quedaría abierto para siempre (max_aperturas): cada vuelta parte
+        # de cero, con la pausa vigente respetada
+        self.scraper.session.circuito.reiniciar()
+        for clave, intervalo in plan.items():
+            if self.detenido.is_set():
+                break
+            if self.vencimiento(clave, intervalo) > time.time():
+                continue
+            try:
+                enlaces = self.sondear(*clave)
+                if enlaces:
+                    publicados += len(self.procesar(*clave, enlaces))
+                self.proximo[clave] = time.time() + intervalo
+            except Exception as e:
+                logging.error(f"Error sondeando {clave[0]} {clave[1]}: {str(e)}")
+                self.metricas.incrementar('sondeos', resultado='error')
+                self.proximo[clave] = time.time() + min(intervalo, PAUSA_ERROR)
+        if self.archivo is not None and not self.detenido.is_set() and self.proximo_archivo <= time.time():
+            self.archivar()
+        self.metricas.exportar_prometheus(ruta_textfile('demonio'))
+        return publicados
+
+    def archivar(self):
+        """Empaqueta los años fríos (incluidos los documentos que llegaron tarde a un año ya archivado)"""
+        try:
+            resultados = self.archivo.empaquetar_frios(self.años_calientes)
+            reconstruidos = [r['paquete'] for r in resultados if r['reconstruido']]
+            if reconstruidos:
+                logging.info(f"Archivo frío: {', '.join(reconstruidos)} empaquetados")
+            self.proximo_archivo = time.time() + INTERVALO_ARCHIVO
+        except Exception as e:
+            logging.error(f"Error empaquetando los años fríos: {str(e)}")
+            self.proximo_archivo = time.time() + PAUSA_ERROR
+
+    def ejecutar(self, una_vez=False):
+        """Bucle principal; termina con `detener()` (SIGTERM / Ctrl+C) o tras una vuelta si `una_vez`"""
+        logging.info(f"Demonio iniciado: año en curso cada {self.intervalo_actual}s, "
+                     f"años anteriores cada {self.intervalo_historico}s")
+        while not self.detenido.is_set():
+            self.vuelta()
+            if una_vez:
+                break
+            plan = self.plan()
+            espera = min(self.vencimiento(clave, intervalo) for clave, intervalo in plan.items()) - time.time()
+            # Se despierta al menos cada intervalo corto para notar el cambio de año
+            self.detenido.wait(min(max(espera, 1), self.intervalo_actual))
+        logging.info("Demonio detenido")
+
+    def detener(self, *_):
+        self.detenido.set()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Sondeo continuo de los índices del SII")
+    parser.add_argument('--minutos-actual', type=float, default=INTERVALO_ACTUAL / 60,
+                        help="Intervalo de sondeo del año en curso (por defecto: 15)")
+    parser.add_argument('--horas-historico', type=float, default=INTERVALO_HISTORICO / 3600,
+                        help="Intervalo de sondeo de los años anteriores (por defecto: 24)")
+    parser.add_argument('--años-historicos', type=int, default=4, help="Años anteriores a vigilar (por defecto: 4)")
+    parser.add_argument('--workers', type=int, default=4, help="Descargas concurrentes (por defecto: 4)")
+    parser.add_argument('--sin-indexar', action='store_true', help="No actualizar el índice de texto completo")
+    parser.add_argument('--años-calientes', type=int, default=AÑOS_CALIENTES,
+                        help="Años recientes que no se empaquetan en el archivo frío (por defecto: 2)")
+    parser.add_argument('--sin-archivar', action='store_true', help="No mover los años fríos al archivo comprimido")
+    parser.add_argument('--una-vez', action='store_true', help="Sondear lo vencido y terminar (para cron)")
+    args = parser.parse_args()
+
+    print("🛰️  Demonio de Normativa SII")
+    print("=" * 40)
+    for carpeta in ['resoluciones', 'circulares', 'data', 'logs']:
+        os.makedirs(carpeta, exist_ok=True)
+    configurar_logging('logs/demonio.log')
+
+    demonio = DemonioNormativa(
+        SIIScraper(max_workers=args.workers),
+        intervalo_actual=args.minutos_actual * 60,
+        intervalo_historico=args.horas_historico * 3600,
+        años_historicos=args.años_historicos,
+        indexar=not args.sin_indexar,
+        años_calientes=None if args.sin_archivar else args.años_calientes
+    )
+    signal.signal(signal.SIGTERM, demonio.detener)
+    try:
+        demonio.ejecutar(una_vez=args.una_vez)
+    except KeyboardInterrupt:
+        demonio.detener()
+    print(f"📝 Eventos en {demonio.ruta_eventos}")
+
+
+if __name__ == "__main__":
+    main()
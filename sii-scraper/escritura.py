@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Escritura segura de descargas: por bloques, con hash al vuelo, fsync y renombrado atómico
+Un archivo en su ruta final siempre está completo; una caída a mitad de escritura solo deja un temporal
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+
+TAMAÑO_BLOQUE = 64 * 1024
+
+
+def _permisos_por_defecto():
+    """Permisos que tendría un archivo creado con open() (mkstemp crea con 0600)"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class DescargaIncompleta(Exception):
+    """El cuerpo recibido no coincide con el Content-Length anunciado"""
+
+
+def sincronizar_carpeta(carpeta):
+    """Persiste la entrada de directorio del renombrado (no disponible en Windows)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(carpeta, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def escribir_atomico(bloques, ruta_destino, tiempos=None):
+    """Escribe un iterable de bloques de bytes en `ruta_destino` de forma atómica; retorna (sha256, bytes)
+
+    Si se pasa el diccionario `tiempos`, acumula en él los segundos esperando bloques ('cuerpo')
+    y los de escritura, hash y fsync ('escritura')
+    """
+    inicio = time.perf_counter()
+    espera = 0.0
+    iterador = iter(bloques)
+    carpeta = os.path.dirname(ruta_destino) or '.'
+    os.makedirs(carpeta, exist_ok=True)
+    fd, ruta_temporal = tempfile.mkstemp(dir=carpeta, prefix='.', suffix='.part')
+
+    h = hashlib.sha256()
+    total = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                antes = time.perf_counter()
+                bloque = next(iterador, None)
+                espera += time.perf_counter() - antes
+                if bloque is None:
+                    break
+                if not bloque:
+                    continue
+                f.write(bloque)
+                h.update(bloque)
+                total += len(bloque)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(ruta_temporal, _permisos_por_defecto())
+        os.replace(ruta_temporal, ruta_destino)
+    except BaseException:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+        raise
+
+    sincronizar_carpeta(carpeta)
+    if tiempos is not None:
+        tiempos['cuerpo'] = tiempos.get('cuerpo', 0.0) + espera
+        tiempos['escritura'] = tiempos.get('escritura', 0.0) + time.perf_counter() - inicio - espera
+    return h.hexdigest(), total
+
+
+def guardar_respuesta(response, ruta_destino, tamaño_bloque=TAMAÑO_BLOQUE, tiempos=None):
+    """Guarda el cuerpo de una respuesta `stream=True` sin cargarlo completo en memoria; retorna (sha256, bytes)"""
+    esperado = response.headers.get('Content-Length')
+    # Con Content-Encoding el largo anunciado es el comprimido, no el que se escribe
+    if response.headers.get('Content-Encoding'):
+        esperado = None
+
+    def bloques():
+        recibidos = 0
+        for bloque in response.iter_content(chunk_size=tamaño_bloque):
+            recibidos += len(bloque)
+            yield bloque
+        if esperado is not None and esperado.isdigit() and recibidos != int(esperado):
+            raise DescargaIncompleta(f"Se recibieron {recibidos} de {esperado} bytes")
+
+    return escribir_atomico(bloques(), ruta_destino, tiempos)
+
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Schemas XML de los documentos tributarios electrónicos (DTE): desempaqueta los ZIP descargados del SII,
+compila los XSD una sola vez a validadores serializados (pickle) y valida lotes de XML en un pool de procesos
+que carga los validadores al arrancar cada worker, sin volver a parsear los XSD
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import xmlschema
+from lxml import etree
+
+from escritura import escribir_atomico
+from manifiesto import sha256_archivo
+
+CARPETA_ZIPS = 'schemas'
+CARPETA_XSD = 'schemas/xsd'
+CARPETA_VALIDADORES = 'data/esquemas'
+
+NS_XSD = 'http://www.w3.org/2001/XMLSchema'
+MARCA_ORIGEN = '.origen'
+
+# Los DTE vienen firmados y en ISO-8859-1; no se resuelven entidades ni se accede a la red
+PARSER = etree.XMLParser(resolve_entities=False, no_network=True, remove_blank_text=False)
+
+
+def desempaquetar(carpeta_zips=CARPETA_ZIPS, destino=CARPETA_XSD):
+    """Extrae cada ZIP en destino/<nombre>/; se omiten los que no cambiaron desde la última extracción
+
+    Se reconocen por su firma y no por la extensión: versiones anteriores del scraper guardaban los ZIP como .pdf
+    """
+    extraidos = 0
+    if not os.path.isdir(carpeta_zips):
+        return extraidos
+    for nombre in sorted(os.listdir(carpeta_zips)):
+        ruta_zip = os.path.join(carpeta_zips, nombre)
+        if nombre.startswith('.') or not os.path.isfile(ruta_zip) or not zipfile.is_zipfile(ruta_zip):
+            continue
+        carpeta = os.path.join(destino, os.path.splitext(nombre)[0])
+        marca = os.path.join(carpeta, MARCA_ORIGEN)
+        sha256 = sha256_archivo(ruta_zip)
+        try:
+            with open(marca, 'r', encoding='utf-8') as f:
+                if f.read().strip() == sha256:
+                    continue
+        except FileNotFoundError:
+            pass
+        try:
+            with zipfile.ZipFile(ruta_zip) as archivo:
+                # extractall descarta rutas absolutas y componentes '..'
+                archivo.extractall(carpeta)
+        except zipfile.BadZipFile as e:
+            logging.error(f"ZIP inválido {ruta_zip}: {str(e)}")
+            continue
+        escribir_atomico([sha256.encode('ascii')], marca)
+        extraidos += 1
+        logging.info(f"✓ Desempaquetado: {ruta_zip}")
+    return extraidos
+
+
+def listar_xsd(carpeta=CARPETA_XSD):
+    rutas = []
+    for raiz, _, archivos in os.walk(carpeta):
+        rutas.extend(os.path.join(raiz, a) for a in archivos if a.lower().endswith('.xsd'))
+    return sorted(rutas)
+
+
+def xsd_raiz(rutas):
+    """XSD que ningún otro incluye o importa: compilarlos a ellos compila también sus dependencias"""
+    referenciados = set()
+    for ruta in rutas:
+        try:
+            arbol = etree.parse(ruta, PARSER)
+        except (OSError, etree.XMLSyntaxError) as e:
+            logging.warning(f"XSD ilegible {ruta}: {str(e)}")
+            continue
+        for nodo in arbol.iter(f'{{{NS_XSD}}}include', f'{{{NS_XSD}}}import', f'{{{NS_XSD}}}redefine'):
+            ubicacion = nodo.get('schemaLocation')
+            if ubicacion and '://' not in ubicacion:
+                referenciados.add(os.path.normpath(os.path.join(os.path.dirname(ruta), ubicacion)))
+    raices = [ruta for ruta in rutas if os.path.normpath(ruta) not in referenciados]
+    # Con referencias circulares no queda ninguno sin referenciar
+    return raices or rutas
+
+
+def huella(rutas):
+    """Hash del contenido de los XSD y de la versión de xmlschema: cambia si hay que recompilar"""
+    h = hashlib.sha256(xmlschema.__version__.encode('utf-8'))
+    for ruta in rutas:
+        h.update(ruta.encode('utf-8'))
+        h.update(sha256_archivo(ruta).encode('ascii'))
+    return h.hexdigest()
+
+
+def compilar_xsd(ruta):
+    """Compila un XSD con sus include/import (se ejecuta en un proceso del pool; el resultado viaja como pickle)"""
+    return xmlschema.XMLSchema(ruta)
+
+
+def _elementos_globales(esquema):
+    """Nombres calificados ({ns}Nombre) de los elementos globales de un schema y de los que importa"""
+    return [nombre for nombre in esquema.maps.elements if not nombre.startswith(f'{{{NS_XSD}}}')]
+
+
+# Validadores del worker, cargados una vez por proceso (ver _inicializar_worker)
+_validadores = None
+
+
+def _inicializar_worker(ruta_validadores):
+    global _validadores
+    with open(ruta_validadores, 'rb') as f:
+        _validadores = pickle.load(f)
+
+
+def validar_contenido(contenido, validadores, max_errores=10):
+    """Valida un XML (bytes) contra el schema de su elemento raíz; retorna (esquema, errores)"""
+    try:
+        documento = etree.fromstring(contenido, PARSER)
+    except etree.XMLSyntaxError as e:
+        return None, [f"XML mal formado: {str(e)}"]
+    esquema = validadores.get(documento.tag)
+    if esquema is None:
+        return None, [f"Sin schema para el elemento raíz {documento.tag}"]
+    errores = [f"{error.path}: {error.reason}" for error in islice(esquema.iter_errors(documento), max_errores)]
+    return os.path.basename(esquema.url or ''), errores
+
+
+def validar_archivo(ruta, max_errores=10):
+    """Valida un archivo con los validadores del worker"""
+    try:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+    except OSError as e:
+        return {'ruta': ruta, 'valido': False, 'esquema': None, 'errores': [str(e)]}
+    esquema, errores = validar_contenido(contenido, _validadores, max_errores)
+    return {'ruta': ruta, 'valido': not errores, 'esquema': esquema, 'errores': errores}
+
+
+def listar_xml(rutas):
+    """Expande carpetas a los .xml que contienen"""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for raiz, _, nombres in os.walk(ruta):
+                archivos.extend(os.path.join(raiz, n) for n in nombres if n.lower().endswith('.xml'))
+        else:
+            archivos.append(ruta)
+    return sorted(archivos)
+
+
+class EsquemasDTE:
+    def __init__(self, carpeta_zips=CARPETA_ZIPS, carpeta_xsd=CARPETA_XSD, carpeta=CARPETA_VALIDADORES,
+                 max_workers=None):
+        self.carpeta_zips = carpeta_zips
+        self.carpeta_xsd = carpeta_xsd
+        self.ruta_validadores = os.path.join(carpeta, 'validadores.pickle')
+        self.ruta_meta = os.path.join(carpeta, 'validadores.json')
+        # Por defecto un proceso por núcleo: compilar y validar es intensivo en CPU
+        self.max_workers = max_workers or os.cpu_count()
+        self._validadores = None
+
+    def meta(self):
+        try:
+            with open(self.ruta_meta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def preparar(self, forzar=False):
+        """Desempaqueta los ZIP y compila los validadores; no recompila si los XSD no cambiaron"""
+        inicio = time.perf_counter()
+        desempaquetados = desempaquetar(self.carpeta_zips, self.carpeta_xsd)
+        rutas = listar_xsd(self.carpeta_xsd)
+        clave = huella(rutas)
+
+        meta = self.meta()
+        if not forzar and meta and meta['huella'] == clave and os.path.exists(self.ruta_validadores):
+            logging.info("Validadores de schemas al día")
+            return {'desempaquetados': desempaquetados, 'esquemas': len(meta['esquemas']),
+                    'elementos': len(meta['elementos']), 'compilado': False}
+
+        raices = xsd_raiz(rutas)
+        validadores = {}
+        esquemas = []
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, max(len(raices), 1))) as executor:
+            for ruta, futuro in [(ruta, executor.submit(compilar_xsd, ruta)) for ruta in raices]:
+                try:
+                    esquema = futuro.result()
+                except Exception as e:
+                    logging.error(f"Error compilando {ruta}: {str(e)}")
+                    continue
+                esquemas.append(ruta)
+                nombre_archivo = os.path.basename(ruta).lower()
+                for elemento in _elementos_globales(esquema):
+                    local = elemento.rsplit('}', 1)[-1].lower()
+                    # Si varios schemas declaran el elemento, gana el que lleva su nombre (EnvioDTE_v10.xsd)
+                    if elemento not in validadores or nombre_archivo.startswith(local):
+                        validadores[elemento] = esquema
+
+        os.makedirs(os.path.dirname(self.ruta_validadores), exist_ok=True)
+        escribir_atomico([pickle.dumps(validadores, protocol=pickle.HIGHEST_PROTOCOL)], self.ruta_validadores)
+        meta = {'huella': clave, 'esquemas': esquemas, 'elementos': sorted(validadores),
+                'xmlschema': xmlschema.__version__}
+        escribir_atomico([json.dumps(meta, indent=2, ensure_ascii=False).encode('utf-8')], self.ruta_meta)
+        self._validadores = None
+
+        resultados = {'desempaquetados': desempaquetados, 'esquemas': len(esquemas),
+                      'elementos': len(validadores), 'compilado': True,
+                      'segundos': round(time.perf_counter() - inicio, 2)}
+        logging.info(f"Validadores de schemas compilados: {resultados}")
+        return resultados
+
+    def cargar(self):
+        """Validadores por elemento raíz, leídos del pickle (una vez por instancia)"""
+        if self._validadores is None:
+            with open(self.ruta_validadores, 'rb') as f:
+                self._validadores = pickle.load(f)
+        return self._validadores
+
+    def validar_contenido(self, contenido, max_errores=10):
+        """Valida un XML en el proceso actual; retorna (esquema, errores)"""
+        return validar_contenido(contenido, self.cargar(), max_errores)
+
+    def validar(self, rutas, max_errores=10, tamaño_lote=64):
+        """Valida en paralelo una lista de archivos XML; genera un resultado por archivo, en orden"""
+        if not os.path.exists(self.ruta_validadores):
+            raise FileNotFoundError(f"No hay validadores compilados en {self.ruta_validadores}; ejecutar `preparar`")
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_inicializar_worker,
+                                 initargs=(self.ruta_validadores,)) as executor:
+            yield from executor.map(validar_archivo, rutas, [max_errores] * len(rutas), chunksize=tamaño_lote)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Schemas XML de DTE: compilación y validación por lotes")
+    parser.add_argument('--workers', type=int, help="Procesos en paralelo (por defecto: núcleos de la CPU)")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    preparar = subparsers.add_parser('preparar', help="Desempaquetar los ZIP de schemas/ y compilar los validadores")
+    preparar.add_argument('--forzar', action='store_true', help="Recompilar aunque los XSD no hayan cambiado")
+    validar = subparsers.add_parser('validar', help="Validar archivos o carpetas de DTE")
+    validar.add_argument('rutas', nargs='+')
+    validar.add_argument('--salida', help="Archivo JSONL con el resultado de cada documento")
+    validar.add_argument('--max-errores', type=int, default=10, help="Errores reportados por documento")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    esquemas = EsquemasDTE(max_workers=args.workers)
+
+    if args.comando == 'preparar':
+        resultados = esquemas.preparar(forzar=args.forzar)
+        print(f"📦 ZIP desempaquetados: {resultados['desempaquetados']}  "
+              f"📐 Schemas: {resultados['esquemas']}  🏷️  Elementos raíz: {resultados['elementos']}")
+        return
+
+    rutas = listar_xml(args.rutas)
+    inicio = time.perf_counter()
+    validos = 0
+    salida = open(args.salida, 'w', encoding='utf-8') if args.salida else None
+    try:
+        for resultado in esquemas.validar(rutas, max_errores=args.max_errores):
+            if resultado['valido']:
+                validos += 1
+            elif not salida:
+                print(f"❌ {resultado['ruta']}: {resultado['errores'][0]}")
+            if salida:
+                salida.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+    finally:
+        if salida:
+            salida.close()
+    segundos = time.perf_counter() - inicio
+    print(f"\n✅ Válidos: {validos}  ❌ Inválidos: {len(rutas) - validos}  "
+          f"⏱️  {segundos:.2f}s ({len(rutas) / segundos if segundos else 0:.0f} documentos/s)")
+
+
+if __name__ == "__main__":
+    main()
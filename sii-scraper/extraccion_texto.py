@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Extracción paralela de texto de los PDFs descargados (resoluciones, circulares y leyes)
+Genera texto normalizado y metadatos por página en data/textos/, de forma incremental por hash de contenido
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+
+from escritura import escribir_atomico
+from manifiesto import Manifiesto, sha256_archivo
+
+CARPETAS_CORPUS = ('resoluciones', 'circulares', 'leyes')
+CARPETA_TEXTOS = 'data/textos'
+
+
+def normalizar_texto(texto):
+    """Normaliza Unicode, une palabras cortadas con guion al final de línea y colapsa espacios"""
+    texto = unicodedata.normalize('NFC', texto or '')
+    texto = texto.replace('\u00ad', '')  # guion blando
+    texto = re.sub(r'(\w)-\n(\w)', r'\1\2', texto)
+    lineas = [re.sub(r'[ \t\u00a0]+', ' ', linea).strip() for linea in texto.splitlines()]
+    texto = '\n'.join(lineas)
+    return re.sub(r'\n{3,}', '\n\n', texto).strip()
+
+
+def _paginas_pdfplumber(ruta):
+    import pdfplumber
+
+    paginas = []
+    with pdfplumber.open(ruta) as pdf:
+        metadatos = {k: str(v) for k, v in (pdf.metadata or {}).items()}
+        for numero, pagina in enumerate(pdf.pages, start=1):
+            paginas.append({
+                'numero': numero,
+                'ancho': float(pagina.width),
+                'alto': float(pagina.height),
+                'texto': pagina.extract_text() or ''
+            })
+            # Libera los objetos de la página: los PDFs de leyes tienen cientos
+            pagina.flush_cache()
+    return paginas, metadatos
+
+
+def _paginas_pypdf2(ruta):
+    from PyPDF2 import PdfReader
+
+    lector = PdfReader(ruta)
+    metadatos = {k.lstrip('/'): str(v) for k, v in (lector.metadata or {}).items()}
+    paginas = []
+    for numero, pagina in enumerate(lector.pages, start=1):
+        caja = pagina.mediabox
+        paginas.append({
+            'numero': numero,
+            'ancho': float(caja.width),
+            'alto': float(caja.height),
+            'texto': pagina.extract_text() or ''
+        })
+    return paginas, metadatos
+
+
+def extraer_pdf(ruta, sha256, carpeta_textos=CARPETA_TEXTOS, origen=None):
+    """Extrae el texto de un PDF y lo guarda en `carpeta_textos/<sha256>.json` (se ejecuta en un proceso del pool)
+
+    `origen` es el archivo que se lee cuando no es `ruta` (un temporal extraído del archivo frío)
+    """
+    origen = origen or ruta
+    try:
+        paginas, metadatos = _paginas_pdfplumber(origen)
+        extractor = 'pdfplumber'
+    except ImportError:
+        paginas, metadatos = _paginas_pypdf2(origen)
+        extractor = 'PyPDF2'
+    except Exception as e:
+        # pdfminer rechaza algunos PDFs que PyPDF2 sí lee (PDFSyntaxError, xref dañada, ...)
+        logging.warning(f"pdfplumber no pudo leer {ruta} ({e.__class__.__name__}: {e}); se intenta con PyPDF2")
+        paginas, metadatos = _paginas_pypdf2(origen)
+        extractor = 'PyPDF2'
+
+    for pagina in paginas:
+        pagina['texto'] = normalizar_texto(pagina['texto'])
+        pagina['caracteres'] = len(pagina['texto'])
+
+    documento = {
+        'sha256': sha256,
+        'ruta_pdf': ruta,
+        'extractor': extractor,
+        'metadatos': metadatos,
+        'paginas': paginas
+    }
+    ruta_texto = os.path.join(carpeta_textos, f"{sha256}.json")
+    escribir_atomico([json.dumps(documento, ensure_ascii=False).encode('utf-8')], ruta_texto)
+
+    return {
+        'sha256': sha256,
+        'ruta_pdf': ruta,
+        'ruta_texto': ruta_texto,
+        'paginas': len(paginas),
+        'caracteres': sum(p['caracteres'] for p in paginas),
+        'extractor': extractor
+    }
+
+
+def listar_pdfs(carpetas=CARPETAS_CORPUS):
+    """Recorre las carpetas del corpus y retorna las rutas de todos los PDFs"""
+    rutas = []
+    for carpeta in carpetas:
+        for raiz, _, archivos in os.walk(carpeta):
+            rutas.extend(os.path.join(raiz, a) for a in archivos if a.lower().endswith('.pdf'))
+    return sorted(rutas)
+
+
+def cargar_texto(ruta_texto):
+    """Lee un documento extraído (JSON con páginas y metadatos)"""
+    with open(ruta_texto, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ExtractorTexto:
+    def __init__(self, manifiesto=None, carpeta_textos=CARPETA_TEXTOS, max_workers=None):
+        self.manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        self.carpeta_textos = carpeta_textos
+        # Por defecto un proceso por núcleo: el parseo de PDFs es intensivo en CPU
+        self.max_workers = max_workers or os.cpu_count()
+        os.makedirs(carpeta_textos, exist_ok=True)
+        self._archivo = None
+
+    def pendientes(self, rutas, forzar=False):
+        """Retorna (ruta, sha256) de los PDFs cuyo contenido aún no tiene texto extraído"""
+        pendientes = []
+        vistos = set()
+        for ruta in rutas:
+            sha256 = sha256_archivo(ruta)
+            # El mismo contenido bajo otro nombre se extrae una sola vez
+            if sha256 in vistos:
+                continue
+            vistos.add(sha256)
+            extraccion = None if forzar else self.manifiesto.extraccion(sha256)
+            if extraccion and os.path.exists(extraccion['ruta_texto']):
+                continue
+            pendientes.append((ruta, sha256))
+        return pendientes
+
+    def archivados(self, forzar=False):
+        """(ruta de la vista, sha256) de los PDFs que solo están en el archivo frío y aún no tienen texto"""
+        pendientes = []
+        for entrada in self.manifiesto.catalogados():
+            ruta = entrada['ruta_vista']
+            if not ruta or not ruta.lower().endswith('.pdf') or os.path.exists(ruta):
+                continue
+            if not self.manifiesto.paquete_de(entrada['sha256']):
+                continue
+            extraccion = None if forzar else self.manifiesto.extraccion(entrada['sha256'])
+            if extraccion and os.path.exists(extraccion['ruta_texto']):
+                continue
+            pendientes.append((ruta, entrada['sha256']))
+        return pendientes
+
+    def _origen(self, pila, ruta, sha256):
+        """Archivo a leer para un pendiente: la ruta misma, o un temporal extraído del archivo frío"""
+        if os.path.exists(ruta):
+            return ruta
+        if self._archivo is None:
+            from archivo_frio import ArchivoFrio
+            self._archivo = ArchivoFrio(self.manifiesto)
+        return pila.enter_context(self._archivo.ruta_legible(sha256, ruta))
+
+    def extraer(self, rutas=None, forzar=False):
+        """Extrae en paralelo el texto de los PDFs nuevos o modificados (con todo el corpus, también los archivados)"""
+        inicio = time.perf_counter()
+        todo = rutas is None
+        rutas = listar_pdfs() if todo else rutas
+        pendientes = self.pendientes(rutas, forzar)
+        if todo:
+            vistos = {sha256 for _, sha256 in pendientes}
+            pendientes += [(ruta, sha256) for ruta, sha256 in self.archivados(forzar) if sha256 not in vistos]
+        logging.info(f"Extracción de texto: {len(pendientes)} PDFs pendientes ({len(rutas)} en disco)")
+
+        resultados = {'procesados': 0, 'fallidos': 0, 'paginas': 0, 'caracteres': 0,
+                      'omitidos': max(0, len(rutas) - len(pendientes))}
+        if pendientes:
+            with ExitStack() as pila, ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futuros = {}
+                for ruta, sha256 in pendientes:
+                    try:
+                        origen = self._origen(pila, ruta, sha256)
+                    except KeyError:
+                        logging.error(f"Sin PDF ni paquete para {ruta} ({sha256})")
+                        resultados['fallidos'] += 1
+                        continue
+                    futuros[executor.submit(extraer_pdf, ruta, sha256, self.carpeta_textos, origen)] = ruta
+                for futuro in as_completed(futuros):
+                    ruta = futuros[futuro]
+                    try:
+                        extraccion = futuro.result()
+                    except Exception as e:
+                        logging.error(f"Error extrayendo texto de {ruta}: {str(e)}")
+                        resultados['fallidos'] += 1
+                        continue
+
+                    self.manifiesto.registrar_extraccion(**extraccion)
+                    resultados['procesados'] += 1
+                    resultados['paginas'] += extraccion['paginas']
+                    resultados['caracteres'] += extraccion['caracteres']
+                    logging.info(f"✓ Texto extraído: {ruta} ({extraccion['paginas']} páginas)")
+
+        resultados['segundos'] = round(time.perf_counter() - inicio, 2)
+        if resultados['segundos']:
+            resultados['pdfs_por_segundo'] = round(resultados['procesados'] / resultados['segundos'], 2)
+        logging.info(f"Extracción completada: {resultados}")
+        return resultados
+
+
+def main():
+    """Función principal"""
+    from nucleo_scraper import configurar_logging
+
+    parser = argparse.ArgumentParser(description="Extracción de texto de los PDFs descargados")
+    parser.add_argument('--workers', type=int, help="Procesos en paralelo (por defecto: núcleos de la CPU)")
+    parser.add_argument('--forzar', action='store_true', help="Volver a extraer aunque el contenido no haya cambiado")
+    args = parser.parse_args()
+
+    print("📄 Extracción de texto de normativa")
+    print("=" * 40)
+    configurar_logging('logs/extraccion_texto.log')
+
+    resultados = ExtractorTexto(max_workers=args.workers).extraer(forzar=args.forzar)
+
+    print(f"\n📊 Resumen:")
+    print(f"✅ Procesados: {resultados['procesados']}")
+    print(f"⏭️  Sin cambios: {resultados['omitidos']}")
+    print(f"❌ Fallidos: {resultados['fallidos']}")
+    print(f"📄 Páginas: {resultados['paginas']}")
+    print(f"⏱️  Tiempo: {resultados['segundos']}s")
+
+
+if __name__ == "__main__":
+    main()
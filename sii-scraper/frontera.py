@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Frontera de rastreo persistente (SQLite) para reanudar descargas interrumpidas
+Registra por (tipo, año) los índices descubiertos, sus enlaces y el estado de descarga de cada uno;
+sirve también de cola de trabajo compartida, con arriendo de filas, para varios procesos o máquinas
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from manifiesto import conectar_solo_lectura
+
+RUTA_FRONTERA = 'data/frontera.db'
+# Cola del rastreo distribuido (ver rastreo_distribuido.py), separada del checkpoint de sii_scraper.py
+RUTA_COLA = 'data/cola_distribuida.db'
+
+# Estados de un índice
+INDICE_DESCUBIERTO = 'descubierto'
+INDICE_INEXISTENTE = 'no_existe'
+
+# Estados de un documento
+PENDIENTE = 'pendiente'
+COMPLETO = 'completo'
+FALLIDO = 'fallido'
+
+
+class FronteraRastreo:
+    def __init__(self, ruta=RUTA_FRONTERA, modo_diario='WAL', solo_lectura=False):
+        self.ruta = ruta
+        # Compartida entre los workers de descarga
+        self.lock = threading.Lock()
+        if solo_lectura:
+            self.conexion = conectar_solo_lectura(ruta)
+            return
+
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        # Con varios procesos la espera por el bloqueo de escritura es normal; WAL no funciona sobre
+        # volúmenes de red, donde se usa modo_diario='DELETE'
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=60)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.execute(f'PRAGMA journal_mode={modo_diario}')
+        self.conexion.executescript('''
+            CREATE TABLE IF NOT EXISTS indices (
+                tipo TEXT NOT NULL,
+                año INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                descubierto_en TEXT NOT NULL,
+                PRIMARY KEY (tipo, año)
+            );
+            CREATE TABLE IF NOT EXISTS documentos (
+                tipo TEXT NOT NULL,
+                año INTEGER NOT NULL,
+                orden INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                texto TEXT,
+                href_original TEXT,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                intentos INTEGER NOT NULL DEFAULT 0,
+                actualizado_en TEXT,
+                arrendado_por TEXT,
+                arrendado_hasta REAL,
+                PRIMARY KEY (tipo, año, url)
+            );
+            -- Trabajadores de la cola compartida; el presupuesto por host se reparte entre los activos
+            CREATE TABLE IF NOT EXISTS trabajadores (
+                trabajador TEXT PRIMARY KEY,
+                activo_hasta REAL NOT NULL
+            );
+        ''')
+        # Fronteras creadas antes de la cola compartida
+        columnas = {fila['name'] for fila in self.conexion.execute('PRAGMA table_info(documentos)')}
+        for columna, tipo in (('arrendado_por', 'TEXT'), ('arrendado_hasta', 'REAL')):
+            if columna not in columnas:
+                self.conexion.execute(f'ALTER TABLE documentos ADD COLUMN {columna} {tipo}')
+        self.conexion.execute(
+            'CREATE INDEX IF NOT EXISTS idx_documentos_estado ON documentos (estado, arrendado_hasta)')
+        self.conexion.commit()
+
+    def reiniciar(self):
+        """Descarta el progreso anterior (ejecución nueva, sin --reanudar)
+
+        Se niega si hay arriendos vigentes: la base es una cola compartida con trabajadores activos
+        """
+        with self.lock:
+            fila = self.conexion.execute(
+                'SELECT COUNT(*) AS cantidad FROM documentos WHERE arrendado_hasta >= ?', (time.time(),)
+            ).fetchone()
+            if fila['cantidad']:
+                raise RuntimeError(f"{self.ruta} tiene {fila['cantidad']} documentos arrendados por trabajadores "
+                                   f"activos; no se reinicia una cola compartida")
+            self.conexion.execute('DELETE FROM documentos')
+            self.conexion.execute('DELETE FROM indices')
+            self.conexion.commit()
+
+    def estado_indice(self, tipo, año):
+        """None si el índice no se ha consultado; si no, INDICE_DESCUBIERTO o INDICE_INEXISTENTE"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT estado FROM indices WHERE tipo = ? AND año = ?',
+                                         (tipo, año)).fetchone()
+        return fila['estado'] if fila else None
+
+    def registrar_indice(self, tipo, año, url, enlaces):
+        """Guarda un índice descubierto y todos sus enlaces como pendientes"""
+        ahora = datetime.now().isoformat()
+        with self.lock:
+            with self.conexion:
+                self.conexion.execute(
+                    'INSERT OR REPLACE INTO indices (tipo, año, url, estado, descubierto_en) VALUES (?, ?, ?, ?, ?)',
+                    (tipo, año, url, INDICE_DESCUBIERTO, ahora)
+                )
+                self.conexion.executemany(
+                    'INSERT OR IGNORE INTO documentos (tipo, año, orden, url, texto, href_original, actualizado_en) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(tipo, año, i, e['url'], e['texto'], e.get('href_original'), ahora)
+                     for i, e in enumerate(enlaces)]
+                )
+
+    def registrar_indice_inexistente(self, tipo, año, url):
+        """Guarda que el índice no existe (404) para no volver a consultarlo al reanudar"""
+        with self.lock:
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO indices (tipo, año, url, estado, descubierto_en) VALUES (?, ?, ?, ?, ?)',
+                (tipo, año, url, INDICE_INEXISTENTE, datetime.now().isoformat())
+            )
+            self.conexion.commit()
+
+    def enlaces(self, tipo, año):
+        """Enlaces de un índice descubierto, en el orden original"""
+        with self.lock:
+            filas = self.conexion.execute(
+                'SELECT url, texto, href_original FROM documentos WHERE tipo = ? AND año = ? ORDER BY orden',
+                (tipo, año)
+            ).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def completados(self, tipo, año):
+        """URLs de un índice ya descargadas con éxito"""
+        with self.lock:
+            filas = self.conexion.execute(
+                'SELECT url FROM documentos WHERE tipo = ? AND año = ? AND estado = ?',
+                (tipo, año, COMPLETO)
+            ).fetchall()
+        return {fila['url'] for fila in filas}
+
+    def marcar(self, tipo, año, url, exito, trabajador=None):
+        """Registra el resultado de la descarga de un documento y libera su arriendo
+
+        Con `trabajador` (cola compartida) solo vale si el arriendo sigue siendo suyo: si venció y otro trabajador
+        lo tomó, el resultado se descarta y retorna False
+        """
+        consulta = ('UPDATE documentos SET estado = ?, intentos = intentos + 1, actualizado_en = ?, '
+                    'arrendado_por = NULL, arrendado_hasta = NULL '
+                    'WHERE tipo = ? AND año = ? AND url = ?')
+        parametros = (COMPLETO if exito else FALLIDO, datetime.now().isoformat(), tipo, año, url)
+        if trabajador is not None:
+            consulta += ' AND arrendado_por = ?'
+            parametros += (trabajador,)
+        with self.lock:
+            cursor = self.conexion.execute(consulta, parametros)
+            self.conexion.commit()
+        return cursor.rowcount > 0
+
+    def arrendar(self, trabajador, cantidad, duracion, max_intentos=3):
+        """Reserva hasta `cantidad` documentos pendientes (o fallidos con intentos restantes) por `duracion` segundos
+
+        La reserva es atómica entre procesos (BEGIN IMMEDIATE); si el trabajador muere sin marcarlos,
+        los documentos vuelven a la cola cuando vence el arriendo
+        """
+        ahora = time.time()
+        with self.lock:
+            self.conexion.execute('BEGIN IMMEDIATE')
+            try:
+                filas = self.conexion.execute(
+                    'SELECT tipo, año, url, texto, href_original FROM documentos '
+                    'WHERE estado != ? AND intentos < ? AND (arrendado_hasta IS NULL OR arrendado_hasta < ?) '
+                    'ORDER BY intentos, tipo, año, orden LIMIT ?',
+                    (COMPLETO, max_intentos, ahora, cantidad)
+                ).fetchall()
+                self.conexion.executemany(
+                    'UPDATE documentos SET arrendado_por = ?, arrendado_hasta = ? '
+                    'WHERE tipo = ? AND año = ? AND url = ?',
+                    [(trabajador, ahora + duracion, f['tipo'], f['año'], f['url']) for f in filas]
+                )
+                self.conexion.commit()
+            except BaseException:
+                self.conexion.rollback()
+                raise
+        return [dict(fila) for fila in filas]
+
+    def latido(self, trabajador, duracion):
+        """Registra que `trabajador` sigue activo durante `duracion` segundos más"""
+        with self.lock:
+            self.conexion.execute('INSERT OR REPLACE INTO trabajadores (trabajador, activo_hasta) VALUES (?, ?)',
+                                  (trabajador, time.time() + duracion))
+            self.conexion.commit()
+
+    def retirar(self, trabajador):
+        with self.lock:
+            self.conexion.execute('DELETE FROM trabajadores WHERE trabajador = ?', (trabajador,))
+            self.conexion.commit()
+
+    def trabajadores_activos(self):
+        """Trabajadores con latido vigente, en todas las máquinas que comparten la cola"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT COUNT(*) AS cantidad FROM trabajadores WHERE activo_hasta >= ?',
+                                         (time.time(),)).fetchone()
+        return fila['cantidad']
+
+    def pendientes(self, max_intentos=3):
+        """Documentos que aún pueden descargarse, arrendados o no"""
+        with self.lock:
+            fila = self.conexion.execute(
+                'SELECT COUNT(*) AS cantidad FROM documentos WHERE estado != ? AND intentos < ?',
+                (COMPLETO, max_intentos)
+            ).fetchone()
+        return fila['cantidad']
+
+    def resumen(self):
+        """Cantidad de documentos por (tipo, año, estado)"""
+        with self.lock:
+            filas = self.conexion.execute(
+                'SELECT tipo, año, estado, COUNT(*) AS cantidad FROM documentos GROUP BY tipo, año, estado'
+            ).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def cerrar(self):
+        with self.lock:
+            self.conexion.close()
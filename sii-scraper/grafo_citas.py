@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Grafo de citas entre la normativa descargada y las leyes tributarias
+Cada resolución y circular se enlaza con los artículos que cita ("Art. 14 DL 824") y con las resoluciones o
+circulares que modifica o deja sin efecto. El grafo se guarda como listas de adyacencia hacia adelante y hacia
+atrás, junto con la clausura de "reemplazado por", así que cada consulta es una búsqueda en un diccionario
+"""
+
+import argparse
+import json
+import logging
+import re
+import time
+
+from escritura import escribir_atomico
+from extraccion_texto import cargar_texto
+from indice_texto import plegar_acentos
+from manifiesto import Manifiesto
+from metadatos import CITAS_LEY, LEYES_POR_NOMBRE, leyes_referidas, metadatos_de_pdf
+
+RUTA_GRAFO = 'data/grafo/citas.json'
+
+# Relaciones (origen -> destino)
+CITA = 'cita'
+MODIFICA = 'modifica'
+DEJA_SIN_EFECTO = 'deja_sin_efecto'
+# Las que vuelven obsoleto al destino, total o parcialmente, para la clausura de "reemplazado por"
+RELACIONES_REEMPLAZO = (MODIFICA, DEJA_SIN_EFECTO)
+
+ETIQUETAS = {'resoluciones': 'Resolución', 'circulares': 'Circular'}
+
+# Sobre texto plegado y con los espacios colapsados
+SUFIJO_ARTICULO = r'(?:bis|ter|quater|quinquies|sexies|septies|octies)'
+LISTA_ARTICULOS = re.compile(
+    r'\b(?:articulos?|arts?\.)\s*((?:(?:\d+\s*[°o]?(?:\s*' + SUFIJO_ARTICULO + r')?|letras?\s+[a-z]\)?|'
+    r'inciso\s+\w+|n[°o]s?\s*\.?\s*\d+\)?|numeros?\s+\d+|[ye]\b|,)\s*)+)')
+NUMERO_ARTICULO = re.compile(r'n[°o]s?\s*\.?\s*\d+|numeros?\s+\d+|letras?\s+[a-z]|inciso\s+\w+|'
+                             r'\b(\d+)\s*[°o]?(?:\s*(' + SUFIJO_ARTICULO + r'))?')
+# El cuerpo legal de los artículos va enseguida: "del Código Tributario", "de la LIR", "del D.L. N° 825"
+ANTES_DE_LEY = re.compile(r'\s*,?\s*(?:del|de\s+la|de)\s+')
+ABREVIATURAS = ((re.compile(r'lir\b'), 'DL 824'), (re.compile(r'livs\b'), 'DL 825'))
+# Forma de citar el Código Tributario y las leyes de renta e IVA, no una cita al artículo 1°
+CONTENEDOR = re.compile(r'contenid[oa]s?\s+en\s+(?:el\s+)?$')
+
+# "Déjase sin efecto la Resolución Ex. SII N° 12, de 2019", "modifica la Circular N° 45 del 10.05.2001"
+MODIFICACION = re.compile(
+    r'\b(modifica|complementa|deja|deroga|reemplaza|sustituye)(?:se)?\b(\s+sin\s+efecto)?[^.;]{0,60}?'
+    r'\b(resolucion|circular)(?:es)?\s+(?:exenta\s+|ex\.\s*)?(?:sii\s+)?n[°o]\s*\.?\s*(\d+)\s*,?\s*'
+    r'(?:de|del)\s+(?:fecha\s+)?(?:\d{1,2}[./-]\d{1,2}[./-]|\d{1,2}\s+de\s+[a-z]+\s+(?:de|del)\s+)?(\d{4})')
+RELACION_VERBO = {'modifica': MODIFICA, 'complementa': MODIFICA, 'deja': DEJA_SIN_EFECTO,
+                  'deroga': DEJA_SIN_EFECTO, 'reemplaza': DEJA_SIN_EFECTO, 'sustituye': DEJA_SIN_EFECTO}
+TIPO_VERBO = {'resolucion': 'resoluciones', 'circular': 'circulares'}
+# Lo que el documento dispone; en los vistos y considerandos las modificaciones son de otros
+PARTE_RESOLUTIVA = re.compile(r'\b(?:se\s+)?resuelv[eo]\b|\bse\s+dispone\b|\binstruye\b')
+
+
+def nodo_documento(tipo, numero, año):
+    return f"{ETIQUETAS.get(tipo, tipo)} {numero}/{año}"
+
+
+def nodo_articulo(ley, articulo):
+    return f"{ley} art. {articulo}"
+
+
+def _plegar(texto):
+    return ' '.join(plegar_acentos(texto).split())
+
+
+def _ley_en(texto):
+    """Ley nombrada al comienzo de `texto` (sin anclar al comienzo, la cita sería de otra parte)"""
+    for patron, ley in LEYES_POR_NOMBRE + ABREVIATURAS:
+        if patron.match(texto):
+            return ley
+    for patron, prefijo in CITAS_LEY:
+        coincidencia = patron.match(texto)
+        if coincidencia:
+            numero = coincidencia.group(1).replace('.', '').strip()
+            if numero:
+                return f"{prefijo} {numero}"
+    return None
+
+
+def articulos_citados(texto):
+    """Artículos citados con su cuerpo legal: {('DL 824', '14'), ('DL 830', '60 quinquies'), ...}"""
+    plegado = _plegar(texto)
+    citas = set()
+    for lista in LISTA_ARTICULOS.finditer(plegado):
+        if CONTENEDOR.search(plegado[max(0, lista.start() - 30):lista.start()]):
+            continue
+        conector = ANTES_DE_LEY.match(plegado, lista.end())
+        ley = _ley_en(plegado[conector.end():conector.end() + 80]) if conector else None
+        if ley is None:
+            continue
+        for numero in NUMERO_ARTICULO.finditer(lista.group(1)):
+            if numero.group(1):
+                articulo = numero.group(1).lstrip('0') or '0'
+                citas.add((ley, f"{articulo} {numero.group(2)}" if numero.group(2) else articulo))
+    return citas
+
+
+def modificaciones(texto):
+    """Resoluciones y circulares que el documento modifica o deja sin efecto: {(relación, tipo, número, año)}"""
+    plegado = _plegar(texto)
+    citas = set()
+    for m in MODIFICACION.finditer(plegado):
+        verbo, sin_efecto, tipo, numero, año = m.groups()
+        # "deja" solo cuenta en "deja sin efecto"
+        if verbo == 'deja' and not sin_efecto:
+            continue
+        citas.add((RELACION_VERBO[verbo], TIPO_VERBO[tipo], numero.lstrip('0'), int(año)))
+    return citas
+
+
+def parte_dispositiva(texto):
+    """Desde el primer "resuelvo" / "se resuelve" (todo el texto si no lo hay)"""
+    plegado = _plegar(texto)
+    coincidencia = PARTE_RESOLUTIVA.search(plegado)
+    return plegado[coincidencia.start():] if coincidencia else plegado
+
+
+def clausura(adyacencia, nodo):
+    """Todos los nodos alcanzables desde `nodo` (sin incluirlo)"""
+    vistos = set()
+    pendientes = list(adyacencia.get(nodo, ()))
+    while pendientes:
+        siguiente = pendientes.pop()
+        if siguiente in vistos or siguiente == nodo:
+            continue
+        vistos.add(siguiente)
+        pendientes.extend(adyacencia.get(siguiente, ()))
+    return vistos
+
+
+def parsear_referencia(texto):
+    """Nodo de una consulta libre: "Art. 21 LIR" -> "DL 824 art. 21", "DL 825" -> "DL 825" """
+    articulos = articulos_citados(texto)
+    if not articulos:
+        # "Art. 21 LIR" no lleva "de la"
+        articulos = articulos_citados(re.sub(r'^(\s*(?:art[a-z]*\.?)\s*[\d°º\s]+(?:bis|ter)?)\s+', r'\1 de ',
+                                             texto, flags=re.IGNORECASE))
+    if articulos:
+        return nodo_articulo(*sorted(articulos)[0])
+    leyes = leyes_referidas(texto)
+    if leyes:
+        return leyes[0]
+    return texto.strip()
+
+
+class GrafoCitas:
+    def __init__(self, ruta=RUTA_GRAFO):
+        self.ruta = ruta
+        self._datos = None
+
+    def meta(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _documentos(self, manifiesto):
+        """(nodo, sha256, texto completo) de cada resolución y circular extraída"""
+        for entrada in manifiesto.catalogados():
+            if entrada['tipo'] not in ETIQUETAS:
+                continue
+            extraccion = manifiesto.extraccion(entrada['sha256'])
+            if not extraccion:
+                continue
+            try:
+                paginas = cargar_texto(extraccion['ruta_texto'])['paginas']
+            except (OSError, ValueError) as e:
+                logging.error(f"Error leyendo {extraccion['ruta_texto']}: {str(e)}")
+                continue
+            numero = entrada['numero'] or (metadatos_de_pdf(paginas[0]['texto'])['numero'] if paginas else None)
+            año = entrada['año']
+            if not numero or not año:
+                continue
+            yield (nodo_documento(entrada['tipo'], numero.lstrip('0'), año), entrada['sha256'],
+                   '\n'.join(p['texto'] for p in paginas))
+
+    def construir(self, manifiesto=None):
+        """Extrae las citas de todos los documentos; no hace nada si el corpus no cambió"""
+        inicio = time.perf_counter()
+        manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        hashes = sorted({e['sha256'] for e in manifiesto.catalogados() if e['tipo'] in ETIQUETAS
+                         and manifiesto.extraccion(e['sha256'])})
+        meta = self.meta()
+        if meta and meta['documentos'] == hashes:
+            logging.info("Grafo de citas al día")
+            return {'nodos': len(meta['nodos']), 'aristas': meta['aristas'], 'reconstruido': False}
+
+        aristas = set()
+        for nodo, _, texto in self._documentos(manifiesto):
+            for ley, articulo in articulos_citados(texto):
+                aristas.add((nodo, CITA, nodo_articulo(ley, articulo)))
+            for ley in leyes_referidas(texto):
+                aristas.add((nodo, CITA, ley))
+            for relacion, tipo, numero, año in modificaciones(parte_dispositiva(texto)):
+                destino = nodo_documento(tipo, numero, año)
+                if destino != nodo:
+                    aristas.add((nodo, relacion, destino))
+
+        # Listas de adyacencia sobre ids enteros: compacto en disco y en memoria
+        nodos = sorted({a[0] for a in aristas} | {a[2] for a in aristas})
+        ids = {nodo: i for i, nodo in enumerate(nodos)}
+        adelante = {}
+        atras = {}
+        for origen, relacion, destino in sorted(aristas):
+            adelante.setdefault(relacion, {}).setdefault(ids[origen], []).append(ids[destino])
+            atras.setdefault(relacion, {}).setdefault(ids[destino], []).append(ids[origen])
+
+        # Reemplazado por: quien modifica o deja sin efecto al nodo, y a su vez a quien lo modificó, etc.
+        reemplazos = {}
+        for relacion in RELACIONES_REEMPLAZO:
+            for destino, origenes in atras.get(relacion, {}).items():
+                reemplazos.setdefault(destino, set()).update(origenes)
+        reemplazado_por = {destino: sorted(clausura(reemplazos, destino)) for destino in reemplazos}
+
+        datos = {
+            'documentos': hashes,
+            'nodos': nodos,
+            'aristas': len(aristas),
+            # Las claves de JSON son texto: se guardan como listas [id, [destinos]]
+            'adelante': {r: sorted(a.items()) for r, a in adelante.items()},
+            'atras': {r: sorted(a.items()) for r, a in atras.items()},
+            'reemplazado_por': sorted(reemplazado_por.items())
+        }
+        escribir_atomico([json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')], self.ruta)
+        self._datos = None
+        resultados = {'nodos': len(nodos), 'aristas': len(aristas), 'reconstruido': True,
+                      'segundos': round(time.perf_counter() - inicio, 2)}
+        logging.info(f"Grafo de citas construido: {resultados}")
+        return resultados
+
+    def _cargar(self):
+        if self._datos is not None:
+            return self._datos
+        meta = self.meta()
+        if meta is None:
+            raise FileNotFoundError(f"No existe grafo de citas en {self.ruta}; ejecute 'construir'")
+        nodos = meta['nodos']
+
+        def expandir(pares):
+            return {nodos[i]: [nodos[j] for j in destinos] for i, destinos in pares}
+
+        self._datos = {
+            'nodos': set(nodos),
+            'adelante': {r: expandir(pares) for r, pares in meta['adelante'].items()},
+            'atras': {r: expandir(pares) for r, pares in meta['atras'].items()},
+            'reemplazado_por': expandir(meta['reemplazado_por'])
+        }
+        return self._datos
+
+    def citados_por(self, nodo, relacion=CITA):
+        """Lo que `nodo` cita (o modifica, o deja sin efecto)"""
+        return self._cargar()['adelante'].get(relacion, {}).get(nodo, [])
+
+    def citantes(self, nodo, relacion=CITA):
+        """Documentos que citan (o modifican, o dejan sin efecto) a `nodo`"""
+        return self._cargar()['atras'].get(relacion, {}).get(nodo, [])
+
+    def reemplazado_por(self, nodo):
+        """Todos los documentos que modifican o dejan sin efecto a `nodo`, directa o transitivamente"""
+        return self._cargar()['reemplazado_por'].get(nodo, [])
+
+    def vigente(self, nodo):
+        """False si algún documento lo dejó sin efecto"""
+        return not self.citantes(nodo, DEJA_SIN_EFECTO)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Grafo de citas entre la normativa y las leyes tributarias")
+    parser.add_argument('--grafo', default=RUTA_GRAFO, help="Archivo del grafo (por defecto: data/grafo/citas.json)")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('construir', help="Extraer las citas de los textos extraídos")
+    citantes = subparsers.add_parser('citantes', help="Documentos que citan un artículo o una ley")
+    citantes.add_argument('referencia', help='"Art. 21 LIR", "artículo 14 del DL 824", "DL 825", "Resolución 12/2019"')
+    citados = subparsers.add_parser('citados', help="Lo que cita, modifica o deja sin efecto un documento")
+    citados.add_argument('documento', help='"Resolución 115/2023", "Circular 45/2001"')
+    reemplazos = subparsers.add_parser('reemplazos', help="Documentos que reemplazan a otro, transitivamente")
+    reemplazos.add_argument('documento')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    grafo = GrafoCitas(args.grafo)
+
+    if args.comando == 'construir':
+        resultados = grafo.construir()
+        print(f"✅ {resultados['nodos']} nodos, {resultados['aristas']} citas")
+        return
+
+    inicio = time.perf_counter()
+    if args.comando == 'citantes':
+        nodo = parsear_referencia(args.referencia)
+        resultados = {relacion: grafo.citantes(nodo, relacion) for relacion in (CITA,) + RELACIONES_REEMPLAZO}
+    elif args.comando == 'citados':
+        nodo = args.documento
+        resultados = {relacion: grafo.citados_por(nodo, relacion) for relacion in (CITA,) + RELACIONES_REEMPLAZO}
+    else:
+        nodo = args.documento
+        resultados = {'reemplazado_por': grafo.reemplazado_por(nodo)}
+    milisegundos = (time.perf_counter() - inicio) * 1000
+
+    print(f"🔗 {nodo}")
+    for relacion, nodos in resultados.items():
+        if nodos:
+            print(f"\n{relacion} ({len(nodos)}):")
+            for otro in nodos:
+                print(f"  {otro}")
+    print(f"\n{sum(len(n) for n in resultados.values())} resultados en {milisegundos:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Índice invertido de texto completo (SQLite FTS5) sobre resoluciones, circulares y leyes extraídas
+Plegado de acentos, stemming liviano en español y ranking BM25; consulta por CLI o endpoint HTTP local
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from extraccion_texto import cargar_texto
+from manifiesto import Manifiesto, clasificar_ruta
+
+RUTA_INDICE = 'data/indice_texto.db'
+
+# Sufijos del stemmer; se prueban de más largo a más corto y se quita el primero que calce
+SUFIJOS = tuple(sorted({
+    'amientos', 'imientos', 'aciones', 'uciones', 'amiento', 'imiento', 'idades', 'ancias', 'encias',
+    'ciones', 'mente', 'acion', 'ucion', 'ables', 'ibles', 'istas', 'ismos', 'ancia', 'encia', 'idad',
+    'able', 'ible', 'ista', 'ismo', 'osos', 'osas', 'ivos', 'ivas', 'ores', 'cion',
+    'oso', 'osa', 'ivo', 'iva', 'es', 'os', 'as', 'or', 'a', 'o', 'e', 's'
+}, key=len, reverse=True))
+
+# Palabras demasiado frecuentes en la normativa para aportar al ranking
+STOPWORDS = frozenset('''
+    a al ante con contra de del desde e el en entre es la las le les lo los mas o para por que se
+    segun sin sobre su sus un una uno unos unas y
+'''.split())
+
+TOKEN = re.compile(r'\w+')
+
+
+def plegar_acentos(texto):
+    """Minúsculas sin tildes ni diéresis (á -> a, ñ -> n, ü -> u)"""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def raiz(palabra):
+    """Stemmer liviano para español: quita el sufijo más largo dejando una raíz de al menos 3 letras"""
+    if palabra.isdigit():
+        return palabra
+    for sufijo in SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= 3:
+            return palabra[:-len(sufijo)]
+    return palabra
+
+
+def analizar(texto):
+    """Convierte un texto en la lista de términos indexables"""
+    return [raiz(t) for t in TOKEN.findall(plegar_acentos(texto)) if t not in STOPWORDS]
+
+
+def version_extraccion(extraccion):
+    """Identifica una extracción: cambia si el documento se vuelve a extraer (otro extractor u OCR)"""
+    return f"{extraccion['extractor']}|{extraccion['extraido_en']}"
+
+
+class IndiceTexto:
+    def __init__(self, ruta=RUTA_INDICE):
+        self.ruta = ruta
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        # Compartido por los hilos del endpoint HTTP
+        self.lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.executescript('''
+            CREATE TABLE IF NOT EXISTS documentos (
+                sha256 TEXT PRIMARY KEY,
+                ruta TEXT NOT NULL,
+                tipo TEXT,
+                año INTEGER,
+                version TEXT
+            );
+            CREATE TABLE IF NOT EXISTS paginas (
+                id INTEGER PRIMARY KEY,
+                sha256 TEXT NOT NULL REFERENCES documentos (sha256),
+                pagina INTEGER NOT NULL,
+                texto TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_paginas_sha256 ON paginas (sha256);
+            -- Los términos ya vienen plegados y con stemming; unicode61 solo separa tokens
+            CREATE VIRTUAL TABLE IF NOT EXISTS paginas_fts USING fts5 (
+                terminos,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+        ''')
+        # Índices creados antes de registrar la versión de cada extracción: se reindexan en el próximo construir
+        columnas = {fila['name'] for fila in self.conexion.execute('PRAGMA table_info(documentos)')}
+        if 'version' not in columnas:
+            self.conexion.execute('ALTER TABLE documentos ADD COLUMN version TEXT')
+        self.conexion.commit()
+
+    def _eliminar(self, sha256):
+        self.conexion.execute(
+            'DELETE FROM paginas_fts WHERE rowid IN (SELECT id FROM paginas WHERE sha256 = ?)', (sha256,))
+        self.conexion.execute('DELETE FROM paginas WHERE sha256 = ?', (sha256,))
+        self.conexion.execute('DELETE FROM documentos WHERE sha256 = ?', (sha256,))
+
+    def agregar(self, sha256, ruta, documento, version=None):
+        """Indexa todas las páginas de un documento extraído"""
+        tipo, año = clasificar_ruta(ruta)
+        self._eliminar(sha256)
+        self.conexion.execute('INSERT INTO documentos (sha256, ruta, tipo, año, version) VALUES (?, ?, ?, ?, ?)',
+                              (sha256, ruta, tipo, año, version))
+        for pagina in documento['paginas']:
+            if not pagina['texto']:
+                continue
+            cursor = self.conexion.execute('INSERT INTO paginas (sha256, pagina, texto) VALUES (?, ?, ?)',
+                                           (sha256, pagina['numero'], pagina['texto']))
+            self.conexion.execute('INSERT INTO paginas_fts (rowid, terminos) VALUES (?, ?)',
+                                  (cursor.lastrowid, ' '.join(analizar(pagina['texto']))))
+
+    def construir(self, manifiesto=None):
+        """Sincroniza el índice con las extracciones del manifiesto: agrega las nuevas, reindexa las que se
+        volvieron a extraer (--forzar, OCR) y quita las obsoletas
+        """
+        inicio = time.perf_counter()
+        manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        extracciones = {e['sha256']: e for e in manifiesto.extracciones()}
+        indexados = {fila['sha256']: fila['version']
+                     for fila in self.conexion.execute('SELECT sha256, version FROM documentos')}
+
+        nuevos = [e for sha256, e in extracciones.items() if indexados.get(sha256) != version_extraccion(e)]
+        obsoletos = set(indexados) - set(extracciones)
+
+        with self.conexion:
+            for sha256 in obsoletos:
+                self._eliminar(sha256)
+            for extraccion in nuevos:
+                try:
+                    documento = cargar_texto(extraccion['ruta_texto'])
+                except (OSError, ValueError) as e:
+                    logging.error(f"Error leyendo {extraccion['ruta_texto']}: {str(e)}")
+                    continue
+                self.agregar(extraccion['sha256'], extraccion['ruta_pdf'], documento, version_extraccion(extraccion))
+
+        if nuevos or obsoletos:
+            self.conexion.execute("INSERT INTO paginas_fts (paginas_fts) VALUES ('optimize')")
+            self.conexion.commit()
+
+        resultados = {'agregados': len(nuevos), 'eliminados': len(obsoletos),
+                      'total': len(extracciones),
+                      'segundos': round(time.perf_counter() - inicio, 2)}
+        logging.info(f"Índice de texto actualizado: {resultados}")
+        return resultados
+
+    def buscar(self, consulta, limite=10, tipo=None, año=None):
+        """Retorna las páginas más relevantes para la consulta, ordenadas por BM25"""
+        terminos = analizar(consulta)
+        if not terminos:
+            return []
+        expresion = ' '.join(f'"{t}"' for t in terminos)
+
+        sql = '''
+            SELECT d.ruta, d.tipo, d.año, p.pagina, p.texto, bm25(paginas_fts) AS puntaje
+            FROM paginas_fts
+            JOIN paginas p ON p.id = paginas_fts.rowid
+            JOIN documentos d ON d.sha256 = p.sha256
+            WHERE paginas_fts MATCH ?
+        '''
+        parametros = [expresion]
+        if tipo:
+            sql += ' AND d.tipo = ?'
+            parametros.append(tipo)
+        if año:
+            sql += ' AND d.año = ?'
+            parametros.append(año)
+        sql += ' ORDER BY puntaje LIMIT ?'
+        parametros.append(limite)
+
+        with self.lock:
+            filas = self.conexion.execute(sql, parametros).fetchall()
+        return [{
+            'ruta': fila['ruta'],
+            'tipo': fila['tipo'],
+            'año': fila['año'],
+            'pagina': fila['pagina'],
+            'puntaje': round(-fila['puntaje'], 4),
+            'fragmento': fragmento(fila['texto'], terminos)
+        } for fila in filas]
+
+
+def fragmento(texto, terminos, ancho=160):
+    """Extracto del texto alrededor de la primera aparición de algún término"""
+    plegado = plegar_acentos(texto)
+    posiciones = [plegado.find(t) for t in terminos]
+    posiciones = [p for p in posiciones if p >= 0]
+    centro = min(posiciones) if posiciones else 0
+    inicio = max(0, centro - ancho // 2)
+    extracto = texto[inicio:inicio + ancho].replace('\n', ' ')
+    return ('…' if inicio else '') + extracto + ('…' if inicio + ancho < len(texto) else '')
+
+
+def crear_servidor(indice, puerto):
+    """Endpoint HTTP local: GET /buscar?q=...&n=10&tipo=resoluciones&año=2023 (puerto 0: uno libre)"""
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/buscar':
+                self.send_error(404)
+                return
+            parametros = parse_qs(url.query)
+            año = parametros.get('año', [None])[0]
+            limite = parametros.get('n', ['10'])[0]
+            if not limite.isdigit() or int(limite) == 0:
+                self.responder(400, {'error': f"n debe ser un entero positivo, no {limite!r}"})
+                return
+            inicio = time.perf_counter()
+            resultados = indice.buscar(
+                parametros.get('q', [''])[0],
+                limite=int(limite),
+                tipo=parametros.get('tipo', [None])[0],
+                año=int(año) if año and año.isdigit() else None
+            )
+            self.responder(200, {
+                'resultados': resultados,
+                'milisegundos': round((time.perf_counter() - inicio) * 1000, 2)
+            })
+
+        def responder(self, estado, datos):
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+            self.send_response(estado)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            logging.debug(formato % args)
+
+    return ThreadingHTTPServer(('127.0.0.1', puerto), Manejador)
+
+
+def servir(indice, puerto):
+    """Atiende búsquedas hasta Ctrl+C"""
+    servidor = crear_servidor(indice, puerto)
+    print(f"🔎 Índice de normativa en http://127.0.0.1:{servidor.server_address[1]}/buscar?q=...")
+    servidor.serve_forever()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Índice de texto completo de la normativa descargada")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('construir', help="Agregar al índice los textos extraídos nuevos")
+    buscar = subparsers.add_parser('buscar', help="Buscar un término o frase")
+    buscar.add_argument('consulta')
+    buscar.add_argument('-n', '--limite', type=int, default=10)
+    buscar.add_argument('--tipo', choices=['resoluciones', 'circulares', 'leyes'])
+    buscar.add_argument('--año', type=int)
+    servidor = subparsers.add_parser('servir', help="Exponer la búsqueda en un endpoint HTTP local")
+    servidor.add_argument('--puerto', type=int, default=8765)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    indice = IndiceTexto()
+
+    if args.comando == 'construir':
+        resultados = indice.construir()
+        print(f"✅ Agregados: {resultados['agregados']}  🗑️  Eliminados: {resultados['eliminados']}  "
+              f"📄 Total: {resultados['total']}")
+    elif args.comando == 'buscar':
+        inicio = time.perf_counter()
+        resultados = indice.buscar(args.consulta, args.limite, args.tipo, args.año)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        for r in resultados:
+            print(f"{r['puntaje']:8.3f}  {r['ruta']} (p. {r['pagina']})\n          {r['fragmento']}")
+        print(f"\n{len(resultados)} resultados en {milisegundos:.1f} ms")
+    elif args.comando == 'servir':
+        servir(indice, args.puerto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Índice vectorial para recuperar pasajes de la normativa extraída
+Divide los textos en fragmentos por artículo, los embebe por lotes en CPU y los guarda
+en una matriz NumPy memory-mapped con búsqueda top-k por similitud coseno
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+
+import numpy as np
+
+from escritura import escribir_atomico
+from extraccion_texto import cargar_texto
+from indice_texto import analizar
+from manifiesto import Manifiesto, clasificar_ruta
+
+CARPETA_VECTORES = 'data/vectores'
+
+# Encabezados de artículo en las leyes (DL 824, 825, 830...): "Artículo 14", "ARTÍCULO 21 bis.-", "Art. 3°"
+ENCABEZADO_ARTICULO = re.compile(
+    r'^\s*(?:Art[íi]culo|ART[ÍI]CULO|Art\.)\s+(\d+\s*(?:bis|ter|qu[áa]ter|quinquies)?)\s*[°º]?',
+    re.MULTILINE
+)
+
+MAX_CARACTERES = 1500
+SOLAPE = 200
+
+# Modelo por defecto cuando sentence-transformers está instalado (multilingüe, corre en CPU)
+MODELO_POR_DEFECTO = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+
+class EmbebedorHashing:
+    """Embeddings locales sin modelo: hashing de términos (unigramas y bigramas) con tf sublineal
+
+    Es un respaldo léxico (parecido a TF-IDF), no semántico: encuentra pasajes con las mismas palabras, no sinónimos
+    """
+
+    def __init__(self, dimension=1024):
+        self.dimension = dimension
+        self.nombre = f"hashing-{dimension}"
+
+    def _indice(self, termino):
+        digest = hashlib.blake2b(termino.encode('utf-8'), digest_size=8).digest()
+        valor = int.from_bytes(digest, 'little')
+        # El bit más alto define el signo para que las colisiones se cancelen en promedio
+        return valor % self.dimension, 1.0 if valor >> 63 else -1.0
+
+    def embeber(self, textos):
+        matriz = np.zeros((len(textos), self.dimension), dtype=np.float32)
+        for fila, texto in enumerate(textos):
+            terminos = analizar(texto)
+            terminos += [f"{a} {b}" for a, b in zip(terminos, terminos[1:])]
+            conteos = {}
+            for termino in terminos:
+                conteos[termino] = conteos.get(termino, 0) + 1
+            for termino, conteo in conteos.items():
+                columna, signo = self._indice(termino)
+                matriz[fila, columna] += signo * (1.0 + np.log(conteo))
+        return _normalizar(matriz)
+
+
+class EmbebedorSentenceTransformers:
+    """Modelo local de sentence-transformers ejecutado en CPU (dependencia opcional)"""
+
+    def __init__(self, modelo):
+        from sentence_transformers import SentenceTransformer
+
+        self.modelo = SentenceTransformer(modelo, device='cpu')
+        self.dimension = self.modelo.get_sentence_embedding_dimension()
+        self.nombre = modelo
+
+    def embeber(self, textos):
+        matriz = self.modelo.encode(textos, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+        return _normalizar(matriz.astype(np.float32))
+
+
+def _normalizar(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+def crear_embebedor(modelo=None):
+    """Embebedor por nombre: 'hashing' es el respaldo léxico; cualquier otro nombre, un modelo de
+    sentence-transformers. None usa MODELO_POR_DEFECTO si sentence-transformers está instalado, si no hashing
+    """
+    if modelo and modelo.startswith('hashing'):
+        return EmbebedorHashing()
+    if modelo:
+        return EmbebedorSentenceTransformers(modelo)
+    try:
+        return EmbebedorSentenceTransformers(MODELO_POR_DEFECTO)
+    except ImportError:
+        logging.warning("sentence-transformers no está instalado: se usa el embebedor léxico por hashing "
+                        "(pip install sentence-transformers para búsqueda semántica)")
+        return EmbebedorHashing()
+    except OSError as e:
+        # Sin red ni modelo en caché: los errores de descarga del hub (HTTP, modo offline) derivan de OSError
+        logging.warning(f"No se pudo cargar el modelo {MODELO_POR_DEFECTO} ({e.__class__.__name__}: {e}): "
+                        f"se usa el embebedor léxico por hashing")
+        return EmbebedorHashing()
+
+
+def version_textos(extracciones):
+    """Huella de los textos a indexar: cambia si cambia un documento o se vuelve a extraer (OCR, otro extractor)"""
+    h = hashlib.sha256()
+    for extraccion in sorted(extracciones, key=lambda e: e['sha256']):
+        h.update(f"{extraccion['sha256']}|{extraccion['extractor']}|{extraccion['extraido_en']}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+def _ventanas(texto, max_caracteres=MAX_CARACTERES, solape=SOLAPE):
+    """Divide un texto largo en ventanas con solape, cortando preferentemente entre párrafos"""
+    texto = texto.strip()
+    if len(texto) <= max_caracteres:
+        return [texto] if texto else []
+    ventanas = []
+    inicio = 0
+    while inicio < len(texto):
+        fin = min(len(texto), inicio + max_caracteres)
+        if fin < len(texto):
+            corte = texto.rfind('\n', inicio + max_caracteres // 2, fin)
+            if corte > 0:
+                fin = corte
+        ventanas.append(texto[inicio:fin].strip())
+        if fin >= len(texto):
+            break
+        inicio = max(fin - solape, inicio + 1)
+    return [v for v in ventanas if v]
+
+
+def fragmentar(documento):
+    """Divide un documento extraído en fragmentos por artículo (o por ventanas si no tiene artículos)"""
+    # Texto completo con el inicio de cada página, para saber dónde cae cada fragmento
+    partes = []
+    inicios_pagina = []
+    posicion = 0
+    for pagina in documento['paginas']:
+        inicios_pagina.append((posicion, pagina['numero']))
+        partes.append(pagina['texto'])
+        posicion += len(pagina['texto']) + 1
+    texto = '\n'.join(partes)
+
+    def pagina_de(offset):
+        numero = 1
+        for inicio, pagina in inicios_pagina:
+            if inicio > offset:
+                break
+            numero = pagina
+        return numero
+
+    encabezados = list(ENCABEZADO_ARTICULO.finditer(texto))
+    secciones = []
+    if encabezados:
+        if encabezados[0].start() > 0:
+            secciones.append((None, 0, encabezados[0].start()))
+        for i, encabezado in enumerate(encabezados):
+            fin = encabezados[i + 1].start() if i + 1 < len(encabezados) else len(texto)
+            articulo = re.sub(r'\s+', ' ', encabezado.group(1)).strip()
+            secciones.append((articulo, encabezado.start(), fin))
+    else:
+        secciones.append((None, 0, len(texto)))
+
+    fragmentos = []
+    for articulo, inicio, fin in secciones:
+        seccion = texto[inicio:fin]
+        desplazamiento = 0
+        for ventana in _ventanas(seccion):
+            offset = seccion.find(ventana[:50], desplazamiento)
+            desplazamiento = max(offset, desplazamiento)
+            fragmentos.append({
+                'articulo': articulo,
+                'pagina': pagina_de(inicio + max(offset, 0)),
+                'texto': ventana
+            })
+    return fragmentos
+
+
+class IndiceVectorial:
+    def __init__(self, carpeta=CARPETA_VECTORES):
+        self.carpeta = carpeta
+        self.ruta_matriz = os.path.join(carpeta, 'matriz.f32')
+        self.ruta_fragmentos = os.path.join(carpeta, 'fragmentos.jsonl')
+        self.ruta_meta = os.path.join(carpeta, 'meta.json')
+        self._matriz = None
+        self._fragmentos = None
+        self._embebedor = None
+
+    def meta(self):
+        try:
+            with open(self.ruta_meta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def construir(self, manifiesto=None, modelo=None, tamaño_lote=256):
+        """Fragmenta y embebe todas las extracciones; no hace nada si los textos y el modelo no cambiaron"""
+        inicio = time.perf_counter()
+        manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        extracciones = sorted(manifiesto.extracciones(), key=lambda e: e['ruta_pdf'] or '')
+        hashes = sorted(e['sha256'] for e in extracciones)
+        version = version_textos(extracciones)
+        embebedor = crear_embebedor(modelo)
+
+        meta = self.meta()
+        if meta and meta.get('textos') == version and meta['modelo'] == embebedor.nombre:
+            logging.info("Índice vectorial al día")
+            return {'fragmentos': meta['fragmentos'], 'documentos': len(hashes), 'reconstruido': False}
+
+        fragmentos = []
+        for extraccion in extracciones:
+            try:
+                documento = cargar_texto(extraccion['ruta_texto'])
+            except (OSError, ValueError) as e:
+                logging.error(f"Error leyendo {extraccion['ruta_texto']}: {str(e)}")
+                continue
+            tipo, año = clasificar_ruta(extraccion['ruta_pdf'])
+            for fragmento in fragmentar(documento):
+                fragmento.update({'sha256': extraccion['sha256'], 'ruta': extraccion['ruta_pdf'],
+                                  'tipo': tipo, 'año': año})
+                fragmentos.append(fragmento)
+
+        os.makedirs(self.carpeta, exist_ok=True)
+        ruta_temporal = self.ruta_matriz + '.part'
+        matriz = np.memmap(ruta_temporal, dtype=np.float32, mode='w+',
+                           shape=(max(len(fragmentos), 1), embebedor.dimension))
+        for desde in range(0, len(fragmentos), tamaño_lote):
+            lote = fragmentos[desde:desde + tamaño_lote]
+            matriz[desde:desde + len(lote)] = embebedor.embeber([f['texto'] for f in lote])
+        matriz.flush()
+        del matriz
+        os.replace(ruta_temporal, self.ruta_matriz)
+
+        lineas = ''.join(json.dumps(f, ensure_ascii=False) + '\n' for f in fragmentos)
+        escribir_atomico([lineas.encode('utf-8')], self.ruta_fragmentos)
+        meta = {'modelo': embebedor.nombre, 'dimension': embebedor.dimension,
+                'fragmentos': len(fragmentos), 'documentos': hashes, 'textos': version}
+        escribir_atomico([json.dumps(meta).encode('utf-8')], self.ruta_meta)
+
+        self._matriz = self._fragmentos = None
+        resultados = {'fragmentos': len(fragmentos), 'documentos': len(hashes), 'reconstruido': True,
+                      'segundos': round(time.perf_counter() - inicio, 2)}
+        logging.info(f"Índice vectorial construido: {resultados}")
+        return resultados
+
+    def _cargar(self):
+        if self._matriz is not None:
+            return
+        meta = self.meta()
+        if meta is None:
+            raise FileNotFoundError(f"No existe índice vectorial en {self.carpeta}; ejecute 'construir'")
+        # Solo lectura y mapeada: el sistema operativo pagina la matriz según se use
+        self._matriz = np.memmap(self.ruta_matriz, dtype=np.float32, mode='r',
+                                 shape=(max(meta['fragmentos'], 1), meta['dimension']))[:meta['fragmentos']]
+        with open(self.ruta_fragmentos, 'r', encoding='utf-8') as f:
+            self._fragmentos = [json.loads(linea) for linea in f]
+        self._embebedor = crear_embebedor(meta['modelo'])
+
+    def buscar(self, consulta, k=5, tipo=None):
+        """Los k fragmentos más similares (coseno) a la consulta"""
+        self._cargar()
+        if not len(self._fragmentos):
+            return []
+        vector = self._embebedor.embeber([consulta])[0]
+        puntajes = self._matriz @ vector
+        if tipo:
+            mascara = np.array([f['tipo'] == tipo for f in self._fragmentos])
+            puntajes = np.where(mascara, puntajes, -np.inf)
+
+        k = min(k, len(puntajes))
+        candidatos = np.argpartition(-puntajes, k - 1)[:k]
+        mejores = candidatos[np.argsort(-puntajes[candidatos])]
+        return [dict(self._fragmentos[i], puntaje=round(float(puntajes[i]), 4))
+                for i in mejores if np.isfinite(puntajes[i])]
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Índice vectorial de la normativa descargada")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    construir = subparsers.add_parser('construir', help="Fragmentar y embeber los textos extraídos")
+    construir.add_argument('--modelo',
+                           help=f"Modelo de sentence-transformers (por defecto: {MODELO_POR_DEFECTO} si está "
+                                f"instalado; si no, 'hashing': respaldo léxico por hashing de términos, no semántico)")
+    buscar = subparsers.add_parser('buscar', help="Pasajes más similares a una consulta")
+    buscar.add_argument('consulta')
+    buscar.add_argument('-k', type=int, default=5)
+    buscar.add_argument('--tipo', choices=['resoluciones', 'circulares', 'leyes'])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    indice = IndiceVectorial()
+
+    if args.comando == 'construir':
+        resultados = indice.construir(modelo=args.modelo)
+        print(f"✅ {resultados['fragmentos']} fragmentos de {resultados['documentos']} documentos")
+    elif args.comando == 'buscar':
+        inicio = time.perf_counter()
+        resultados = indice.buscar(args.consulta, args.k, args.tipo)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        for r in resultados:
+            articulo = f" Art. {r['articulo']}" if r['articulo'] else ''
+            print(f"{r['puntaje']:.3f}  {r['ruta']} (p. {r['pagina']}){articulo}\n       {r['texto'][:200]!r}")
+        print(f"\n{len(resultados)} resultados en {milisegundos:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
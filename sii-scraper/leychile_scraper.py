@@ -4,32 +4,79 @@ Scraper para descargar leyes tributarias desde LeyChile.cl
 Descarga automáticamente todas las leyes referenciadas por el SII
 """
 
-import requests
+import argparse
+import difflib
+import hashlib
 import os
+import re
 import time
 import logging
 from datetime import datetime
-from bs4 import BeautifulSoup
+from lxml import etree
 from urllib.parse import urljoin
 import json
+from concurrent.futures import ThreadPoolExecutor
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/leychile_scraper.log'),
-        logging.StreamHandler()
-    ]
-)
-
-class LeyChileScraper:
-    def __init__(self):
-        self.base_url = "https://www.bcn.cl"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+from escritura import escribir_atomico
+from nucleo_scraper import ScraperBase, configurar_logging
+
+# Versión estructurada (XML) de una norma, con sus artículos y la fecha de versión de cada uno
+URL_XML_LEYCHILE = "https://www.leychile.cl/Consulta/obtxml?opt=7&idNorma={id_norma}"
+CARPETA_CAMBIOS = 'data/cambios_leyes'
+
+NOMBRE_ARTICULO = re.compile(r'^\s*art[ií]culo\s+([\w°º]+(?:\s+(?:bis|ter|quater|transitorio))?)', re.I)
+
+
+def _texto_de(elemento):
+    """Texto de un nodo <Texto> conservando los saltos de línea y sin espacios sobrantes"""
+    lineas = (' '.join(linea.split()) for linea in ''.join(elemento.itertext()).splitlines())
+    return '\n'.join(linea for linea in lineas if linea)
+
+
+def articulos_de_xml(contenido):
+    """Fecha de versión de la norma y lista de artículos (idParte, nombre, versión, derogado, texto y hash)"""
+    raiz = etree.fromstring(contenido, parser=etree.XMLParser(resolve_entities=False, no_network=True))
+    articulos = []
+    for parte in raiz.iter('{*}EstructuraFuncional'):
+        if (parte.get('tipoParte') or '').lower() not in ('artículo', 'articulo'):
+            continue
+        nodo_texto = parte.find('{*}Texto')
+        texto = _texto_de(nodo_texto) if nodo_texto is not None else ''
+        nombre = ' '.join((parte.findtext('{*}Metadatos/{*}NombreParte') or '').split())
+        if not nombre:
+            coincidencia = NOMBRE_ARTICULO.match(texto)
+            nombre = coincidencia.group(1) if coincidencia else ''
+        if parte.get('transitorio') == 'transitorio' and 'transitorio' not in nombre.lower():
+            nombre = f"{nombre} transitorio".strip()
+        articulos.append({
+            'id_parte': parte.get('idParte') or nombre,
+            'articulo': nombre,
+            'fecha_version': parte.get('fechaVersion'),
+            'derogado': (parte.get('derogado') or '').lower() == 'derogado',
+            'texto': texto,
+            'sha256': hashlib.sha256(texto.encode('utf-8')).hexdigest()
         })
+    return {'fecha_version': raiz.get('fechaVersion'), 'articulos': articulos}
+
+
+def diferencia(anterior, nuevo, etiqueta):
+    """Diff unificado entre dos versiones del texto de un artículo"""
+    return '\n'.join(difflib.unified_diff((anterior or '').splitlines(), (nuevo or '').splitlines(),
+                                           fromfile=f"{etiqueta} (anterior)", tofile=etiqueta, lineterm=''))
+
+
+class LeyChileScraper(ScraperBase):
+    nombre = 'leyes'
+    dominios = ('bcn.cl', 'leychile.cl')
+    
+    def __init__(self, max_workers=2, solicitudes_por_segundo=0.5, manifiesto=None, **kwargs):
+        # 0.5 solicitudes por segundo mantiene la pausa de 2 segundos que se usaba entre leyes
+        super().__init__(max_workers=max_workers, solicitudes_por_segundo=solicitudes_por_segundo,
+                         manifiesto=manifiesto, **kwargs)
+        self.base_url = "https://www.bcn.cl"
+        self.url_xml = URL_XML_LEYCHILE
+        # Motivo del último fallo de cada ley, para el reporte
+        self.motivos_fallo = {}
         
         # Leyes tributarias principales referenciadas por el SII
         self.leyes_tributarias = {
@@ -82,32 +129,38 @@ class LeyChileScraper:
     
     def descargar_pdf_ley(self, ley_info):
         """Descarga el PDF de una ley específica"""
+        # bs4 solo se usa aquí: importarlo al cargar el módulo encarece cada arranque
+        from bs4 import BeautifulSoup
+
         try:
             logging.info(f"Descargando: {ley_info['nombre']}")
             
             # Obtener la página de la ley
-            response = self.session.get(ley_info['url'])
+            response = self.obtener(ley_info['url'])
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Buscar el enlace al PDF
-            pdf_link = None
-            
-            # Buscar diferentes patrones de enlaces PDF
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if 'pdf' in href.lower() or 'descargar' in link.text.lower():
-                    pdf_link = href
-                    break
-            
-            # Si no encuentra enlace directo, buscar por ID común
-            if not pdf_link:
-                pdf_element = soup.find('a', {'id': 'linkPdf'})
-                if pdf_element:
-                    pdf_link = pdf_element['href']
+            with self.metricas.cronometro('parseo'):
+                soup = BeautifulSoup(response.content, 'html.parser')
+                
+                # Buscar el enlace al PDF
+                pdf_link = None
+                
+                # Buscar diferentes patrones de enlaces PDF
+                for link in soup.find_all('a', href=True):
+                    href = link['href']
+                    if 'pdf' in href.lower() or 'descargar' in link.text.lower():
+                        pdf_link = href
+                        break
+                
+                # Si no encuentra enlace directo, buscar por ID común
+                if not pdf_link:
+                    pdf_element = soup.find('a', {'id': 'linkPdf'})
+                    if pdf_element:
+                        pdf_link = pdf_element['href']
             
             if not pdf_link:
+                # La página de LeyChile arma el enlace con JavaScript; la versión XML no depende de eso
+                self.motivos_fallo[ley_info['id']] = "La página no tiene enlace al PDF (usar --sincronizar)"
                 logging.warning(f"No se encontró enlace PDF para {ley_info['nombre']}")
                 return False
             
@@ -117,21 +170,38 @@ class LeyChileScraper:
             else:
                 pdf_url = pdf_link
             
-            # Descargar el PDF
-            pdf_response = self.session.get(pdf_url)
-            pdf_response.raise_for_status()
+            # Nombre del archivo dentro de leyes/
+            nombre = f"{ley_info['id']}_{ley_info['nombre'].replace(' ', '_').replace('-', '_')}.pdf"
+            nombre = nombre.replace('/', '_').replace('\\', '_')  # Limpiar caracteres problemáticos
+            filename = os.path.join('leyes', nombre)
             
-            # Guardar el archivo
-            filename = f"leyes/{ley_info['id']}_{ley_info['nombre'].replace(' ', '_').replace('-', '_')}.pdf"
-            filename = filename.replace('/', '_').replace('\\', '_')  # Limpiar caracteres problemáticos
-            
-            with open(filename, 'wb') as f:
-                f.write(pdf_response.content)
+            # Descargar el PDF por bloques (la sesión lo revalida si ya está en el manifiesto)
+            with self.session.get(pdf_url, stream=True) as pdf_response:
+                if pdf_response.status_code == 304:
+                    logging.info(f"Sin cambios: {ley_info['nombre']}")
+                    return True
+                pdf_response.raise_for_status()
+                
+                tiempos = {}
+                sha256, tamaño = self.almacen.guardar_respuesta(pdf_response, tiempos=tiempos)
+                self.almacen.registrar(pdf_url, sha256, filename, numero=ley_info['id'])
+                self.metricas.observar_etapas(tiempos)
+                self.metricas.incrementar('bytes_descargados', tamaño)
+                
+                self.manifiesto.registrar(
+                    pdf_url,
+                    etag=pdf_response.headers.get('ETag'),
+                    last_modified=pdf_response.headers.get('Last-Modified'),
+                    sha256=sha256,
+                    bytes=tamaño,
+                    ruta_local=filename
+                )
             
             logging.info(f"✓ Descargado: {filename}")
             return True
             
         except Exception as e:
+            self.motivos_fallo[ley_info['id']] = f"{type(e).__name__}: {str(e)}"
             logging.error(f"Error descargando {ley_info['nombre']}: {str(e)}")
             return False
     
@@ -146,9 +216,23 @@ class LeyChileScraper:
             'detalles': []
         }
         
+        # Primero los archivos dañados que encontró la verificación (verificacion.py)
+        self.reparar_pendientes()
+        
+        # Las leyes se descargan en paralelo; el limitador mantiene la cortesía con el servidor
+        def descargar(ley_info):
+            inicio = time.perf_counter()
+            exito = self.descargar_pdf_ley(ley_info)
+            self.registrar_documento(exito, time.perf_counter() - inicio)
+            return exito
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futuros = {codigo: executor.submit(descargar, ley_info)
+                       for codigo, ley_info in self.leyes_tributarias.items()}
+        
         for codigo, ley_info in self.leyes_tributarias.items():
             try:
-                exito = self.descargar_pdf_ley(ley_info)
+                exito = futuros[codigo].result()
                 
                 if exito:
                     resultados['exitosas'] += 1
@@ -162,12 +246,10 @@ class LeyChileScraper:
                     resultados['detalles'].append({
                         'codigo': codigo,
                         'nombre': ley_info['nombre'],
-                        'estado': 'fallido'
+                        'estado': 'fallido',
+                        'error': self.motivos_fallo.get(ley_info['id'])
                     })
                 
-                # Pausa entre descargas para no sobrecargar el servidor
-                time.sleep(2)
-                
             except Exception as e:
                 logging.error(f"Error procesando {codigo}: {str(e)}")
                 resultados['fallidas'] += 1
@@ -179,19 +261,150 @@ class LeyChileScraper:
                 })
         
         # Guardar reporte de resultados
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        reporte_file = f"data/reporte_leyes_{timestamp}.json"
-        
-        with open(reporte_file, 'w', encoding='utf-8') as f:
-            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        reporte_file = self.guardar_reporte(resultados)
         
         logging.info(f"Descarga completada: {resultados['exitosas']}/{resultados['total']} exitosas")
         logging.info(f"Reporte guardado en: {reporte_file}")
         
         return resultados
+    
+    def sincronizar_ley(self, ley_info):
+        """Descarga el XML de una ley y guarda solo los artículos nuevos, modificados o eliminados
+
+        Retorna un resumen con los conteos y la lista de cambios (con diff) respecto de la versión guardada;
+        en la primera sincronización se guarda la línea base sin emitir cambios
+        """
+        id_norma = ley_info['id']
+        response = self.obtener(self.url_xml.format(id_norma=id_norma))
+        response.raise_for_status()
+        contenido = response.content
+        sha256 = hashlib.sha256(contenido).hexdigest()
+
+        anterior = self.manifiesto.norma_leychile(id_norma)
+        resumen = {'nuevos': 0, 'modificados': 0, 'eliminados': 0, 'sin_cambios': 0, 'cambios': []}
+        # 304 o mismo XML: nada que parsear
+        if anterior and anterior['sha256'] == sha256:
+            self.manifiesto.sincronizar_norma(id_norma, anterior['fecha_version'], sha256, [])
+            resumen['sin_cambios'] = anterior['articulos']
+            resumen['estado'] = 'sin_cambios'
+            return resumen
+
+        with self.metricas.cronometro('parseo'):
+            norma = articulos_de_xml(contenido)
+
+        guardados = self.manifiesto.articulos_leychile(id_norma)
+        cambiados = []
+        for articulo in norma['articulos']:
+            previo = guardados.pop(articulo['id_parte'], None)
+            if previo and (previo['sha256'], previo['fecha_version'], bool(previo['derogado'])) == \
+                    (articulo['sha256'], articulo['fecha_version'], articulo['derogado']):
+                resumen['sin_cambios'] += 1
+                continue
+            cambiados.append(articulo)
+            resumen['modificados' if previo else 'nuevos'] += 1
+            if anterior:
+                texto_previo = self.manifiesto.texto_articulo(id_norma, articulo['id_parte']) if previo else ''
+                resumen['cambios'].append({
+                    'tipo': 'modificado' if previo else 'nuevo',
+                    'articulo': articulo['articulo'],
+                    'id_parte': articulo['id_parte'],
+                    'fecha_version_anterior': previo['fecha_version'] if previo else None,
+                    'fecha_version': articulo['fecha_version'],
+                    'derogado': articulo['derogado'],
+                    'diff': diferencia(texto_previo, articulo['texto'], f"{id_norma} art. {articulo['articulo']}")
+                })
+        # Lo que quedó en `guardados` ya no está en la norma
+        for id_parte, previo in guardados.items():
+            resumen['eliminados'] += 1
+            resumen['cambios'].append({
+                'tipo': 'eliminado',
+                'articulo': previo['articulo'],
+                'id_parte': id_parte,
+                'fecha_version_anterior': previo['fecha_version'],
+                'fecha_version': None,
+                'derogado': bool(previo['derogado']),
+                'diff': diferencia(self.manifiesto.texto_articulo(id_norma, id_parte), '',
+                                   f"{id_norma} art. {previo['articulo']}")
+            })
+
+        self.manifiesto.sincronizar_norma(id_norma, norma['fecha_version'], sha256, cambiados, list(guardados))
+        resumen['estado'] = 'actualizada' if anterior else 'inicial'
+        return resumen
+
+    def sincronizar_todas_las_leyes(self):
+        """Sincroniza los artículos de todas las leyes y escribe los cambios en data/cambios_leyes/"""
+        logging.info("Iniciando sincronización de artículos desde LeyChile.cl")
+
+        resultados = {
+            'exitosas': 0,
+            'fallidas': 0,
+            'total': len(self.leyes_tributarias),
+            'articulos': {'nuevos': 0, 'modificados': 0, 'eliminados': 0, 'sin_cambios': 0},
+            'detalles': []
+        }
+
+        def sincronizar(ley_info):
+            inicio = time.perf_counter()
+            try:
+                resumen = self.sincronizar_ley(ley_info)
+            except Exception as e:
+                logging.error(f"Error sincronizando {ley_info['nombre']}: {str(e)}")
+                resumen = {'estado': 'fallido', 'error': f"{type(e).__name__}: {str(e)}"}
+            self.registrar_documento(resumen['estado'] != 'fallido', time.perf_counter() - inicio)
+            return resumen
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futuros = {codigo: executor.submit(sincronizar, ley_info)
+                       for codigo, ley_info in self.leyes_tributarias.items()}
+
+        lineas = []
+        for codigo, ley_info in self.leyes_tributarias.items():
+            resumen = futuros[codigo].result()
+            detalle = {'codigo': codigo, 'nombre': ley_info['nombre'], 'estado': resumen['estado']}
+            if resumen['estado'] == 'fallido':
+                resultados['fallidas'] += 1
+                detalle['error'] = resumen['error']
+                resultados['detalles'].append(detalle)
+                continue
+
+            resultados['exitosas'] += 1
+            for clave in resultados['articulos']:
+                resultados['articulos'][clave] += resumen[clave]
+                detalle[clave] = resumen[clave]
+                if clave != 'sin_cambios':
+                    self.metricas.incrementar('articulos', resumen[clave], resultado=clave)
+            resultados['detalles'].append(detalle)
+            for cambio in resumen['cambios']:
+                lineas.append(json.dumps({'id_norma': ley_info['id'], 'ley': ley_info['nombre'], **cambio},
+                                         ensure_ascii=False) + '\n')
+
+        if lineas:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            ruta_cambios = os.path.join(CARPETA_CAMBIOS, f"cambios_{timestamp}.jsonl")
+            os.makedirs(CARPETA_CAMBIOS, exist_ok=True)
+            escribir_atomico([linea.encode('utf-8') for linea in lineas], ruta_cambios)
+            resultados['cambios'] = ruta_cambios
+            logging.info(f"{len(lineas)} cambios de artículos en {ruta_cambios}")
+
+        reporte_file = self.guardar_reporte(resultados)
+        logging.info(f"Sincronización completada: {resultados['exitosas']}/{resultados['total']} leyes, "
+                     f"{resultados['articulos']['nuevos']} artículos nuevos, "
+                     f"{resultados['articulos']['modificados']} modificados, "
+                     f"{resultados['articulos']['eliminados']} eliminados")
+        logging.info(f"Reporte guardado en: {reporte_file}")
+
+        return resultados
+
+    def ejecutar(self):
+        return self.descargar_todas_las_leyes()
+
+def main(argv=None, prog=None):
+    """Función principal (`argv` y `prog` los pasa cli.py)"""
+    parser = argparse.ArgumentParser(prog=prog, description="Scraper de leyes tributarias desde LeyChile.cl")
+    parser.add_argument('--sincronizar', action='store_true',
+                        help="Sincronizar los artículos desde la versión XML en vez de descargar los PDFs")
+    args = parser.parse_args(argv)
 
-def main():
-    """Función principal"""
     print("🏛️  Scraper de Leyes Tributarias - LeyChile.cl")
     print("=" * 50)
     
@@ -199,9 +412,18 @@ def main():
     os.makedirs('leyes', exist_ok=True)
     os.makedirs('data', exist_ok=True)
     os.makedirs('logs', exist_ok=True)
+    configurar_logging('logs/leychile_scraper.log')
     
     scraper = LeyChileScraper()
-    resultados = scraper.descargar_todas_las_leyes()
+    if args.sincronizar:
+        resultados = scraper.sincronizar_todas_las_leyes()
+        articulos = resultados['articulos']
+        print(f"\n📊 Artículos: 🆕 {articulos['nuevos']} nuevos, ✏️  {articulos['modificados']} modificados, "
+              f"🗑️  {articulos['eliminados']} eliminados, {articulos['sin_cambios']} sin cambios")
+        if resultados.get('cambios'):
+            print(f"📝 Cambios en {resultados['cambios']}")
+    else:
+        resultados = scraper.descargar_todas_las_leyes()
     
     print(f"\n📊 Resumen:")
     print(f"✅ Exitosas: {resultados['exitosas']}")
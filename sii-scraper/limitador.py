@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Limitador de tasa por host (token bucket) para las descargas concurrentes
+Reemplaza las pausas fijas entre descargas por un presupuesto de solicitudes por segundo
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Cubeta de fichas: `tasa` solicitudes por segundo con ráfagas de hasta `capacidad`"""
+
+    def __init__(self, tasa, capacidad=1):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad)
+        self.fichas = float(capacidad)
+        self.ultima_recarga = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        transcurrido = ahora - self.ultima_recarga
+        self.fichas = min(self.capacidad, self.fichas + transcurrido * self.tasa)
+        self.ultima_recarga = ahora
+
+    def ajustar(self, tasa):
+        """Cambia la tasa; las fichas acumuladas hasta ahora se conservan"""
+        with self.lock:
+            self._recargar()
+            self.tasa = float(tasa)
+
+    def adquirir(self):
+        """Bloquea hasta obtener una ficha"""
+        while True:
+            with self.lock:
+                self._recargar()
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) / self.tasa
+            time.sleep(espera)
+
+
+class LimitadorPorHost:
+    """Mantiene por host un token bucket y un límite de conexiones simultáneas"""
+
+    def __init__(self, solicitudes_por_segundo=1.0, rafaga=1, max_conexiones_por_host=None):
+        self.solicitudes_por_segundo = solicitudes_por_segundo
+        self.rafaga = rafaga
+        self.max_conexiones_por_host = max_conexiones_por_host
+        self.cubetas = {}
+        self.semaforos = {}
+        self.lock = threading.Lock()
+
+    def _cubeta(self, host):
+        with self.lock:
+            if host not in self.cubetas:
+                self.cubetas[host] = TokenBucket(self.solicitudes_por_segundo, self.rafaga)
+            return self.cubetas[host]
+
+    def _semaforo(self, host):
+        with self.lock:
+            if host not in self.semaforos:
+                self.semaforos[host] = threading.BoundedSemaphore(self.max_conexiones_por_host)
+            return self.semaforos[host]
+
+    def ajustar(self, solicitudes_por_segundo):
+        """Cambia el presupuesto de todos los hosts (por ejemplo, al sumarse o retirarse trabajadores)"""
+        with self.lock:
+            self.solicitudes_por_segundo = solicitudes_por_segundo
+            cubetas = list(self.cubetas.values())
+        for cubeta in cubetas:
+            cubeta.ajustar(solicitudes_por_segundo)
+
+    def esperar(self, url):
+        """Espera el turno para solicitar `url` según el presupuesto de su host"""
+        if not self.solicitudes_por_segundo:
+            return
+        self._cubeta(urlparse(url).netloc).adquirir()
+
+    def ocupar(self, url):
+        """Como `turno` pero sin bloque: espera la ficha, ocupa una conexión del host y retorna la función que la
+        libera (una sola vez, aunque se llame de nuevo)
+        """
+        if not self.max_conexiones_por_host:
+            self.esperar(url)
+            return lambda: None
+
+        semaforo = self._semaforo(urlparse(url).netloc)
+        semaforo.acquire()
+        try:
+            self.esperar(url)
+        except BaseException:
+            semaforo.release()
+            raise
+        liberada = threading.Event()
+
+        def liberar():
+            if not liberada.is_set():
+                liberada.set()
+                semaforo.release()
+        return liberar
+
+    @contextmanager
+    def turno(self, url):
+        """Ocupa una conexión del host de `url` durante el bloque, tras esperar su ficha"""
+        if not self.max_conexiones_por_host:
+            self.esperar(url)
+            yield
+            return
+
+        semaforo = self._semaforo(urlparse(url).netloc)
+        with semaforo:
+            self.esperar(url)
+            yield
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Manifiesto persistente (SQLite) de todo lo descargado por los scrapers
+Registra por URL: ETag, Last-Modified, hash del contenido, tamaño, ruta local y fecha de descarga
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import quote
+
+RUTA_MANIFIESTO = 'data/manifiesto.db'
+
+CAMPOS = ('etag', 'last_modified', 'sha256', 'bytes', 'ruta_local', 'ruta_cache',
+          'descargado_en', 'verificado_en')
+
+
+def conectar_solo_lectura(ruta):
+    """Conexión SQLite que no crea, migra ni escribe nada (modo `ro` de la URI); falla si la base no existe"""
+    conexion = sqlite3.connect(f"file:{quote(os.path.abspath(ruta))}?mode=ro", uri=True, check_same_thread=False)
+    conexion.row_factory = sqlite3.Row
+    return conexion
+
+
+def sha256_archivo(ruta, tamaño_bloque=1024 * 1024):
+    """Calcula el sha256 de un archivo leyéndolo por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamaño_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def clasificar_ruta(ruta):
+    """Obtiene (tipo, año) desde rutas como resoluciones/2021/reso1.pdf"""
+    partes = os.path.normpath(ruta).split(os.sep)
+    tipo = partes[0] if partes else None
+    año = int(partes[1]) if len(partes) > 2 and partes[1].isdigit() else None
+    return tipo, año
+
+
+class Manifiesto:
+    def __init__(self, ruta=RUTA_MANIFIESTO, modo_diario='WAL', solo_lectura=False):
+        self.ruta = ruta
+        # Compartido entre los workers de descarga
+        self.lock = threading.Lock()
+        if solo_lectura:
+            self.conexion = conectar_solo_lectura(ruta)
+            return
+
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        # Varios procesos pueden escribir a la vez (rastreo distribuido): esperan el bloqueo en vez de fallar.
+        # WAL no funciona sobre volúmenes de red, donde se usa modo_diario='DELETE' (como en la frontera)
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=60)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.execute(f'PRAGMA journal_mode={modo_diario}')
+        self.conexion.execute('''
+            CREATE TABLE IF NOT EXISTS recursos (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                sha256 TEXT,
+                bytes INTEGER,
+                ruta_local TEXT,
+                ruta_cache TEXT,
+                descargado_en TEXT,
+                verificado_en TEXT
+            )
+        ''')
+        self.conexion.execute('CREATE INDEX IF NOT EXISTS idx_recursos_sha256 ON recursos (sha256)')
+        # Texto extraído de cada PDF, por hash de contenido (ver extraccion_texto.py)
+        self.conexion.execute('''
+            CREATE TABLE IF NOT EXISTS extracciones (
+                sha256 TEXT PRIMARY KEY,
+                ruta_pdf TEXT,
+                ruta_texto TEXT,
+                paginas INTEGER,
+                caracteres INTEGER,
+                extractor TEXT,
+                extraido_en TEXT
+            )
+        ''')
+        # Catálogo del almacén por contenido (ver almacen.py): qué URL, tipo, año y número apunta a cada blob
+        self.conexion.executescript('''
+            CREATE TABLE IF NOT EXISTS catalogo (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                tipo TEXT,
+                año INTEGER,
+                numero TEXT,
+                ruta_vista TEXT,
+                catalogado_en TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_catalogo_sha256 ON catalogo (sha256);
+            CREATE INDEX IF NOT EXISTS idx_catalogo_documento ON catalogo (tipo, año, numero);
+            CREATE INDEX IF NOT EXISTS idx_catalogo_vista ON catalogo (ruta_vista);
+        ''')
+        # Documentos de años fríos movidos a un paquete zstd (ver archivo_frio.py)
+        self.conexion.executescript('''
+            CREATE TABLE IF NOT EXISTS empaquetados (
+                sha256 TEXT NOT NULL,
+                paquete TEXT NOT NULL,
+                PRIMARY KEY (sha256, paquete)
+            );
+            CREATE INDEX IF NOT EXISTS idx_empaquetados_paquete ON empaquetados (paquete);
+        ''')
+        # Archivos que la verificación encontró dañados, pendientes de volver a descargar (ver verificacion.py)
+        self.conexion.execute('''
+            CREATE TABLE IF NOT EXISTS reparaciones (
+                url TEXT PRIMARY KEY,
+                ruta TEXT,
+                motivo TEXT NOT NULL,
+                detectado_en TEXT NOT NULL,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                ultimo_error TEXT
+            )
+        ''')
+        # Versión XML de cada ley de LeyChile y sus artículos, para sincronizar solo lo que cambió
+        self.conexion.executescript('''
+            CREATE TABLE IF NOT EXISTS normas_leychile (
+                id_norma TEXT PRIMARY KEY,
+                fecha_version TEXT,
+                sha256 TEXT,
+                articulos INTEGER,
+                sincronizado_en TEXT
+            );
+            CREATE TABLE IF NOT EXISTS articulos_leychile (
+                id_norma TEXT NOT NULL,
+                id_parte TEXT NOT NULL,
+                articulo TEXT,
+                fecha_version TEXT,
+                derogado INTEGER,
+                sha256 TEXT,
+                texto TEXT,
+                actualizado_en TEXT,
+                PRIMARY KEY (id_norma, id_parte)
+            );
+        ''')
+        self.conexion.commit()
+
+    def obtener(self, url):
+        """Retorna la entrada de `url` como diccionario, o None si no se ha descargado"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT * FROM recursos WHERE url = ?', (url,)).fetchone()
+        return dict(fila) if fila else None
+
+    def registrar(self, url, **campos):
+        """Inserta o actualiza la entrada de `url` con los campos indicados"""
+        desconocidos = set(campos) - set(CAMPOS)
+        if desconocidos:
+            raise ValueError(f"Campos desconocidos en el manifiesto: {', '.join(sorted(desconocidos))}")
+
+        ahora = datetime.now().isoformat()
+        campos.setdefault('descargado_en', ahora)
+        campos.setdefault('verificado_en', ahora)
+
+        columnas = ', '.join(campos)
+        marcadores = ', '.join('?' for _ in campos)
+        actualizacion = ', '.join(f"{c} = excluded.{c}" for c in campos)
+        with self.lock:
+            self.conexion.execute(
+                f"INSERT INTO recursos (url, {columnas}) VALUES (?, {marcadores}) "
+                f"ON CONFLICT(url) DO UPDATE SET {actualizacion}",
+                (url, *campos.values())
+            )
+            self.conexion.commit()
+
+    def marcar_verificado(self, url):
+        """Registra que `url` fue revalidada con el servidor y no ha cambiado"""
+        with self.lock:
+            self.conexion.execute('UPDATE recursos SET verificado_en = ? WHERE url = ?',
+                                  (datetime.now().isoformat(), url))
+            self.conexion.commit()
+
+    def documento_vigente(self, url):
+        """Retorna la entrada de `url` si su archivo local existe con el tamaño registrado (o está empaquetado)"""
+        entrada = self.obtener(url)
+        if not entrada or not entrada['ruta_local']:
+            return None
+        try:
+            if os.path.getsize(entrada['ruta_local']) != entrada['bytes']:
+                return None
+        except OSError:
+            # Los documentos de años fríos ya no tienen archivo suelto
+            if entrada['sha256'] and self.paquete_de(entrada['sha256']):
+                return entrada
+            return None
+        return entrada
+
+    def extraccion(self, sha256):
+        """Retorna la extracción de texto registrada para un contenido, o None"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT * FROM extracciones WHERE sha256 = ?', (sha256,)).fetchone()
+        return dict(fila) if fila else None
+
+    def registrar_extraccion(self, sha256, ruta_pdf, ruta_texto, paginas, caracteres, extractor):
+        with self.lock:
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO extracciones '
+                '(sha256, ruta_pdf, ruta_texto, paginas, caracteres, extractor, extraido_en) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (sha256, ruta_pdf, ruta_texto, paginas, caracteres, extractor, datetime.now().isoformat())
+            )
+            self.conexion.commit()
+
+    def extracciones(self):
+        """Retorna todas las extracciones de texto registradas"""
+        with self.lock:
+            filas = self.conexion.execute('SELECT * FROM extracciones ORDER BY ruta_pdf').fetchall()
+        return [dict(fila) for fila in filas]
+
+    def catalogar(self, url, sha256, tipo=None, año=None, numero=None, ruta_vista=None):
+        """Asocia una URL de origen (y su tipo, año y número) al blob con ese contenido"""
+        with self.lock:
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO catalogo (url, sha256, tipo, año, numero, ruta_vista, catalogado_en) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, sha256, tipo, año, numero, ruta_vista, datetime.now().isoformat())
+            )
+            self.conexion.commit()
+
+    def catalogo(self, url):
+        """Retorna la entrada del catálogo de `url`, o None"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT * FROM catalogo WHERE url = ?', (url,)).fetchone()
+        return dict(fila) if fila else None
+
+    def catalogados(self, sha256=None, tipo=None, año=None, numero=None):
+        """Entradas del catálogo filtradas por contenido o por (tipo, año, número)"""
+        sql = 'SELECT * FROM catalogo WHERE 1 = 1'
+        parametros = []
+        for columna, valor in (('sha256', sha256), ('tipo', tipo), ('año', año), ('numero', numero)):
+            if valor is not None:
+                sql += f' AND {columna} = ?'
+                parametros.append(valor)
+        with self.lock:
+            filas = self.conexion.execute(sql + ' ORDER BY url', parametros).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def dueño_vista(self, ruta_vista):
+        """URL catalogada con esa ruta en la vista por tipo y año, o None si está libre"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT url FROM catalogo WHERE ruta_vista = ?', (ruta_vista,)).fetchone()
+        return fila['url'] if fila else None
+
+    def registrar_paquete(self, paquete, hashes):
+        """Reemplaza la lista de contenidos guardados en un paquete"""
+        with self.lock, self.conexion:
+            self.conexion.execute('DELETE FROM empaquetados WHERE paquete = ?', (paquete,))
+            self.conexion.executemany('INSERT OR IGNORE INTO empaquetados (sha256, paquete) VALUES (?, ?)',
+                                      [(sha256, paquete) for sha256 in hashes])
+
+    def paquete_de(self, sha256):
+        """Paquete que contiene un contenido, o None"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT paquete FROM empaquetados WHERE sha256 = ? LIMIT 1',
+                                         (sha256,)).fetchone()
+        return fila['paquete'] if fila else None
+
+    def empaquetados(self, paquete):
+        with self.lock:
+            filas = self.conexion.execute('SELECT sha256 FROM empaquetados WHERE paquete = ?', (paquete,)).fetchall()
+        return {fila['sha256'] for fila in filas}
+
+    def encolar_reparacion(self, url, ruta, motivo):
+        """Agrega (o actualiza) un archivo dañado a la cola de reparación, conservando sus intentos"""
+        with self.lock:
+            self.conexion.execute(
+                'INSERT INTO reparaciones (url, ruta, motivo, detectado_en) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET ruta = excluded.ruta, motivo = excluded.motivo, '
+                'detectado_en = excluded.detectado_en',
+                (url, ruta, motivo, datetime.now().isoformat())
+            )
+            self.conexion.commit()
+
+    def reparaciones(self, max_intentos=None):
+        """Archivos pendientes de reparar (los que no agotaron `max_intentos`)"""
+        sql = 'SELECT * FROM reparaciones'
+        parametros = []
+        if max_intentos is not None:
+            sql += ' WHERE intentos < ?'
+            parametros.append(max_intentos)
+        with self.lock:
+            filas = self.conexion.execute(sql + ' ORDER BY detectado_en, url', parametros).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def resolver_reparacion(self, url, error=None):
+        """Quita el archivo de la cola si se reparó; si no, suma un intento con su error"""
+        with self.lock:
+            if error is None:
+                self.conexion.execute('DELETE FROM reparaciones WHERE url = ?', (url,))
+            else:
+                self.conexion.execute('UPDATE reparaciones SET intentos = intentos + 1, ultimo_error = ? '
+                                      'WHERE url = ?', (error, url))
+            self.conexion.commit()
+
+    def norma_leychile(self, id_norma):
+        """Última versión sincronizada de una ley (fecha de versión y hash del XML), o None"""
+        with self.lock:
+            fila = self.conexion.execute('SELECT * FROM normas_leychile WHERE id_norma = ?', (id_norma,)).fetchone()
+        return dict(fila) if fila else None
+
+    def articulos_leychile(self, id_norma):
+        """Hash, versión y estado de cada artículo guardado de una ley, por idParte (sin el texto)"""
+        with self.lock:
+            filas = self.conexion.execute(
+                'SELECT id_parte, articulo, fecha_version, derogado, sha256 FROM articulos_leychile '
+                'WHERE id_norma = ?', (id_norma,)
+            ).fetchall()
+        return {fila['id_parte']: dict(fila) for fila in filas}
+
+    def texto_articulo(self, id_norma, id_parte):
+        with self.lock:
+            fila = self.conexion.execute('SELECT texto FROM articulos_leychile WHERE id_norma = ? AND id_parte = ?',
+                                         (id_norma, id_parte)).fetchone()
+        return fila['texto'] if fila else None
+
+    def sincronizar_norma(self, id_norma, fecha_version, sha256, articulos, eliminados=()):
+        """Guarda en una transacción la versión de la ley, los artículos nuevos o cambiados y quita los eliminados"""
+        ahora = datetime.now().isoformat()
+        with self.lock, self.conexion:
+            self.conexion.executemany(
+                'INSERT OR REPLACE INTO articulos_leychile '
+                '(id_norma, id_parte, articulo, fecha_version, derogado, sha256, texto, actualizado_en) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(id_norma, a['id_parte'], a['articulo'], a['fecha_version'], int(a['derogado']), a['sha256'],
+                  a['texto'], ahora) for a in articulos]
+            )
+            self.conexion.executemany('DELETE FROM articulos_leychile WHERE id_norma = ? AND id_parte = ?',
+                                      [(id_norma, id_parte) for id_parte in eliminados])
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO normas_leychile (id_norma, fecha_version, sha256, articulos, sincronizado_en) '
+                'VALUES (?, ?, ?, (SELECT COUNT(*) FROM articulos_leychile WHERE id_norma = ?), ?)',
+                (id_norma, fecha_version, sha256, id_norma, ahora)
+            )
+
+    def resumen(self):
+        """Totales del manifiesto para el estado offline: documentos por (tipo, año) y conteos generales"""
+        with self.lock:
+            por_año = self.conexion.execute('''
+                SELECT c.tipo, c.año, COUNT(*) AS documentos, COALESCE(SUM(r.bytes), 0) AS bytes,
+                       COUNT(e.sha256) AS empaquetados, MAX(c.catalogado_en) AS ultimo
+                FROM catalogo c
+                LEFT JOIN recursos r ON r.url = c.url
+                LEFT JOIN (SELECT DISTINCT sha256 FROM empaquetados) e ON e.sha256 = c.sha256
+                GROUP BY c.tipo, c.año ORDER BY c.tipo, c.año
+            ''').fetchall()
+            totales = self.conexion.execute('''
+                SELECT (SELECT COUNT(*) FROM recursos) AS recursos,
+                       (SELECT COUNT(*) FROM catalogo) AS catalogados,
+                       (SELECT COUNT(*) FROM extracciones) AS extracciones,
+                       (SELECT COUNT(*) FROM normas_leychile) AS normas_leychile,
+                       (SELECT COUNT(*) FROM articulos_leychile) AS articulos_leychile,
+                       (SELECT COUNT(*) FROM reparaciones) AS reparaciones,
+                       (SELECT MAX(descargado_en) FROM recursos) AS ultima_descarga,
+                       (SELECT MAX(verificado_en) FROM recursos) AS ultima_verificacion
+            ''').fetchone()
+        return {'por_año': [dict(fila) for fila in por_año], **dict(totales)}
+
+    def entradas(self):
+        """Retorna todas las entradas del manifiesto"""
+        with self.lock:
+            filas = self.conexion.execute('SELECT * FROM recursos ORDER BY url').fetchall()
+        return [dict(fila) for fila in filas]
+
+    def cerrar(self):
+        with self.lock:
+            self.conexion.close()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Metadatos estructurados de la normativa descargada: número, fecha, materia y leyes citadas
+Se obtienen de las filas de los índices del SII (caché HTTP) y de la primera página de cada PDF extraído,
+y se escriben por lotes en la tabla Normativa de la base PostgreSQL de la aplicación (DATABASE_URL)
+La tabla la crea la migración de Prisma (prisma/migrations/*_add_normativa); aquí solo se leen y escriben filas
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import lxml.html
+from lxml import etree
+
+from extraccion_texto import cargar_texto
+from indice_texto import plegar_acentos
+from manifiesto import Manifiesto
+from sii_scraper import PATRON_ENLACE_DOCUMENTO, numero_documento, normalizar_url
+
+# Parámetros de la URL que entiende Prisma pero no libpq; `schema` se traduce a search_path
+PARAMETROS_PRISMA = ('schema', 'connection_limit', 'pool_timeout', 'pgbouncer', 'statement_cache_size',
+                     'socket_timeout', 'connect_timeout_ms')
+
+URL_INDICE = re.compile(r'/(resoluciones|circulares)/(\d{4})/(?:res_ind|indcir)\d{4}\.htm$')
+
+MESES = {'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
+         'septiembre': 9, 'setiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12}
+
+FECHA_NUMERICA = re.compile(r'\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b')
+# Sobre texto plegado (minúsculas sin tildes): "santiago, 12 de marzo de 2023"
+FECHA_TEXTO = re.compile(r'\b(\d{1,2})\s+de\s+(' + '|'.join(MESES) + r')\s+(?:de|del)\s+(\d{4})\b')
+
+# Encabezado del documento ("RESOLUCIÓN EXENTA SII N°136.-"); se descartan las citas con año ("N° 101, DE 2019")
+NUMERO_PDF = re.compile(r'^\s*(?:resolucion|circular)[^\n]{0,40}?\bn[°ºo]?\s*\.?\s*(\d+)\b'
+                        r'(?!\s*,?\s*(?:de|del)\s+\d{4})', re.MULTILINE)
+MATERIA_PDF = re.compile(r'\bmateria\s*:\s*(.+?)(?:\n\s*\n|\n\s*santiago\b|\n\s*(?:resolucion|circular)\s+ex'
+                         r'|\bvistos\b|\bconsiderando\b|$)', re.DOTALL)
+# Lugar y fecha de dictación: "SANTIAGO, 12 DE DICIEMBRE DE 2023"
+FECHA_DICTACION = re.compile(r'\bsantiago\s*,?\s*(\d{1,2}\s+de\s+(?:' + '|'.join(MESES) + r')\s+(?:de|del)\s+\d{4})')
+
+# Citas a leyes sobre texto plegado; los números se guardan sin puntos ("Ley 21210", "DL 824")
+CITAS_LEY = (
+    (re.compile(r'\bd\.?\s*f\.?\s*l\.?\s*(?:n[°ºo]?\s*\.?\s*)?(\d[\d.]*)'), 'DFL'),
+    (re.compile(r'\b(?:d\.?\s*l\.?|decreto\s+ley)\s*(?:n[°ºo]?\s*\.?\s*)?(\d[\d.]*)'), 'DL'),
+    (re.compile(r'\bley\s+(?:n[°ºo]?\s*\.?\s*)?(\d{1,2}\.\d{3}|\d{4,5})\b'), 'Ley'),
+)
+LEYES_POR_NOMBRE = (
+    (re.compile(r'\bcodigo\s+tributario\b'), 'DL 830'),
+    (re.compile(r'\bley\s+(?:sobre\s+)?(?:de\s+)?impuesto\s+a\s+la\s+renta\b'), 'DL 824'),
+    (re.compile(r'\bley\s+(?:sobre\s+)?(?:de\s+)?impuesto\s+a\s+las\s+ventas\s+y\s+servicios\b'), 'DL 825'),
+)
+
+
+def fecha_de(texto):
+    """Primera fecha del texto (dd/mm/aaaa o "12 de marzo de 2023") como date ISO, o None"""
+    plegado = plegar_acentos(texto)
+    for patron in (FECHA_NUMERICA, FECHA_TEXTO):
+        for coincidencia in patron.finditer(plegado):
+            dia, mes, año = coincidencia.groups()
+            mes = MESES[mes] if mes in MESES else int(mes)
+            try:
+                return datetime(int(año), mes, int(dia)).date().isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+def leyes_referidas(texto):
+    """Leyes citadas en un texto, normalizadas y sin repetir: ['DL 824', 'Ley 21210', ...]"""
+    plegado = plegar_acentos(texto)
+    leyes = set()
+    for patron, prefijo in CITAS_LEY:
+        for coincidencia in patron.finditer(plegado):
+            numero = coincidencia.group(1).replace('.', '').strip()
+            if numero:
+                leyes.add(f"{prefijo} {numero}")
+    for patron, ley in LEYES_POR_NOMBRE:
+        if patron.search(plegado):
+            leyes.add(ley)
+    return sorted(leyes)
+
+
+def _limpiar(texto, largo=500):
+    texto = ' '.join(texto.split()).strip(' .,;:-')
+    return texto[:largo] or None
+
+
+def filas_indice(html, url_indice):
+    """Por cada documento de un índice: (url, texto del enlace, texto de su fila de la tabla)"""
+    try:
+        documento = lxml.html.document_fromstring(html)
+    except etree.ParserError:
+        return
+    filas_vistas = set()
+    for link in documento.iter('a'):
+        href = link.get('href')
+        if not href or not PATRON_ENLACE_DOCUMENTO.search(href):
+            continue
+        fila = next(link.iterancestors('tr'), None)
+        if fila is None:
+            fila = link.getparent()
+        # Los enlaces siguientes de la misma fila son referencias ("modifica Res. 12"), no el documento
+        if fila in filas_vistas:
+            continue
+        filas_vistas.add(fila)
+        texto = ''.join(trozo.strip() for trozo in link.itertext())
+        if texto:
+            yield normalizar_url(urljoin(url_indice, href.strip())), texto, ' '.join(fila.text_content().split())
+
+
+def metadatos_de_fila(url, texto_enlace, texto_fila):
+    """Número, fecha, materia y leyes de una fila del índice"""
+    materia = texto_fila.replace(texto_enlace, ' ', 1)
+    materia = FECHA_NUMERICA.sub(' ', materia)
+    return {
+        'numero': numero_documento({'url': url, 'texto': texto_enlace}),
+        'fecha': fecha_de(texto_fila),
+        'materia': _limpiar(materia),
+        'leyes': leyes_referidas(texto_fila)
+    }
+
+
+def metadatos_de_pdf(texto):
+    """Número, fecha, materia y leyes de la primera página de un PDF"""
+    plegado = plegar_acentos(texto)
+    numero = NUMERO_PDF.search(plegado)
+    materia = None
+    coincidencia = MATERIA_PDF.search(plegado)
+    if coincidencia:
+        # Mismas posiciones en el texto original salvo ligaduras: se recorta de él para conservar tildes
+        original = texto if len(texto) == len(plegado) else plegado
+        materia = _limpiar(original[coincidencia.start(1):coincidencia.end(1)])
+    dictacion = FECHA_DICTACION.search(plegado)
+    return {
+        'numero': numero.group(1) if numero else None,
+        # La fecha de dictación va en el encabezado; si no se encuentra, la primera fecha antes de los vistos
+        'fecha': fecha_de(dictacion.group(1)) if dictacion else fecha_de(texto[:800]),
+        'materia': materia,
+        'leyes': leyes_referidas(texto)
+    }
+
+
+def _combinar(registro, datos):
+    """Completa los campos vacíos del registro y acumula las leyes citadas"""
+    for campo in ('numero', 'fecha', 'materia'):
+        if not registro.get(campo) and datos.get(campo):
+            registro[campo] = datos[campo]
+    registro['leyes'] = sorted(set(registro.get('leyes') or []) | set(datos.get('leyes') or []))
+
+
+def conexion_postgres(url):
+    """(conninfo para psycopg, schema) a partir de una DATABASE_URL de Prisma"""
+    partes = urlsplit(url)
+    parametros = parse_qsl(partes.query, keep_blank_values=True)
+    schema = dict(parametros).get('schema') or 'public'
+    query = urlencode([(k, v) for k, v in parametros if k not in PARAMETROS_PRISMA])
+    return urlunsplit(partes._replace(query=query)), schema
+
+
+class CatalogoNormativa:
+    """Tabla Normativa de la base de la aplicación (modelo Prisma `Normativa`, PostgreSQL)"""
+
+    def __init__(self, url=None):
+        url = url or os.environ.get('DATABASE_URL')
+        if not url:
+            raise ValueError("Falta DATABASE_URL (la misma base PostgreSQL que usa la aplicación)")
+        # psycopg solo se necesita aquí: grafo_citas importa de este módulo las funciones de extracción
+        import psycopg
+        from psycopg.rows import dict_row
+
+        conninfo, schema = conexion_postgres(url)
+        self.conexion = psycopg.connect(conninfo, row_factory=dict_row)
+        self.conexion.execute("SELECT set_config('search_path', %s, false)", (schema,))
+        existe = self.conexion.execute('SELECT to_regclass(%s) AS tabla', ('"Normativa"',)).fetchone()['tabla']
+        self.conexion.commit()
+        if existe is None:
+            self.conexion.close()
+            raise RuntimeError(f"No existe la tabla Normativa en el schema {schema}: "
+                               f"ejecutar `npx prisma migrate deploy` en la raíz del proyecto")
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def recopilar(self, manifiesto):
+        """Reúne los metadatos de todos los documentos conocidos, por URL"""
+        registros = {}
+
+        # Filas de los índices anuales guardados por la caché HTTP
+        for entrada in manifiesto.entradas():
+            coincidencia = URL_INDICE.search(entrada['url'])
+            if not coincidencia or not entrada['ruta_cache'] or not os.path.exists(entrada['ruta_cache']):
+                continue
+            tipo, año = coincidencia.group(1), int(coincidencia.group(2))
+            with open(entrada['ruta_cache'], 'rb') as f:
+                html = f.read()
+            for url, texto, fila in filas_indice(html, entrada['url']):
+                registros[url] = dict(metadatos_de_fila(url, texto, fila), url=url, tipo=tipo, anio=año)
+
+        # Documentos del almacén: blob, vista y primera página del texto extraído
+        for entrada in manifiesto.catalogados():
+            registro = registros.setdefault(entrada['url'], {'url': entrada['url'], 'leyes': []})
+            registro.setdefault('tipo', entrada['tipo'])
+            registro.setdefault('anio', entrada['año'])
+            registro['sha256'] = entrada['sha256']
+            # Un año que pasó al archivo frío ya no tiene vista: su contenido se lee por sha256
+            vista = entrada['ruta_vista']
+            registro['rutaLocal'] = vista if vista and os.path.exists(vista) else None
+            _combinar(registro, {'numero': entrada['numero']})
+
+            extraccion = manifiesto.extraccion(entrada['sha256'])
+            if not extraccion:
+                continue
+            try:
+                paginas = cargar_texto(extraccion['ruta_texto'])['paginas']
+            except (OSError, ValueError) as e:
+                logging.error(f"Error leyendo {extraccion['ruta_texto']}: {str(e)}")
+                continue
+            if paginas:
+                _combinar(registro, metadatos_de_pdf(paginas[0]['texto']))
+        return registros
+
+    def escribir(self, registros):
+        """Inserta o actualiza todos los registros en una sola transacción"""
+        # TIMESTAMP(3) sin zona: Prisma guarda las fechas en UTC
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        filas = [(
+            hashlib.sha256(r['url'].encode('utf-8')).hexdigest()[:25],
+            r['url'],
+            r.get('tipo') or 'desconocido',
+            r.get('anio'),
+            r.get('numero'),
+            datetime.fromisoformat(r['fecha']) if r.get('fecha') else None,
+            r.get('materia'),
+            json.dumps(r.get('leyes') or [], ensure_ascii=False),
+            r.get('sha256'),
+            r.get('rutaLocal'),
+            ahora
+        ) for r in registros.values()]
+        with self.conexion.transaction(), self.conexion.cursor() as cursor:
+            cursor.executemany('''
+                INSERT INTO "Normativa" ("id", "url", "tipo", "anio", "numero", "fecha", "materia",
+                                         "leyesReferidas", "sha256", "rutaLocal", "updatedAt")
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT ("url") DO UPDATE SET
+                    "tipo" = EXCLUDED."tipo", "anio" = EXCLUDED."anio", "numero" = EXCLUDED."numero",
+                    "fecha" = EXCLUDED."fecha", "materia" = EXCLUDED."materia",
+                    "leyesReferidas" = EXCLUDED."leyesReferidas", "sha256" = EXCLUDED."sha256",
+                    "rutaLocal" = EXCLUDED."rutaLocal", "updatedAt" = EXCLUDED."updatedAt"
+            ''', filas)
+        return len(filas)
+
+    def sincronizar(self, manifiesto=None):
+        inicio = time.perf_counter()
+        manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        registros = self.recopilar(manifiesto)
+        escritos = self.escribir(registros)
+        resultados = {
+            'documentos': escritos,
+            'con_fecha': sum(1 for r in registros.values() if r.get('fecha')),
+            'con_materia': sum(1 for r in registros.values() if r.get('materia')),
+            'segundos': round(time.perf_counter() - inicio, 2)
+        }
+        logging.info(f"Catálogo de normativa sincronizado: {resultados}")
+        return resultados
+
+    def listar(self, tipo=None, año=None, numero=None, desde=None, hasta=None, limite=50):
+        sql = 'SELECT * FROM "Normativa" WHERE TRUE'
+        parametros = []
+        for condicion, valor in (('"tipo" = %s', tipo), ('"anio" = %s', año), ('"numero" = %s', numero),
+                                 ('"fecha" >= %s', desde), ('"fecha" < %s', hasta)):
+            if valor is not None:
+                sql += f' AND {condicion}'
+                parametros.append(valor)
+        # Números como "136-A": se ordenan por su parte numérica
+        sql += ''' ORDER BY "fecha" DESC NULLS LAST, "tipo", "anio",
+                   NULLIF(regexp_replace("numero", '\\D', '', 'g'), '')::bigint LIMIT %s'''
+        parametros.append(limite)
+        with self.conexion.transaction():
+            return self.conexion.execute(sql, parametros).fetchall()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Catálogo de metadatos de la normativa descargada")
+    parser.add_argument('--database-url', help="Base PostgreSQL de la aplicación (por defecto: $DATABASE_URL)")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('sincronizar', help="Extraer metadatos y escribirlos en la tabla Normativa")
+    listar = subparsers.add_parser('listar', help="Consultar el catálogo")
+    listar.add_argument('--tipo', choices=['resoluciones', 'circulares', 'leyes'])
+    listar.add_argument('--año', type=int)
+    listar.add_argument('--numero')
+    listar.add_argument('--desde', help="Fecha mínima (AAAA-MM-DD)")
+    listar.add_argument('--hasta', help="Fecha máxima, exclusiva (AAAA-MM-DD)")
+    listar.add_argument('-n', '--limite', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        catalogo = CatalogoNormativa(args.database_url)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {str(e)}")
+        return 1
+
+    if args.comando == 'sincronizar':
+        resultados = catalogo.sincronizar()
+        print(f"✅ {resultados['documentos']} documentos  📅 Con fecha: {resultados['con_fecha']}  "
+              f"📝 Con materia: {resultados['con_materia']}")
+    elif args.comando == 'listar':
+        for fila in catalogo.listar(args.tipo, args.año, args.numero, args.desde, args.hasta, args.limite):
+            fecha = fila['fecha'].date().isoformat() if fila['fecha'] else ''
+            print(f"{fila['tipo']:12} {fila['anio'] or '':4} N° {fila['numero'] or '?':>5}  {fecha:10}  "
+                  f"{(fila['materia'] or '')[:80]}")
+    catalogo.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Métricas de ejecución de los scrapers: contadores, histogramas y tiempos por etapa
+Se exportan en formato textfile de Prometheus (data/metricas/) y en el reporte JSON de cada ejecución
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from escritura import escribir_atomico
+
+CARPETA_METRICAS = 'data/metricas'
+PREFIJO = 'scraper'
+
+# Límites superiores (segundos) de los buckets de los histogramas; el último es +Inf
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DESCRIPCIONES = {
+    'solicitudes_http': ('counter', "Respuestas HTTP recibidas por código de estado (incluye reintentos)"),
+    'errores_red': ('counter', "Errores de conexión o timeout por tipo de excepción"),
+    'reintentos': ('counter', "Solicitudes repetidas por error de red o estado reintentable"),
+    'cache': ('counter', "Solicitudes GET según su resultado en la caché HTTP (acierto, no_modificado, descarga)"),
+    'bytes_descargados': ('counter', "Bytes de documentos escritos en disco"),
+    'documentos': ('counter', "Documentos procesados por resultado"),
+    'sondeos': ('counter', "Sondeos de índices del demonio por resultado (sin_cambios, modificado, inexistente, "
+                           "error)"),
+    'articulos': ('counter', "Artículos de leyes sincronizados desde LeyChile por resultado (nuevos, modificados, "
+                             "eliminados)"),
+    'etapa_segundos': ('histogram', "Duración por etapa: conexion (DNS + TCP + TLS), ttfb (envío hasta encabezados), "
+                                    "cuerpo (espera de bloques), parseo, escritura (disco, hash y fsync), "
+                                    "esquemas (compilación de los XSD)"),
+    'documento_segundos': ('histogram', "Duración total de la descarga de cada documento")
+}
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def _formato_etiquetas(etiquetas):
+    return ','.join(f'{k}="{v}"' for k, v in etiquetas)
+
+
+class Histograma:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                break
+        else:
+            i = len(self.buckets)
+        self.conteos[i] += 1
+        self.suma += valor
+        self.cantidad += 1
+
+    def cuantil(self, q):
+        """Estimación por interpolación lineal dentro del bucket, como histogram_quantile de Prometheus"""
+        if not self.cantidad:
+            return None
+        objetivo = q * self.cantidad
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            if acumulado + conteo >= objetivo and conteo:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                inferior = self.buckets[i - 1] if i else 0.0
+                return inferior + (self.buckets[i] - inferior) * (objetivo - acumulado) / conteo
+            acumulado += conteo
+        return self.buckets[-1]
+
+
+class Metricas:
+    """Registro de métricas compartido por los workers de un scraper; `fijas` son etiquetas de todas las series"""
+
+    def __init__(self, **fijas):
+        self.fijas = _etiquetas(fijas)
+        self.lock = threading.Lock()
+        self.contadores = {}
+        self.histogramas = {}
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, _etiquetas(etiquetas))
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def valor(self, nombre, **etiquetas):
+        with self.lock:
+            return self.contadores.get((nombre, _etiquetas(etiquetas)), 0)
+
+    def observar(self, nombre, segundos, **etiquetas):
+        clave = (nombre, _etiquetas(etiquetas))
+        with self.lock:
+            if clave not in self.histogramas:
+                self.histogramas[clave] = Histograma()
+            self.histogramas[clave].observar(segundos)
+
+    def observar_etapas(self, tiempos):
+        """Registra un diccionario {etapa: segundos} (por ejemplo el de guardar_respuesta)"""
+        for etapa, segundos in tiempos.items():
+            self.observar('etapa_segundos', segundos, etapa=etapa)
+
+    @contextmanager
+    def cronometro(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar('etapa_segundos', time.perf_counter() - inicio, etapa=etapa)
+
+    def resumen(self):
+        """Métricas como diccionario para el reporte JSON"""
+        with self.lock:
+            contadores = dict(self.contadores)
+            histogramas = {clave: (h.cantidad, h.suma, h.cuantil(0.5), h.cuantil(0.99))
+                           for clave, h in self.histogramas.items()}
+
+        resumen = {'contadores': {}, 'histogramas': {}}
+        for (nombre, etiquetas), valor in sorted(contadores.items()):
+            if etiquetas:
+                resumen['contadores'].setdefault(nombre, {})[','.join(v for _, v in etiquetas)] = valor
+            else:
+                resumen['contadores'][nombre] = valor
+        for (nombre, etiquetas), (cantidad, suma, p50, p99) in sorted(histogramas.items()):
+            serie = {
+                'cantidad': cantidad,
+                'total_segundos': round(suma, 3),
+                'media_ms': round(suma / cantidad * 1000, 2),
+                'p50_ms': round(p50 * 1000, 2),
+                'p99_ms': round(p99 * 1000, 2)
+            }
+            if etiquetas:
+                resumen['histogramas'].setdefault(nombre, {})[','.join(v for _, v in etiquetas)] = serie
+            else:
+                resumen['histogramas'][nombre] = serie
+        return resumen
+
+    def prometheus(self):
+        """Texto en formato de exposición de Prometheus"""
+        with self.lock:
+            contadores = dict(self.contadores)
+            histogramas = {clave: (list(h.conteos), h.suma, h.cantidad) for clave, h in self.histogramas.items()}
+
+        lineas = []
+        nombres_contadores = {n for n, _ in contadores}
+        for nombre in sorted(nombres_contadores | {n for n, _ in histogramas}):
+            tipo, descripcion = DESCRIPCIONES.get(
+                nombre, ('counter' if nombre in nombres_contadores else 'histogram', nombre))
+            metrica = f"{PREFIJO}_{nombre}" + ('_total' if tipo == 'counter' else '')
+            lineas.append(f"# HELP {metrica} {descripcion}")
+            lineas.append(f"# TYPE {metrica} {tipo}")
+            for (n, etiquetas), valor in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{metrica}{{{_formato_etiquetas(self.fijas + etiquetas)}}} {valor}")
+            for (n, etiquetas), (conteos, suma, cantidad) in sorted(histogramas.items()):
+                if n != nombre:
+                    continue
+                base = self.fijas + etiquetas
+                acumulado = 0
+                for limite, conteo in zip(list(BUCKETS) + ['+Inf'], conteos):
+                    acumulado += conteo
+                    lineas.append(f"{metrica}_bucket{{{_formato_etiquetas(base + (('le', str(limite)),))}}} {acumulado}")
+                lineas.append(f"{metrica}_sum{{{_formato_etiquetas(base)}}} {suma:.6f}")
+                lineas.append(f"{metrica}_count{{{_formato_etiquetas(base)}}} {cantidad}")
+        return '\n'.join(lineas) + '\n'
+
+    def exportar_prometheus(self, ruta):
+        """Escribe el textfile de forma atómica, para que el colector de node_exporter nunca lea uno a medias"""
+        escribir_atomico([self.prometheus().encode('utf-8')], ruta)
+        return ruta
+
+
+def _pool_cronometrado(clase_pool, metricas):
+    """Pool de urllib3 cuyas conexiones registran el tiempo de conexión (resolución DNS, TCP y TLS)"""
+    class Conexion(clase_pool.ConnectionCls):
+        def connect(self):
+            with metricas.cronometro('conexion'):
+                super().connect()
+
+    class Pool(clase_pool):
+        ConnectionCls = Conexion
+
+    return Pool
+
+
+class AdaptadorInstrumentado(HTTPAdapter):
+    """HTTPAdapter que mide el establecimiento de cada conexión nueva del pool"""
+
+    def __init__(self, metricas, **kwargs):
+        # init_poolmanager se llama desde HTTPAdapter.__init__
+        self.metricas = metricas
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _pool_cronometrado(HTTPConnectionPool, self.metricas),
+            'https': _pool_cronometrado(HTTPSConnectionPool, self.metricas)
+        }
+
+
+def ruta_textfile(nombre, carpeta=CARPETA_METRICAS):
+    return os.path.join(carpeta, f"{PREFIJO}_{nombre}.prom")
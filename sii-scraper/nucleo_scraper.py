@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Núcleo compartido por los scrapers del SII y de LeyChile
+Sesión HTTP con pool de conexiones y caché, limitador por host, logging y reportes;
+permite rastrear ambos sitios de forma concurrente en un solo proceso
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+from almacen import AlmacenContenido
+from cache_http import SesionCache
+from limitador import LimitadorPorHost
+from manifiesto import Manifiesto
+from metricas import AdaptadorInstrumentado, Metricas, ruta_textfile
+from resiliencia import CircuitBreaker, PoliticaReintentos
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+FORMATO_LOG = '%(asctime)s - %(levelname)s - %(message)s'
+
+RUTA_CONFIGURACION = 'config.json'
+
+# Valores usados cuando config.json no existe o no define la clave
+CONFIGURACION_POR_DEFECTO = {
+    'delay_entre_descargas': 1,
+    'reintentos_maximos': 3,
+    'timeout_requests': 30,
+    'backoff_base': 1.0,
+    'backoff_maximo': 60.0,
+    'umbral_fallos_circuito': 5,
+    'pausa_circuito': 60.0,
+    'max_aperturas_circuito': 3,
+    'user_agent': USER_AGENT
+}
+
+
+def cargar_configuracion(ruta=RUTA_CONFIGURACION):
+    """Lee la sección `configuracion` de config.json completando con los valores por defecto"""
+    configuracion = dict(CONFIGURACION_POR_DEFECTO)
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            configuracion.update(json.load(f).get('configuracion', {}))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logging.warning(f"No se pudo leer {ruta}, se usan valores por defecto: {str(e)}")
+    return configuracion
+
+
+def configurar_logging(archivo_log):
+    """Configura el logging a consola y a `archivo_log` (se llama desde cada main, no al importar)"""
+    carpeta = os.path.dirname(archivo_log)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=FORMATO_LOG,
+        handlers=[
+            logging.FileHandler(archivo_log),
+            logging.StreamHandler()
+        ]
+    )
+
+
+class ScraperBase:
+    """Base de las fuentes: cada scraper define sus URLs y su método `ejecutar`"""
+
+    # Prefijo de los reportes en data/
+    nombre = 'scraper'
+    # Hosts de la fuente: cada una repara solo los archivos que descargó
+    dominios = ()
+
+    def __init__(self, max_workers=4, solicitudes_por_segundo=None, max_conexiones_por_host=None,
+                 manifiesto=None, limitador=None, configuracion=None, metricas=None, almacen=None):
+        self.configuracion = configuracion if configuracion is not None else cargar_configuracion()
+
+        # Contadores y tiempos por etapa de esta fuente; van al reporte y a data/metricas/
+        self.metricas = metricas if metricas is not None else Metricas(fuente=self.nombre)
+
+        # Manifiesto de lo descargado; la sesión lo usa para revalidar páginas y documentos
+        self.manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        # Los documentos se guardan una vez por contenido; las carpetas por tipo y año son vistas
+        self.almacen = almacen if almacen is not None else AlmacenContenido(self.manifiesto)
+        self.session = SesionCache(
+            self.manifiesto,
+            timeout=self.configuracion['timeout_requests'],
+            reintentos=PoliticaReintentos(
+                reintentos_maximos=self.configuracion['reintentos_maximos'],
+                backoff_base=self.configuracion['backoff_base'],
+                backoff_maximo=self.configuracion['backoff_maximo']
+            ),
+            circuito=CircuitBreaker(
+                umbral_fallos=self.configuracion['umbral_fallos_circuito'],
+                pausa=self.configuracion['pausa_circuito'],
+                max_aperturas=self.configuracion['max_aperturas_circuito']
+            ),
+            metricas=self.metricas
+        )
+        self.session.headers.update({'User-Agent': self.configuracion['user_agent']})
+
+        # Keep-alive: el pool de conexiones debe alcanzar para todos los workers
+        self.max_workers = max_workers
+        adaptador = AdaptadorInstrumentado(self.metricas, pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+
+        # Presupuesto de solicitudes y conexiones simultáneas por host; puede compartirse entre fuentes
+        if solicitudes_por_segundo is None:
+            delay = self.configuracion['delay_entre_descargas']
+            solicitudes_por_segundo = 1.0 / delay if delay else 0
+        if limitador is None:
+            limitador = LimitadorPorHost(solicitudes_por_segundo,
+                                         max_conexiones_por_host=max_conexiones_por_host or max_workers)
+        self.limitador = limitador
+        # La sesión toma ficha y conexión en cada intento, reintentos incluidos
+        self.session.limitador = limitador
+
+    def obtener(self, url, **kwargs):
+        """GET respetando el limitador del host; con stream=True usar `with self.obtener(...) as response`"""
+        return self.session.get(url, **kwargs)
+
+    def registrar_documento(self, exito, segundos):
+        """Cuenta el resultado de un documento y su duración total"""
+        self.metricas.incrementar('documentos', resultado='exitoso' if exito else 'fallido')
+        self.metricas.observar('documento_segundos', segundos)
+
+    def es_propia(self, url):
+        host = urlparse(url).hostname or ''
+        return any(host == d or host.endswith('.' + d) for d in self.dominios)
+
+    def reparar_pendientes(self, max_intentos=3):
+        """Vuelve a descargar los archivos dañados de la cola de reparación; retorna (reparados, fallidos)
+
+        La descarga se valida en un temporal del almacén: la vista dañada solo se reemplaza si la nueva pasa
+        """
+        from verificacion import CORRECTO, revisar_archivo
+
+        reparados = fallidos = 0
+        for reparacion in self.manifiesto.reparaciones(max_intentos):
+            if not self.es_propia(reparacion['url']):
+                continue
+            url, ruta = reparacion['url'], reparacion['ruta']
+            extension = os.path.splitext(ruta)[1].lower()
+            inicio = time.perf_counter()
+
+            def validar(temporal, sha256, tamaño):
+                # El servidor también puede responder 200 con una página de error
+                estado = revisar_archivo(temporal, sha256, tamaño, extension=extension)
+                if estado != CORRECTO:
+                    raise ValueError(f"la nueva descarga también es inválida ({estado})")
+                # Un blob dañado con el mismo hash se descarta para que la copia nueva ocupe su lugar
+                blob = self.almacen.ruta_blob(sha256)
+                if os.path.exists(blob) and revisar_archivo(blob, sha256, tamaño, extension=extension) != CORRECTO:
+                    os.remove(blob)
+
+            try:
+                anterior = self.manifiesto.catalogo(url)
+                # Descarga completa: la copia local está dañada y no sirve para responder un 304
+                with self.session.get(url, headers={'If-None-Match': None, 'If-Modified-Since': None},
+                                      stream=True) as response:
+                    response.raise_for_status()
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+                    sha256, tamaño = self.almacen.guardar_respuesta(response, validar=validar)
+
+                self.almacen.registrar(url, sha256, ruta, numero=anterior['numero'] if anterior else None)
+                self.manifiesto.registrar(url, etag=etag, last_modified=last_modified, sha256=sha256,
+                                          bytes=tamaño, ruta_local=ruta)
+                # Un documento del archivo frío sale de su paquete para que la próxima pasada lo rehaga
+                paquete = anterior and self.manifiesto.paquete_de(anterior['sha256'])
+                if paquete:
+                    self.manifiesto.registrar_paquete(paquete,
+                                                      self.manifiesto.empaquetados(paquete) - {anterior['sha256']})
+                self.manifiesto.resolver_reparacion(url)
+                reparados += 1
+                logging.info(f"🔧 Reparado: {ruta}")
+                exito = True
+            except Exception as e:
+                self.manifiesto.resolver_reparacion(url, error=f"{type(e).__name__}: {str(e)}")
+                fallidos += 1
+                logging.error(f"Error reparando {ruta}: {str(e)}")
+                exito = False
+            self.registrar_documento(exito, time.perf_counter() - inicio)
+        return reparados, fallidos
+
+    def guardar_reporte(self, resultados):
+        """Guarda un reporte JSON con marca de tiempo y las métricas de la ejecución; retorna su ruta"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        reporte_file = f"data/reporte_{self.nombre}_{timestamp}.json"
+        os.makedirs('data', exist_ok=True)
+
+        resultados['metricas'] = self.metricas.resumen()
+        self.metricas.exportar_prometheus(ruta_textfile(self.nombre))
+
+        with open(reporte_file, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+        return reporte_file
+
+    def ejecutar(self):
+        raise NotImplementedError
+
+
+async def rastrear_concurrente(fuentes):
+    """Ejecuta varias fuentes a la vez; cada una corre su propio pool de descargas"""
+    tareas = [asyncio.to_thread(fuente.ejecutar) for fuente in fuentes]
+    return await asyncio.gather(*tareas, return_exceptions=True)
+
+
+def main(argv=None, prog=None):
+    """Rastrea el SII y LeyChile en paralelo dentro de un mismo proceso (`argv` y `prog` los pasa cli.py)"""
+    parser = argparse.ArgumentParser(prog=prog, description="SII y LeyChile en paralelo en un solo proceso")
+    parser.add_argument('--workers', type=int,
+                        help="Descargas concurrentes por fuente (por defecto: 4 para el SII, 2 para LeyChile)")
+    args = parser.parse_args(argv)
+
+    from leychile_scraper import LeyChileScraper
+    from sii_scraper import SIIScraper
+
+    print("🏛️  Scraper de Normativa SII + Leyes Tributarias")
+    print("=" * 50)
+
+    for carpeta in ['leyes', 'resoluciones', 'circulares', 'oficios', 'schemas', 'data', 'logs']:
+        os.makedirs(carpeta, exist_ok=True)
+    configurar_logging('logs/rastreo.log')
+
+    # Un solo manifiesto para ambas fuentes; cada host conserva su propio presupuesto
+    manifiesto = Manifiesto()
+    opciones = {'max_workers': args.workers} if args.workers else {}
+    fuentes = [SIIScraper(manifiesto=manifiesto, **opciones), LeyChileScraper(manifiesto=manifiesto, **opciones)]
+    resultados = asyncio.run(rastrear_concurrente(fuentes))
+
+    fallidas = 0
+    for fuente, resultado in zip(fuentes, resultados):
+        if isinstance(resultado, Exception):
+            print(f"❌ {fuente.nombre}: {resultado}")
+            fallidas += 1
+        else:
+            print(f"✅ {fuente.nombre}: completado")
+    return 1 if fallidas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+OCR de respaldo para los PDFs escaneados: detecta en las extracciones las páginas sin capa de texto,
+las rasteriza con pdftoppm y las reconoce con Tesseract (CPU) en un pool de procesos
+Cada página reconocida se guarda en caché por hash del PDF, así que repetir la etapa no cuesta nada
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+
+from escritura import escribir_atomico
+from extraccion_texto import cargar_texto, normalizar_texto
+from manifiesto import Manifiesto
+
+CARPETA_OCR = 'data/ocr'
+
+# Una página con menos caracteres que esto se considera imagen (los escaneos a veces traen un folio o un sello)
+MIN_CARACTERES = 25
+IDIOMA = 'spa'
+DPI = 300
+
+
+def paginas_sin_texto(documento, min_caracteres=MIN_CARACTERES):
+    """Números de las páginas de un documento extraído que no tienen capa de texto"""
+    return [p['numero'] for p in documento['paginas'] if p['caracteres'] < min_caracteres and not p.get('ocr')]
+
+
+def verificar_herramientas(idioma=IDIOMA):
+    faltantes = [programa for programa in ('pdftoppm', 'tesseract') if shutil.which(programa) is None]
+    if faltantes:
+        raise RuntimeError(f"Faltan {', '.join(faltantes)} en el PATH (poppler-utils y tesseract-ocr con el "
+                           f"idioma '{idioma}')")
+
+
+def ruta_cache(sha256, pagina, idioma=IDIOMA, dpi=DPI, carpeta=CARPETA_OCR):
+    return os.path.join(carpeta, sha256[:2], f"{sha256}_p{pagina}_{idioma}_{dpi}.txt")
+
+
+def ocr_pagina(ruta_pdf, sha256, pagina, idioma=IDIOMA, dpi=DPI, carpeta=CARPETA_OCR):
+    """Rasteriza y reconoce una página (se ejecuta en un proceso del pool); retorna el texto y su costo en CPU"""
+    antes = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Tesseract usa varios hilos por defecto; el paralelismo lo pone el pool, un proceso por núcleo
+    entorno = dict(os.environ, OMP_THREAD_LIMIT='1')
+    with tempfile.TemporaryDirectory(prefix='ocr_') as temporal:
+        subprocess.run(['pdftoppm', '-f', str(pagina), '-l', str(pagina), '-r', str(dpi), '-gray', '-png',
+                        ruta_pdf, os.path.join(temporal, 'pagina')], check=True, capture_output=True)
+        imagenes = glob.glob(os.path.join(temporal, 'pagina*.png'))
+        if not imagenes:
+            raise RuntimeError(f"pdftoppm no generó la página {pagina}")
+        resultado = subprocess.run(['tesseract', imagenes[0], 'stdout', '-l', idioma], check=True,
+                                   capture_output=True, env=entorno)
+    texto = normalizar_texto(resultado.stdout.decode('utf-8', errors='replace'))
+    escribir_atomico([texto.encode('utf-8')], ruta_cache(sha256, pagina, idioma, dpi, carpeta))
+
+    despues = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (despues.ru_utime - antes.ru_utime) + (despues.ru_stime - antes.ru_stime)
+    return {'sha256': sha256, 'pagina': pagina, 'texto': texto, 'cpu_segundos': cpu}
+
+
+class ProcesadorOCR:
+    def __init__(self, manifiesto=None, carpeta=CARPETA_OCR, max_workers=None, idioma=IDIOMA, dpi=DPI,
+                 min_caracteres=MIN_CARACTERES):
+        self.manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        self.carpeta = carpeta
+        # Por defecto un proceso por núcleo: el OCR es intensivo en CPU
+        self.max_workers = max_workers or os.cpu_count()
+        self.idioma = idioma
+        self.dpi = dpi
+        self.min_caracteres = min_caracteres
+        self._archivo = None
+
+    def _ruta_legible(self, pila, extraccion):
+        """Ruta del PDF de una extracción; si su año ya pasó al archivo frío, un temporal que vive lo que `pila`"""
+        if extraccion['ruta_pdf'] and os.path.exists(extraccion['ruta_pdf']):
+            return extraccion['ruta_pdf']
+        if self._archivo is None:
+            from archivo_frio import ArchivoFrio
+            self._archivo = ArchivoFrio(self.manifiesto)
+        return pila.enter_context(self._archivo.ruta_legible(extraccion['sha256'], extraccion['ruta_pdf']))
+
+    def detectar(self):
+        """Extracciones con páginas sin texto: [(extracción, documento, páginas)]"""
+        marcados = []
+        for extraccion in self.manifiesto.extracciones():
+            try:
+                documento = cargar_texto(extraccion['ruta_texto'])
+            except (OSError, ValueError) as e:
+                logging.error(f"Error leyendo {extraccion['ruta_texto']}: {str(e)}")
+                continue
+            paginas = paginas_sin_texto(documento, self.min_caracteres)
+            if paginas:
+                marcados.append((extraccion, documento, paginas))
+        return marcados
+
+    def _cacheado(self, sha256, pagina):
+        try:
+            with open(ruta_cache(sha256, pagina, self.idioma, self.dpi, self.carpeta), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _actualizar(self, extraccion, documento, textos):
+        """Incorpora el texto reconocido a la extracción y la vuelve a registrar en el manifiesto"""
+        for pagina in documento['paginas']:
+            if pagina['numero'] in textos:
+                pagina['texto'] = textos[pagina['numero']]
+                pagina['caracteres'] = len(pagina['texto'])
+                pagina['ocr'] = True
+        if not documento['extractor'].endswith('+tesseract'):
+            documento['extractor'] += '+tesseract'
+        escribir_atomico([json.dumps(documento, ensure_ascii=False).encode('utf-8')], extraccion['ruta_texto'])
+        self.manifiesto.registrar_extraccion(
+            extraccion['sha256'], extraccion['ruta_pdf'], extraccion['ruta_texto'], len(documento['paginas']),
+            sum(p['caracteres'] for p in documento['paginas']), documento['extractor'])
+
+    def procesar(self, marcados=None):
+        """Reconoce las páginas sin texto (las que no están en caché) y actualiza sus extracciones"""
+        inicio = time.perf_counter()
+        marcados = self.detectar() if marcados is None else marcados
+        textos = {extraccion['sha256']: {} for extraccion, _, _ in marcados}
+        pendientes = []
+        for extraccion, _, paginas in marcados:
+            for pagina in paginas:
+                texto = self._cacheado(extraccion['sha256'], pagina)
+                if texto is None:
+                    pendientes.append((extraccion, pagina))
+                else:
+                    textos[extraccion['sha256']][pagina] = texto
+
+        resultados = {'documentos': len(marcados), 'paginas': sum(len(p) for _, _, p in marcados),
+                      'en_cache': sum(len(t) for t in textos.values()), 'reconocidas': 0, 'fallidas': 0,
+                      'cpu_segundos': 0.0, 'workers': self.max_workers}
+        logging.info(f"OCR: {len(pendientes)} páginas pendientes de {resultados['paginas']} sin texto")
+        if pendientes:
+            verificar_herramientas(self.idioma)
+            with ExitStack() as pila, ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                rutas = {}
+                futuros = {}
+                for extraccion, pagina in pendientes:
+                    sha256 = extraccion['sha256']
+                    if sha256 not in rutas:
+                        try:
+                            rutas[sha256] = self._ruta_legible(pila, extraccion)
+                        except KeyError:
+                            logging.error(f"Sin PDF ni paquete para {extraccion['ruta_pdf']} ({sha256})")
+                            rutas[sha256] = None
+                    if rutas[sha256] is None:
+                        resultados['fallidas'] += 1
+                        continue
+                    futuro = executor.submit(ocr_pagina, rutas[sha256], sha256, pagina, self.idioma, self.dpi,
+                                             self.carpeta)
+                    futuros[futuro] = (extraccion['ruta_pdf'], pagina)
+                for futuro in as_completed(futuros):
+                    ruta, pagina = futuros[futuro]
+                    try:
+                        resultado = futuro.result()
+                    except Exception as e:
+                        logging.error(f"Error en OCR de {ruta} (p. {pagina}): {str(e)}")
+                        resultados['fallidas'] += 1
+                        continue
+                    textos[resultado['sha256']][resultado['pagina']] = resultado['texto']
+                    resultados['reconocidas'] += 1
+                    resultados['cpu_segundos'] += resultado['cpu_segundos']
+
+        actualizados = []
+        for extraccion, documento, _ in marcados:
+            if textos[extraccion['sha256']]:
+                self._actualizar(extraccion, documento, textos[extraccion['sha256']])
+                actualizados.append((extraccion, documento))
+
+        segundos = time.perf_counter() - inicio
+        resultados['segundos'] = round(segundos, 2)
+        resultados['cpu_segundos'] = round(resultados['cpu_segundos'], 2)
+        if resultados['reconocidas'] and segundos:
+            resultados['paginas_por_segundo'] = round(resultados['reconocidas'] / segundos, 2)
+            resultados['paginas_por_segundo_por_nucleo'] = round(
+                resultados['reconocidas'] / segundos / min(self.max_workers, len(pendientes)), 3)
+            resultados['cpu_segundos_por_pagina'] = round(resultados['cpu_segundos'] / resultados['reconocidas'], 2)
+        logging.info(f"OCR completado: {resultados}")
+        return resultados, actualizados
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="OCR de las páginas escaneadas de la normativa descargada")
+    parser.add_argument('--workers', type=int, help="Procesos en paralelo (por defecto: núcleos de la CPU)")
+    parser.add_argument('--idioma', default=IDIOMA, help="Idioma de Tesseract (por defecto: spa)")
+    parser.add_argument('--dpi', type=int, default=DPI, help="Resolución de rasterizado (por defecto: 300)")
+    parser.add_argument('--min-caracteres', type=int, default=MIN_CARACTERES,
+                        help="Páginas con menos caracteres se tratan como imagen (por defecto: 25)")
+    parser.add_argument('--detectar', action='store_true', help="Solo listar los PDFs con páginas sin texto")
+    parser.add_argument('--sin-indexar', action='store_true', help="No actualizar el índice de texto completo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    procesador = ProcesadorOCR(max_workers=args.workers, idioma=args.idioma, dpi=args.dpi,
+                               min_caracteres=args.min_caracteres)
+    marcados = procesador.detectar()
+
+    if args.detectar:
+        for extraccion, documento, paginas in marcados:
+            completo = '🖼️  solo imagen' if len(paginas) == len(documento['paginas']) else f"{len(paginas)} páginas"
+            print(f"{extraccion['ruta_pdf']}: {completo}")
+        print(f"\n🔍 {len(marcados)} PDFs con páginas sin texto")
+        return
+
+    resultados, actualizados = procesador.procesar(marcados)
+    if actualizados and not args.sin_indexar:
+        from indice_texto import IndiceTexto
+
+        # La extracción quedó con una versión nueva en el manifiesto: construir reindexa esos documentos
+        IndiceTexto().construir(procesador.manifiesto)
+
+    print(f"🖼️  Páginas sin texto: {resultados['paginas']} en {resultados['documentos']} PDFs")
+    print(f"💾 En caché: {resultados['en_cache']}  ✅ Reconocidas: {resultados['reconocidas']}  "
+          f"❌ Fallidas: {resultados['fallidas']}")
+    if resultados.get('paginas_por_segundo'):
+        print(f"⏱️  {resultados['paginas_por_segundo']} páginas/s, "
+              f"{resultados['paginas_por_segundo_por_nucleo']} páginas/s por núcleo, "
+              f"{resultados['cpu_segundos_por_pagina']} s de CPU por página")
+
+
+if __name__ == "__main__":
+    main()
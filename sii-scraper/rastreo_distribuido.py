@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Rastreo distribuido del SII sobre una cola de trabajo compartida (la frontera SQLite con arriendo de filas)
+El descubrimiento siembra los enlaces (url, tipo, año) de los índices; cualquier cantidad de procesos, en una
+o varias máquinas, arrienda lotes, descarga y confirma cada documento. Las escrituras en el almacén por
+contenido son idempotentes, así que un documento descargado dos veces (arriendo vencido) queda una sola vez
+La cola es una base propia (data/cola_distribuida.db), separada del checkpoint local que sii_scraper.py reinicia
+El límite de solicitudes por host es del rastreo completo: cada trabajador registra un latido en la cola y toma
+su parte según cuántos están activos en todas las máquinas
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from frontera import RUTA_COLA, FronteraRastreo
+from manifiesto import Manifiesto
+from metricas import ruta_textfile
+from nucleo_scraper import cargar_configuracion, configurar_logging
+from sii_scraper import SIIScraper
+
+# Tipo de documento de cada índice anual, como lo usa SIIScraper para nombrar archivos
+TIPOS_INDICE = {'resoluciones': 'resolucion', 'circulares': 'circular'}
+
+ARRIENDO = 600
+MAX_INTENTOS = 3
+# Espera cuando no hay nada libre pero otros trabajadores aún tienen arriendos vigentes
+ESPERA_COLA = 2.0
+# Cada cuánto un trabajador renueva su latido y recalcula su parte del presupuesto por host
+INTERVALO_REPARTO = 15.0
+
+
+def sembrar(scraper, frontera, años=None, tipos=tuple(TIPOS_INDICE)):
+    """Descubre los índices y deja sus enlaces en la cola; los ya sembrados no se vuelven a consultar"""
+    scraper.frontera = frontera
+    indices = scraper.descubrir_indices(años, tipos)
+    return sum(len(enlaces) for enlaces in indices.values())
+
+
+def trabajar(frontera, scraper, trabajador, lote=None, arriendo=ARRIENDO, max_intentos=MAX_INTENTOS,
+             presupuesto=None):
+    """Arrienda, descarga y confirma documentos hasta vaciar la cola; retorna (exitosos, fallidos)
+
+    `presupuesto` son las solicitudes por segundo por host de todo el rastreo; este trabajador usa
+    presupuesto / trabajadores activos en la cola (None o 0: el limitador del scraper queda como está)
+    """
+    lote = lote or scraper.max_workers * 4
+    exitosos = fallidos = 0
+    reparto = {'proximo': 0.0}
+    lock_reparto = threading.Lock()
+
+    def repartir():
+        with lock_reparto:
+            if time.monotonic() < reparto['proximo']:
+                return
+            reparto['proximo'] = time.monotonic() + INTERVALO_REPARTO
+            frontera.latido(trabajador, max(arriendo, 2 * INTERVALO_REPARTO))
+            if presupuesto:
+                activos = max(1, frontera.trabajadores_activos())
+                scraper.limitador.ajustar(presupuesto / activos)
+
+    def descargar(documento):
+        repartir()
+        tipo, año = documento['tipo'], documento['año']
+        carpeta_destino = f"{tipo}/{año}"
+        os.makedirs(carpeta_destino, exist_ok=True)
+        inicio = time.perf_counter()
+        try:
+            exito = scraper.descargar_documento(documento, carpeta_destino, TIPOS_INDICE.get(tipo, tipo))
+        except Exception as e:
+            logging.error(f"Error descargando {documento['url']}: {str(e)}")
+            exito = False
+        scraper.registrar_documento(exito, time.perf_counter() - inicio)
+        if not frontera.marcar(tipo, año, documento['url'], exito, trabajador):
+            logging.warning(f"Arriendo vencido de {documento['url']}: el resultado queda al trabajador que lo tomó")
+        return exito
+
+    try:
+        with ThreadPoolExecutor(max_workers=scraper.max_workers) as executor:
+            while True:
+                repartir()
+                documentos = frontera.arrendar(trabajador, lote, arriendo, max_intentos)
+                if not documentos:
+                    if not frontera.pendientes(max_intentos):
+                        break
+                    time.sleep(ESPERA_COLA)
+                    continue
+                for exito in executor.map(descargar, documentos):
+                    if exito:
+                        exitosos += 1
+                    else:
+                        fallidos += 1
+    finally:
+        # Su parte del presupuesto vuelve a los demás en su próximo reparto
+        frontera.retirar(trabajador)
+    return exitosos, fallidos
+
+
+def _proceso_trabajador(indice, ruta_frontera, modo_diario, max_workers, solicitudes_por_segundo, lote, arriendo,
+                        configuracion=None):
+    """Un trabajador por proceso, cada uno con su sesión, su limitador y su parte del presupuesto por host"""
+    trabajador = f"{socket.gethostname()}-{os.getpid()}"
+    frontera = FronteraRastreo(ruta_frontera, modo_diario=modo_diario)
+    scraper = SIIScraper(max_workers=max_workers, solicitudes_por_segundo=solicitudes_por_segundo,
+                         manifiesto=Manifiesto(modo_diario=modo_diario), configuracion=configuracion)
+    inicio = time.perf_counter()
+    exitosos, fallidos = trabajar(frontera, scraper, trabajador, lote, arriendo, presupuesto=solicitudes_por_segundo)
+    scraper.metricas.exportar_prometheus(ruta_textfile(f"sii_{socket.gethostname()}_trabajador{indice}"))
+    scraper.manifiesto.cerrar()
+    frontera.cerrar()
+    return {'trabajador': trabajador, 'exitosos': exitosos, 'fallidos': fallidos,
+            'segundos': round(time.perf_counter() - inicio, 2)}
+
+
+def lanzar(procesos, ruta_frontera=RUTA_COLA, modo_diario='WAL', max_workers=4, solicitudes_por_segundo=1.0,
+           lote=None, arriendo=ARRIENDO, configuracion=None):
+    """Ejecuta `procesos` trabajadores locales; el límite por host se reparte entre todos los trabajadores
+    activos de la cola, de esta y de las demás máquinas
+    """
+    argumentos = [(i, ruta_frontera, modo_diario, max_workers, solicitudes_por_segundo, lote, arriendo, configuracion)
+                  for i in range(procesos)]
+    with multiprocessing.Pool(procesos) as pool:
+        return pool.starmap(_proceso_trabajador, argumentos)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Rastreo distribuido del SII sobre una cola compartida")
+    parser.add_argument('--raiz', default='.',
+                        help="Carpeta con data/, las vistas y el almacén; en varias máquinas, la misma en el volumen "
+                             "compartido (por defecto: la actual)")
+    parser.add_argument('--frontera', default=RUTA_COLA,
+                        help="Base SQLite de la cola, relativa a --raiz (por defecto: data/cola_distribuida.db)")
+    parser.add_argument('--volumen-compartido', action='store_true',
+                        help="--raiz está en un volumen de red compartido entre máquinas (la cola y el manifiesto "
+                             "sin WAL)")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    sembrar_parser = subparsers.add_parser('sembrar', help="Descubrir los índices y encolar sus documentos")
+    sembrar_parser.add_argument('--desde', type=int, help="Primer año (por defecto: año actual - 4)")
+    sembrar_parser.add_argument('--hasta', type=int, help="Último año (por defecto: año actual)")
+    trabajar_parser = subparsers.add_parser('trabajar', help="Arrendar y descargar documentos hasta vaciar la cola")
+    trabajar_parser.add_argument('--procesos', type=int, default=os.cpu_count(),
+                                 help="Trabajadores en esta máquina (por defecto: núcleos de la CPU)")
+    trabajar_parser.add_argument('--workers', type=int, default=4, help="Descargas concurrentes por proceso")
+    trabajar_parser.add_argument('--solicitudes-por-segundo', type=float, default=1.0,
+                                 help="Límite por host de todo el rastreo, repartido entre los trabajadores activos "
+                                      "de todas las máquinas (0: sin límite)")
+    trabajar_parser.add_argument('--lote', type=int, help="Documentos por arriendo (por defecto: 4 por worker)")
+    trabajar_parser.add_argument('--arriendo', type=float, default=ARRIENDO,
+                                 help="Segundos antes de que un documento arrendado vuelva a la cola")
+    subparsers.add_parser('estado', help="Documentos por tipo, año y estado")
+    args = parser.parse_args()
+
+    # Todas las rutas del scraper (manifiesto, blobs, vistas) son relativas a la carpeta de trabajo; config.json
+    # se lee antes, desde donde se lanzó
+    configuracion = cargar_configuracion()
+    os.chdir(args.raiz)
+    for carpeta in ['resoluciones', 'circulares', 'data', 'logs']:
+        os.makedirs(carpeta, exist_ok=True)
+    configurar_logging(f'logs/rastreo_distribuido_{socket.gethostname()}.log')
+    modo_diario = 'DELETE' if args.volumen_compartido else 'WAL'
+
+    if args.comando == 'sembrar':
+        años = None
+        if args.desde or args.hasta:
+            año_actual = datetime.now().year
+            años = range(args.desde or año_actual - 4, (args.hasta or año_actual) + 1)
+        frontera = FronteraRastreo(args.frontera, modo_diario=modo_diario)
+        scraper = SIIScraper(manifiesto=Manifiesto(modo_diario=modo_diario), configuracion=configuracion)
+        print(f"🌱 {sembrar(scraper, frontera, años)} documentos en la cola")
+    elif args.comando == 'trabajar':
+        inicio = time.perf_counter()
+        resultados = lanzar(args.procesos, args.frontera, modo_diario, args.workers, args.solicitudes_por_segundo,
+                            args.lote, args.arriendo, configuracion)
+        segundos = time.perf_counter() - inicio
+        exitosos = sum(r['exitosos'] for r in resultados)
+        for r in resultados:
+            print(f"👷 {r['trabajador']}: {r['exitosos']} exitosos, {r['fallidos']} fallidos en {r['segundos']}s")
+        print(f"\n✅ {exitosos} documentos en {segundos:.1f}s ({exitosos / segundos if segundos else 0:.1f} docs/s)")
+    else:
+        frontera = FronteraRastreo(args.frontera, modo_diario=modo_diario)
+        for fila in frontera.resumen():
+            print(f"{fila['tipo']:14} {fila['año']}  {fila['estado']:10} {fila['cantidad']}")
+        print(f"\n⏳ Pendientes: {frontera.pendientes(MAX_INTENTOS)}")
+
+
+if __name__ == "__main__":
+    main()
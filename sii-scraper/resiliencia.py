@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Capa de resiliencia HTTP: reintentos con backoff exponencial y jitter, Retry-After y circuit breaker por host
+Los parámetros vienen de config.json (reintentos_maximos, timeout_requests, ...)
+Cada intento toma su ficha y su conexión del limitador; las esperas entre intentos ocurren fuera de la conexión
+"""
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+from metricas import Metricas
+
+# Respuestas que indican un problema transitorio del servidor
+ESTADOS_REINTENTABLES = frozenset({429, 500, 502, 503, 504})
+
+# Errores de red que vale la pena reintentar
+ERRORES_REINTENTABLES = (requests.ConnectionError, requests.Timeout)
+
+
+class CircuitoAbierto(Exception):
+    """El host falló demasiadas veces seguidas y se dejó de consultar"""
+
+
+class PoliticaReintentos:
+    def __init__(self, reintentos_maximos=3, backoff_base=1.0, backoff_maximo=60.0, retry_after_maximo=300.0):
+        self.reintentos_maximos = reintentos_maximos
+        self.backoff_base = backoff_base
+        self.backoff_maximo = backoff_maximo
+        self.retry_after_maximo = retry_after_maximo
+
+    def espera(self, intento, response=None):
+        """Segundos a esperar antes del reintento número `intento` (desde 0)"""
+        retry_after = self._retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.retry_after_maximo)
+        # Full jitter: evita que todos los workers reintenten al mismo tiempo
+        return random.uniform(0, min(self.backoff_maximo, self.backoff_base * 2 ** intento))
+
+    def _retry_after(self, response):
+        if response is None or response.status_code not in (429, 503):
+            return None
+        valor = response.headers.get('Retry-After')
+        if not valor:
+            return None
+        if valor.strip().isdigit():
+            return float(valor)
+        try:
+            fecha = parsedate_to_datetime(valor)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """Tras `umbral_fallos` fallos seguidos de un host, pausa sus solicitudes durante `pausa` segundos
+
+    Al terminar la pausa el circuito queda semiabierto: pasa una sola solicitud de prueba y el resto espera su
+    resultado; si tiene éxito el circuito se cierra, si falla se vuelve a abrir con el doble de pausa
+    """
+
+    def __init__(self, umbral_fallos=5, pausa=60.0, max_aperturas=3):
+        self.umbral_fallos = umbral_fallos
+        self.pausa = pausa
+        self.max_aperturas = max_aperturas
+        self.estado = {}
+        self.condicion = threading.Condition()
+
+    def _estado(self, host):
+        return self.estado.setdefault(host, {'fallos': 0, 'abierto_hasta': 0.0, 'aperturas': 0, 'sondeando': False})
+
+    def antes_de_solicitar(self, host):
+        """Bloquea mientras el circuito del host está abierto o su prueba está en curso; falla si se abrió
+        demasiadas veces seguidas
+        """
+        with self.condicion:
+            while True:
+                estado = self._estado(host)
+                if estado['aperturas'] >= self.max_aperturas:
+                    raise CircuitoAbierto(f"{host} falló {estado['aperturas']} veces seguidas; se detiene el rastreo")
+                espera = estado['abierto_hasta'] - time.monotonic()
+                if espera > 0:
+                    self.condicion.wait(espera)
+                elif estado['sondeando']:
+                    self.condicion.wait(self.pausa)
+                else:
+                    # Semiabierto: esta solicitud es la prueba
+                    estado['sondeando'] = estado['aperturas'] > 0
+                    return
+
+    def registrar_exito(self, host):
+        with self.condicion:
+            estado = self._estado(host)
+            estado.update(fallos=0, aperturas=0, sondeando=False)
+            self.condicion.notify_all()
+
+    def registrar_fallo(self, host):
+        with self.condicion:
+            estado = self._estado(host)
+            estado['fallos'] += 1
+            # Con el circuito semiabierto basta que falle la prueba
+            if estado['fallos'] < self.umbral_fallos and not estado['sondeando']:
+                return
+            # Cada apertura seguida duplica la pausa
+            estado['fallos'] = 0
+            estado['sondeando'] = False
+            estado['aperturas'] += 1
+            pausa = self.pausa * 2 ** (estado['aperturas'] - 1)
+            estado['abierto_hasta'] = time.monotonic() + pausa
+            self.condicion.notify_all()
+        logging.warning(f"Circuito abierto para {host}: pausa de {pausa:.1f}s")
+
+    def reiniciar(self, host=None):
+        """Olvida los fallos y aperturas de `host` (o de todos) para que un proceso de larga duración vuelva a
+        intentar tras una caída larga; una pausa en curso se respeta
+        """
+        with self.condicion:
+            for estado in ([self._estado(host)] if host is not None else self.estado.values()):
+                estado.update(fallos=0, aperturas=0)
+            self.condicion.notify_all()
+
+    def abandonar(self, host):
+        """La solicitud terminó sin éxito ni fallo del host (otro error): si era la prueba, pasa otra"""
+        with self.condicion:
+            estado = self._estado(host)
+            if estado['sondeando']:
+                estado['sondeando'] = False
+                self.condicion.notify_all()
+
+
+def _liberar_al_cerrar(response, liberar):
+    """La conexión del limitador se devuelve cuando se cierra una respuesta `stream=True` (al leer su cuerpo)"""
+    cerrar = response.close
+
+    def close():
+        try:
+            cerrar()
+        finally:
+            liberar()
+    response.close = close
+
+
+class SesionResiliente(requests.Session):
+    """requests.Session con timeout por defecto, reintentos, circuit breaker y limitador (LimitadorPorHost) por host
+
+    Cada intento espera su ficha y ocupa una conexión del host solo mientras dura; con `stream=True` la conexión
+    se libera al cerrar la respuesta (`with session.get(...) as response`)
+    """
+
+    def __init__(self, timeout=None, reintentos=None, circuito=None, metricas=None, limitador=None):
+        super().__init__()
+        # requests no tiene timeout por defecto: sin él una conexión colgada detiene la ejecución
+        self.timeout = timeout
+        self.reintentos = reintentos if reintentos is not None else PoliticaReintentos()
+        self.circuito = circuito if circuito is not None else CircuitBreaker()
+        self.metricas = metricas if metricas is not None else Metricas()
+        # None: sin límite de tasa ni de conexiones
+        self.limitador = limitador
+
+    def _ocupar(self, url):
+        return self.limitador.ocupar(url) if self.limitador is not None else (lambda: None)
+
+    def request(self, method, url, *args, **kwargs):
+        if self.timeout is not None:
+            kwargs.setdefault('timeout', self.timeout)
+        host = urlparse(url).netloc
+
+        intento = 0
+        while True:
+            self.circuito.antes_de_solicitar(host)
+            liberar = self._ocupar(url)
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except ERRORES_REINTENTABLES as e:
+                liberar()
+                self.metricas.incrementar('errores_red', tipo=e.__class__.__name__)
+                self.circuito.registrar_fallo(host)
+                if intento >= self.reintentos.reintentos_maximos:
+                    raise
+                espera = self.reintentos.espera(intento)
+                logging.warning(f"Error de red en {url} ({e.__class__.__name__}); reintento en {espera:.1f}s")
+            except BaseException:
+                liberar()
+                self.circuito.abandonar(host)
+                raise
+            else:
+                # elapsed: desde el envío hasta recibir los encabezados (incluye la conexión si es nueva)
+                self.metricas.observar('etapa_segundos', response.elapsed.total_seconds(), etapa='ttfb')
+                self.metricas.incrementar('solicitudes_http', estado=response.status_code)
+                if response.status_code not in ESTADOS_REINTENTABLES or intento >= self.reintentos.reintentos_maximos:
+                    if response.status_code in ESTADOS_REINTENTABLES:
+                        self.circuito.registrar_fallo(host)
+                    else:
+                        self.circuito.registrar_exito(host)
+                    if kwargs.get('stream'):
+                        _liberar_al_cerrar(response, liberar)
+                    else:
+                        liberar()
+                    return response
+                self.circuito.registrar_fallo(host)
+                espera = self.reintentos.espera(intento, response)
+                logging.warning(f"HTTP {response.status_code} en {url}; reintento en {espera:.1f}s")
+                response.close()
+                liberar()
+
+            # La espera ocurre sin ocupar conexión; el próximo intento toma una ficha nueva
+            intento += 1
+            self.metricas.incrementar('reintentos')
+            time.sleep(espera)
@@ -4,33 +4,68 @@ Scraper para descargar normativa del SII (Servicio de Impuestos Internos)
 Descarga resoluciones, circulares, oficios y documentos técnicos
 """
 
-import requests
 import os
 import time
 import logging
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import lxml.html
+from lxml import etree
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlsplit, urlunsplit
 import json
 import re
+import sys
+import argparse
+from email.utils import formatdate, parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/sii_scraper.log'),
-        logging.StreamHandler()
-    ]
-)
+from frontera import FronteraRastreo, INDICE_DESCUBIERTO, INDICE_INEXISTENTE
+from nucleo_scraper import ScraperBase, configurar_logging
 
-class SIIScraper:
-    def __init__(self):
+# Enlaces de un índice que apuntan a documentos (extensión o palabra clave en el href)
+PATRON_ENLACE_DOCUMENTO = re.compile(r'\.pdf|\.docx?|resolucion|circular|oficio|res_|cir_', re.IGNORECASE)
+
+# Número del documento en el texto del enlace ("Resolución Ex. SII N° 45") o en el archivo (reso45.pdf)
+NUMERO_EN_TEXTO = re.compile(r'N[°º]\s*\.?\s*(\d+)', re.IGNORECASE)
+NUMERO_EN_ARCHIVO = re.compile(r'(\d+)\.\w+$')
+
+# Extensiones que se conservan al nombrar una descarga (los schemas son ZIP); el resto se guarda como .pdf
+EXTENSIONES_DOCUMENTO = ('.pdf', '.zip', '.xml', '.xsd', '.doc', '.docx')
+
+
+def normalizar_url(url):
+    """Forma canónica de una URL: sin fragmento, esquema y host en minúsculas, query ordenada
+    y sin barra final (salvo la raíz), para que variantes del mismo enlace cuenten una vez"""
+    partes = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True))) if partes.query else ''
+    ruta = partes.path
+    if len(ruta) > 1 and ruta.endswith('/'):
+        ruta = ruta.rstrip('/') or '/'
+    return urlunsplit((partes.scheme.lower(), partes.netloc.lower(), ruta, query, ''))
+
+
+def numero_documento(enlace):
+    """Número de la resolución o circular de un enlace, o None si no se puede deducir"""
+    coincidencia = NUMERO_EN_TEXTO.search(enlace.get('texto') or '') or \
+        NUMERO_EN_ARCHIVO.search(urlparse(enlace['url']).path)
+    return coincidencia.group(1) if coincidencia else None
+
+
+class SIIScraper(ScraperBase):
+    nombre = 'sii'
+    dominios = ('sii.cl',)
+    
+    def __init__(self, max_workers=4, solicitudes_por_segundo=None, revalidar=False, manifiesto=None,
+                 años=None, frontera=None, **kwargs):
+        super().__init__(max_workers=max_workers, solicitudes_por_segundo=solicitudes_por_segundo,
+                         manifiesto=manifiesto, **kwargs)
         self.base_url = "https://www.sii.cl"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        
+        # Checkpoint opcional (FronteraRastreo) para reanudar una descarga interrumpida
+        self.frontera = frontera
+        
+        # Si es False, los documentos ya presentes en disco no se vuelven a solicitar;
+        # si es True, se revalidan con una solicitud condicional (If-Modified-Since)
+        self.revalidar = revalidar
         
         # URLs base para diferentes tipos de documentos
         self.urls_base = {
@@ -40,84 +75,191 @@ class SIIScraper:
             'schemas': 'https://www.sii.cl/factura_electronica/formato_xml.htm'
         }
         
-        # URLs específicas por año que funcionan
-        self.urls_especificas = {
-            'resoluciones_2024': 'https://www.sii.cl/normativa_legislacion/resoluciones/2024/res_ind2024.htm',
-            'resoluciones_2023': 'https://www.sii.cl/normativa_legislacion/resoluciones/2023/res_ind2023.htm',
-            'circulares_2024': 'https://www.sii.cl/normativa_legislacion/circulares/2024/indcir2024.htm',
-            'circulares_2023': 'https://www.sii.cl/normativa_legislacion/circulares/2023/indcir2023.htm',
-            'circulares_2025': 'https://www.sii.cl/normativa_legislacion/circulares/2025/indcir2025.htm'
+        # Páginas índice por año, relativas a urls_base
+        self.patrones_indice = {
+            'resoluciones': '{año}/res_ind{año}.htm',
+            'circulares': '{año}/indcir{año}.htm'
         }
         
-        # Años a descargar (últimos 5 años + año actual)
-        año_actual = datetime.now().year
-        self.años_descarga = list(range(año_actual - 4, año_actual + 1))
+        # Enlaces de cada índice (tipo, año) ya obtenido en esta ejecución; None si no existe
+        self.indices = {}
+        
+        # Años a descargar (por defecto, últimos 5 años + año actual)
+        if años is None:
+            año_actual = datetime.now().year
+            años = range(año_actual - 4, año_actual + 1)
+        self.años_descarga = list(años)
+    
+    def url_indice(self, tipo, año):
+        """Construye la URL de la página índice de un tipo de documento para un año"""
+        return self.urls_base[tipo] + self.patrones_indice[tipo].format(año=año)
+    
+    def obtener_indice(self, tipo, año):
+        """Obtiene y parsea una sola vez por ejecución el índice de un año; None si no existe"""
+        clave = (tipo, año)
+        if clave in self.indices:
+            return self.indices[clave]
+        
+        url_año = self.url_indice(tipo, año)
+        
+        # Al reanudar, los índices ya descubiertos salen del checkpoint sin volver a consultarlos
+        if self.frontera is not None:
+            estado = self.frontera.estado_indice(tipo, año)
+            if estado == INDICE_INEXISTENTE:
+                self.indices[clave] = None
+                return None
+            if estado == INDICE_DESCUBIERTO:
+                enlaces = self.frontera.enlaces(tipo, año)
+                logging.info(f"Índice de {tipo} {año} reanudado desde checkpoint: {len(enlaces)} enlaces")
+                self.indices[clave] = enlaces
+                return enlaces
+        
+        try:
+            logging.info(f"Intentando acceder a: {url_año}")
+            response = self.obtener(url_año)
+            if response.status_code == 404:
+                logging.warning(f"No existe índice para {tipo} {año}")
+                enlaces = None
+            else:
+                response.raise_for_status()
+                with self.metricas.cronometro('parseo'):
+                    enlaces = self.extraer_enlaces(response.content, url_año, f"{tipo}_{año}")
+        except Exception as e:
+            # No se memoriza: un error transitorio puede resolverse en un reintento
+            logging.error(f"Error obteniendo índice de {tipo} {año}: {str(e)}")
+            return None
+        
+        if self.frontera is not None:
+            if enlaces is None:
+                self.frontera.registrar_indice_inexistente(tipo, año, url_año)
+            else:
+                self.frontera.registrar_indice(tipo, año, url_año, enlaces)
+        
+        self.indices[clave] = enlaces
+        return enlaces
+    
+    def descubrir_indices(self, años=None, tipos=('resoluciones', 'circulares')):
+        """Obtiene en paralelo los índices de un rango arbitrario de años"""
+        años = self.años_descarga if años is None else list(años)
+        claves = [(tipo, año) for tipo in tipos for año in años]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            listas = executor.map(lambda clave: self.obtener_indice(*clave), claves)
+            return {clave: enlaces for clave, enlaces in zip(claves, listas) if enlaces is not None}
     
     def obtener_enlaces_documentos(self, url_indice, tipo_documento):
         """Extrae todos los enlaces a documentos PDF de una página índice"""
         try:
             logging.info(f"Obteniendo enlaces de {tipo_documento} desde: {url_indice}")
             
-            response = self.session.get(url_indice)
+            response = self.obtener(url_indice)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            enlaces = []
-            
-            # Buscar enlaces a PDFs y documentos
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                texto = link.get_text(strip=True)
-                
-                # Filtrar enlaces relevantes (PDFs, documentos, páginas de resoluciones/circulares)
-                if any(ext in href.lower() for ext in ['.pdf', '.doc', '.docx']) or \
-                   any(keyword in href.lower() for keyword in ['resolucion', 'circular', 'oficio', 'res_', 'cir_']):
-                    
-                    # Construir URL completa
-                    if href.startswith('/'):
-                        url_completa = urljoin(self.base_url, href)
-                    elif href.startswith('http'):
-                        url_completa = href
-                    else:
-                        url_completa = urljoin(url_indice, href)
-                    
-                    # Evitar duplicados y enlaces vacíos
-                    if url_completa not in [e['url'] for e in enlaces] and texto:
-                        enlaces.append({
-                            'url': url_completa,
-                            'texto': texto,
-                            'href_original': href
-                        })
-            
-            logging.info(f"Encontrados {len(enlaces)} enlaces de {tipo_documento}")
-            
-            # Log de algunos ejemplos para debug
-            for i, enlace in enumerate(enlaces[:3]):
-                logging.debug(f"Enlace {i+1}: {enlace['texto'][:50]}... -> {enlace['url']}")
-            
-            return enlaces
+            with self.metricas.cronometro('parseo'):
+                return self.extraer_enlaces(response.content, url_indice, tipo_documento)
             
         except Exception as e:
             logging.error(f"Error obteniendo enlaces de {url_indice}: {str(e)}")
             return []
     
+    def extraer_enlaces(self, html, url_indice, tipo_documento):
+        """Parsea el HTML de una página índice y retorna sus enlaces a documentos"""
+        if not html or not html.strip():
+            return []
+        try:
+            documento = lxml.html.document_fromstring(html)
+        except etree.ParserError as e:
+            logging.warning(f"Índice {tipo_documento} sin HTML válido: {str(e)}")
+            return []
+        
+        # Diccionario como conjunto ordenado: dedup en O(1) conservando el orden del índice
+        enlaces = {}
+        for link in documento.iter('a'):
+            href = link.get('href')
+            # Filtrar enlaces relevantes (PDFs, documentos, páginas de resoluciones/circulares)
+            if not href or not PATRON_ENLACE_DOCUMENTO.search(href):
+                continue
+            
+            # Igual que get_text(strip=True): cada trozo de texto recortado y concatenado
+            texto = ''.join(trozo.strip() for trozo in link.itertext())
+            url_completa = normalizar_url(urljoin(url_indice, href.strip()))
+            
+            # Evitar duplicados y enlaces vacíos
+            if texto and url_completa not in enlaces:
+                enlaces[url_completa] = {
+                    'url': url_completa,
+                    'texto': texto,
+                    'href_original': href
+                }
+        enlaces = list(enlaces.values())
+        
+        logging.info(f"Encontrados {len(enlaces)} enlaces de {tipo_documento}")
+        
+        # Log de algunos ejemplos para debug
+        for i, enlace in enumerate(enlaces[:3]):
+            logging.debug(f"Enlace {i+1}: {enlace['texto'][:50]}... -> {enlace['url']}")
+        
+        return enlaces
+    
     def descargar_documento(self, enlace, carpeta_destino, tipo_documento):
         """Descarga un documento individual"""
         try:
-            response = self.session.get(enlace['url'])
-            response.raise_for_status()
-            
-            # Generar nombre de archivo
+            # Generar nombre de archivo antes de la solicitud
             nombre_archivo = self.generar_nombre_archivo(enlace, tipo_documento)
-            ruta_archivo = os.path.join(carpeta_destino, nombre_archivo)
+            # Si otra URL ya usa ese nombre en la vista, se agrega un sufijo en vez de pisarla
+            ruta_archivo = self.almacen.ruta_libre(os.path.join(carpeta_destino, nombre_archivo), enlace['url'])
+            nombre_archivo = os.path.basename(ruta_archivo)
+            
+            # Evitar duplicados sin descargar el cuerpo: el manifiesto indica qué está completo
+            headers = {}
+            entrada = self.manifiesto.documento_vigente(enlace['url'])
+            if entrada is None and self.manifiesto.obtener(enlace['url']) is not None:
+                # Registrado pero truncado o ausente: descarga completa, sin condicionales que den un 304
+                headers = {'If-None-Match': None, 'If-Modified-Since': None}
+            elif entrada is None and os.path.exists(ruta_archivo):
+                # Archivo descargado antes de existir el manifiesto
+                entrada = self.registrar_existente(enlace['url'], ruta_archivo)
+                headers['If-Modified-Since'] = formatdate(os.path.getmtime(ruta_archivo), usegmt=True)
+            
+            if entrada is not None:
+                if not self.revalidar:
+                    logging.info(f"Ya existe: {nombre_archivo}")
+                    return True
+                # La sesión agrega If-None-Match / If-Modified-Since desde el manifiesto
+            
+            with self.session.get(enlace['url'], headers=headers, stream=True) as response:
+                if response.status_code == 304:
+                    logging.info(f"Sin cambios: {nombre_archivo}")
+                    return True
+                response.raise_for_status()
+                
+                # Escritura por bloques al almacén por contenido, con hash al vuelo y renombrado atómico
+                tiempos = {}
+                sha256, tamaño = self.almacen.guardar_respuesta(response, tiempos=tiempos)
+                last_modified = response.headers.get('Last-Modified')
+                etag = response.headers.get('ETag')
             
-            # Evitar duplicados
-            if os.path.exists(ruta_archivo):
-                logging.info(f"Ya existe: {nombre_archivo}")
-                return True
+            # La vista por tipo y año es un hardlink al blob
+            self.almacen.registrar(enlace['url'], sha256, ruta_archivo, numero=numero_documento(enlace))
             
-            with open(ruta_archivo, 'wb') as f:
-                f.write(response.content)
+            # Usar la fecha del servidor como mtime para las revalidaciones siguientes
+            if last_modified:
+                try:
+                    mtime = parsedate_to_datetime(last_modified).timestamp()
+                    os.utime(ruta_archivo, (mtime, mtime))
+                except (TypeError, ValueError):
+                    pass
+            
+            self.metricas.observar_etapas(tiempos)
+            self.metricas.incrementar('bytes_descargados', tamaño)
+            
+            self.manifiesto.registrar(
+                enlace['url'],
+                etag=etag,
+                last_modified=last_modified,
+                sha256=sha256,
+                bytes=tamaño,
+                ruta_local=ruta_archivo
+            )
             
             logging.info(f"✓ Descargado: {nombre_archivo}")
             return True
@@ -126,14 +268,28 @@ class SIIScraper:
             logging.error(f"Error descargando {enlace['url']}: {str(e)}")
             return False
     
+    def registrar_existente(self, url, ruta_archivo):
+        """Incorpora al manifiesto y al almacén un archivo que ya estaba en disco"""
+        sha256 = self.almacen.importar(ruta_archivo)
+        self.almacen.registrar(url, sha256, ruta_archivo)
+        self.manifiesto.registrar(
+            url,
+            sha256=sha256,
+            bytes=os.path.getsize(ruta_archivo),
+            ruta_local=ruta_archivo,
+            descargado_en=datetime.fromtimestamp(os.path.getmtime(ruta_archivo)).isoformat()
+        )
+        return self.manifiesto.obtener(url)
+    
     def generar_nombre_archivo(self, enlace, tipo_documento):
         """Genera un nombre de archivo limpio y descriptivo"""
         # Extraer nombre del archivo de la URL
         parsed_url = urlparse(enlace['url'])
         nombre_original = os.path.basename(parsed_url.path)
         
-        if not nombre_original or not nombre_original.endswith('.pdf'):
-            # Si no hay nombre o no es PDF, generar uno basado en el texto del enlace
+        extension = os.path.splitext(nombre_original)[1].lower()
+        if extension not in EXTENSIONES_DOCUMENTO:
+            # Sin nombre o sin extensión conocida: uno basado en el texto del enlace, como PDF
             texto_limpio = re.sub(r'[^\w\s-]', '', enlace['texto'])
             texto_limpio = re.sub(r'\s+', '_', texto_limpio.strip())
             nombre_original = f"{tipo_documento}_{texto_limpio[:50]}.pdf"
@@ -143,113 +299,110 @@ class SIIScraper:
         
         return nombre_limpio
     
-    def descargar_resoluciones_por_año(self, año):
-        """Descarga todas las resoluciones de un año específico"""
-        # Usar URL específica si está disponible
-        url_key = f"resoluciones_{año}"
-        if url_key in self.urls_especificas:
-            url_año = self.urls_especificas[url_key]
-        else:
-            url_año = f"{self.urls_base['resoluciones']}{año}/res_ind{año}.htm"
+    def descargar_enlaces(self, enlaces, carpeta_destino, tipo_documento, clave_frontera=None):
+        """Descarga una lista de enlaces con un pool de workers y retorna cuántos fueron exitosos"""
+        if not enlaces:
+            return 0
+        
+        def descargar(enlace):
+            inicio = time.perf_counter()
+            exito = self.descargar_documento(enlace, carpeta_destino, tipo_documento)
+            self.registrar_documento(exito, time.perf_counter() - inicio)
+            if self.frontera is not None and clave_frontera is not None:
+                self.frontera.marcar(*clave_frontera, enlace['url'], exito)
+            return exito
         
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return sum(1 for exito in executor.map(descargar, enlaces) if exito)
+    
+    def descargar_por_año(self, tipo, año, tipo_documento):
+        """Descarga todos los documentos de un índice anual usando el índice ya obtenido"""
         try:
-            logging.info(f"Intentando acceder a: {url_año}")
-            response = self.session.get(url_año)
-            if response.status_code == 404:
-                logging.warning(f"No existe índice para resoluciones {año}")
+            enlaces = self.obtener_indice(tipo, año)
+            if enlaces is None:
                 return []
             
-            response.raise_for_status()
-            enlaces = self.obtener_enlaces_documentos(url_año, f"resoluciones_{año}")
-            
-            carpeta_destino = f"resoluciones/{año}"
+            carpeta_destino = f"{tipo}/{año}"
             os.makedirs(carpeta_destino, exist_ok=True)
             
-            exitosos = 0
-            for enlace in enlaces:
-                if self.descargar_documento(enlace, carpeta_destino, "resolucion"):
-                    exitosos += 1
-                time.sleep(1)  # Pausa entre descargas
+            # Al reanudar no se vuelve a tocar lo ya completado
+            pendientes = enlaces
+            if self.frontera is not None:
+                completados = self.frontera.completados(tipo, año)
+                pendientes = [e for e in enlaces if e['url'] not in completados]
+                if completados:
+                    logging.info(f"{tipo.capitalize()} {año}: {len(enlaces) - len(pendientes)} ya completados")
+            
+            exitosos = len(enlaces) - len(pendientes)
+            exitosos += self.descargar_enlaces(pendientes, carpeta_destino, tipo_documento,
+                                               clave_frontera=(tipo, año))
             
-            logging.info(f"Resoluciones {año}: {exitosos}/{len(enlaces)} descargadas")
+            logging.info(f"{tipo.capitalize()} {año}: {exitosos}/{len(enlaces)} descargadas")
             return enlaces
             
         except Exception as e:
-            logging.error(f"Error descargando resoluciones {año}: {str(e)}")
+            logging.error(f"Error descargando {tipo} {año}: {str(e)}")
             return []
     
+    def descargar_resoluciones_por_año(self, año):
+        """Descarga todas las resoluciones de un año específico"""
+        return self.descargar_por_año('resoluciones', año, "resolucion")
+    
     def descargar_circulares_por_año(self, año):
         """Descarga todas las circulares de un año específico"""
-        # Usar URL específica si está disponible
-        url_key = f"circulares_{año}"
-        if url_key in self.urls_especificas:
-            url_año = self.urls_especificas[url_key]
-        else:
-            url_año = f"{self.urls_base['circulares']}{año}/indcir{año}.htm"
-        
-        try:
-            logging.info(f"Intentando acceder a: {url_año}")
-            response = self.session.get(url_año)
-            if response.status_code == 404:
-                logging.warning(f"No existe índice para circulares {año}")
-                return []
-            
-            response.raise_for_status()
-            enlaces = self.obtener_enlaces_documentos(url_año, f"circulares_{año}")
-            
-            carpeta_destino = f"circulares/{año}"
-            os.makedirs(carpeta_destino, exist_ok=True)
-            
-            exitosos = 0
-            for enlace in enlaces:
-                if self.descargar_documento(enlace, carpeta_destino, "circular"):
-                    exitosos += 1
-                time.sleep(1)
-            
-            logging.info(f"Circulares {año}: {exitosos}/{len(enlaces)} descargadas")
-            return enlaces
-            
-        except Exception as e:
-            logging.error(f"Error descargando circulares {año}: {str(e)}")
-            return []
+        return self.descargar_por_año('circulares', año, "circular")
     
     def descargar_schemas_xml(self):
         """Descarga los schemas XML de documentos electrónicos"""
+        # bs4 solo se usa aquí: importarlo al cargar el módulo encarece cada arranque
+        from bs4 import BeautifulSoup
+
         try:
             logging.info("Descargando schemas XML de documentos electrónicos")
             
-            response = self.session.get(self.urls_base['schemas'])
+            response = self.obtener(self.urls_base['schemas'])
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
             # Buscar enlaces a archivos ZIP con schemas
             enlaces_schemas = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if href.lower().endswith('.zip') or 'schema' in href.lower():
-                    url_completa = urljoin(self.base_url, href)
-                    enlaces_schemas.append({
-                        'url': url_completa,
-                        'texto': link.get_text(strip=True)
-                    })
+            with self.metricas.cronometro('parseo'):
+                soup = BeautifulSoup(response.content, 'html.parser')
+                for link in soup.find_all('a', href=True):
+                    href = link['href']
+                    if href.lower().endswith('.zip') or 'schema' in href.lower():
+                        url_completa = urljoin(self.base_url, href)
+                        enlaces_schemas.append({
+                            'url': url_completa,
+                            'texto': link.get_text(strip=True)
+                        })
             
             carpeta_destino = "schemas"
             os.makedirs(carpeta_destino, exist_ok=True)
             
-            exitosos = 0
-            for enlace in enlaces_schemas:
-                if self.descargar_documento(enlace, carpeta_destino, "schema"):
-                    exitosos += 1
-                time.sleep(1)
+            exitosos = self.descargar_enlaces(enlaces_schemas, carpeta_destino, "schema")
             
             logging.info(f"Schemas: {exitosos}/{len(enlaces_schemas)} descargados")
+            self.preparar_validadores()
             return enlaces_schemas
             
         except Exception as e:
             logging.error(f"Error descargando schemas: {str(e)}")
             return []
     
+    def preparar_validadores(self):
+        """Desempaqueta los ZIP de schemas y compila los validadores de DTE (xmlschema es opcional)"""
+        try:
+            from esquemas_dte import EsquemasDTE
+        except ImportError:
+            logging.warning("xmlschema no está instalado: se omite la compilación de los schemas")
+            return None
+        try:
+            with self.metricas.cronometro('esquemas'):
+                return EsquemasDTE().preparar()
+        except Exception as e:
+            logging.error(f"Error preparando los validadores de schemas: {str(e)}")
+            return None
+    
     def ejecutar_descarga_completa(self):
         """Ejecuta la descarga completa de toda la normativa del SII"""
         logging.info("Iniciando descarga completa de normativa SII")
@@ -266,6 +419,12 @@ class SIIScraper:
             }
         }
         
+        # Primero los archivos dañados que encontró la verificación (verificacion.py)
+        self.reparar_pendientes()
+        
+        # Obtener todos los índices una sola vez antes de descargar
+        self.descubrir_indices()
+        
         # Descargar resoluciones por año
         for año in self.años_descarga:
             logging.info(f"Procesando resoluciones {año}")
@@ -286,27 +445,63 @@ class SIIScraper:
         resultados['schemas'] = len(schemas)
         resultados['resumen']['total_documentos'] += len(schemas)
         
+        # Resultado de cada documento procesado en esta ejecución (los ya completados al reanudar no cuentan)
+        resultados['resumen']['documentos_exitosos'] = self.metricas.valor('documentos', resultado='exitoso')
+        resultados['resumen']['documentos_fallidos'] = self.metricas.valor('documentos', resultado='fallido')
+        
         # Guardar reporte
         resultados['fin'] = datetime.now().isoformat()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        reporte_file = f"data/reporte_sii_{timestamp}.json"
-        
-        with open(reporte_file, 'w', encoding='utf-8') as f:
-            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        reporte_file = self.guardar_reporte(resultados)
         
         logging.info(f"Descarga SII completada. Reporte: {reporte_file}")
         return resultados
+    
+    def ejecutar(self):
+        return self.ejecutar_descarga_completa()
 
-def main():
-    """Función principal"""
+def main(argv=None, prog=None):
+    """Función principal (`argv` y `prog` los pasa cli.py)"""
+    parser = argparse.ArgumentParser(prog=prog, description="Scraper de Normativa SII")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Descargas concurrentes (por defecto: 4)")
+    parser.add_argument('--solicitudes-por-segundo', type=float,
+                        help="Solicitudes por segundo permitidas por host "
+                             "(por defecto: 1 / delay_entre_descargas de config.json)")
+    parser.add_argument('--desde', type=int, help="Primer año a descargar (por defecto: año actual - 4)")
+    parser.add_argument('--hasta', type=int, help="Último año a descargar (por defecto: año actual)")
+    parser.add_argument('--revalidar', action='store_true',
+                        help="Revalidar con el servidor los documentos ya descargados")
+    parser.add_argument('--reanudar', '--resume', dest='reanudar', action='store_true',
+                        help="Continuar la última descarga interrumpida desde su checkpoint")
+    args = parser.parse_args(argv)
+    
+    años = None
+    if args.desde or args.hasta:
+        año_actual = datetime.now().year
+        años = range(args.desde or año_actual - 4, (args.hasta or año_actual) + 1)
+    
     print("🏛️  Scraper de Normativa SII")
     print("=" * 40)
     
     # Crear directorios
     for carpeta in ['resoluciones', 'circulares', 'oficios', 'schemas', 'data', 'logs']:
         os.makedirs(carpeta, exist_ok=True)
+    configurar_logging('logs/sii_scraper.log')
+    
+    # Checkpoint de la descarga: se reinicia salvo que se pida reanudar
+    frontera = FronteraRastreo()
+    if args.reanudar:
+        for fila in frontera.resumen():
+            logging.info(f"Checkpoint {fila['tipo']} {fila['año']}: {fila['cantidad']} {fila['estado']}")
+    else:
+        try:
+            frontera.reiniciar()
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
     
-    scraper = SIIScraper()
+    scraper = SIIScraper(max_workers=args.workers, solicitudes_por_segundo=args.solicitudes_por_segundo,
+                         revalidar=args.revalidar, años=años, frontera=frontera)
     resultados = scraper.ejecutar_descarga_completa()
     
     print(f"\n📊 Resumen de descarga:")
@@ -314,6 +509,7 @@ def main():
     print(f"📁 Resoluciones por año: {resultados['resoluciones']}")
     print(f"📁 Circulares por año: {resultados['circulares']}")
     print(f"📁 Schemas XML: {resultados['schemas']}")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
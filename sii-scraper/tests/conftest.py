@@ -0,0 +1,17 @@
+"""Configuración común de los tests: los módulos del scraper son scripts sueltos en la carpeta superior"""
+
+import os
+import sys
+
+DIRECTORIO_SCRAPER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORIO_SCRAPER)
+sys.path.insert(0, os.path.join(DIRECTORIO_SCRAPER, 'benchmarks'))
+
+import pytest
+
+
+@pytest.fixture
+def en_tmp(tmp_path, monkeypatch):
+    """Los módulos usan rutas relativas (data/, resoluciones/, schemas/): cada test corre en su carpeta"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from almacen import AlmacenContenido
+from archivo_frio import MIN_MUESTRAS, ArchivoFrio, LectorPaquete, escribir_paquete
+from manifiesto import Manifiesto
+
+
+def documento(numero):
+    return (b'%PDF-1.4\n% Resolucion Exenta SII N ' + str(numero).encode() + b'\n'
+            + b'Santiago, materia: impuesto al valor agregado. ' * (numero % 7 + 3) + b'\n%%EOF\n')
+
+
+def empaquetar(tmp_path, cantidad):
+    contenidos = {hashlib.sha256(c).hexdigest(): c for c in map(documento, range(cantidad))}
+    ruta = str(tmp_path / 'prueba.pack')
+    originales, bytes_paquete = escribir_paquete(sorted(contenidos), contenidos.__getitem__, ruta, nivel=3)
+    return contenidos, ruta, originales, bytes_paquete
+
+
+@pytest.mark.parametrize('cantidad', [MIN_MUESTRAS - 3, MIN_MUESTRAS * 4])
+def test_paquete_ida_y_vuelta(tmp_path, cantidad):
+    # Con pocos documentos no se entrena diccionario; con varios, sí
+    contenidos, ruta, originales, bytes_paquete = empaquetar(tmp_path, cantidad)
+
+    assert originales == sum(len(c) for c in contenidos.values())
+    assert bytes_paquete == os.path.getsize(ruta)
+    with LectorPaquete(ruta) as lector:
+        assert len(lector) == cantidad
+        assert sorted(lector.hashes()) == sorted(contenidos)
+        for sha256, contenido in contenidos.items():
+            assert sha256 in lector
+            assert lector.leer(sha256) == contenido
+        with pytest.raises(KeyError):
+            lector.leer('0' * 64)
+
+
+def publicar(almacen, numero, año=2021):
+    """Descarga simulada: vista en resoluciones/<año>/, blob en el almacén y entrada en el catálogo"""
+    vista = os.path.join('resoluciones', str(año), f'res_{numero}.pdf')
+    os.makedirs(os.path.dirname(vista), exist_ok=True)
+    with open(vista, 'wb') as f:
+        f.write(documento(numero))
+    sha256 = almacen.importar(vista)
+    almacen.registrar(f'https://www.sii.cl/normativa/res{año}/res{numero}.pdf', sha256, vista, numero=str(numero))
+    return vista, sha256
+
+
+def extraer(manifiesto, vista, sha256, caracteres=200):
+    ruta_texto = os.path.join('data', 'textos', f'{sha256}.json')
+    os.makedirs(os.path.dirname(ruta_texto), exist_ok=True)
+    paginas = [{'numero': 1, 'texto': 'x' * caracteres, 'caracteres': caracteres}]
+    with open(ruta_texto, 'w', encoding='utf-8') as f:
+        json.dump({'sha256': sha256, 'ruta_pdf': vista, 'extractor': 'pdfplumber', 'paginas': paginas}, f)
+    manifiesto.registrar_extraccion(sha256, vista, ruta_texto, 1, caracteres, 'pdfplumber')
+
+
+@pytest.fixture
+def archivo(en_tmp):
+    manifiesto = Manifiesto()
+    archivo = ArchivoFrio(manifiesto, AlmacenContenido(manifiesto))
+    yield archivo
+    archivo.cerrar()
+
+
+def test_empaquetar_liberar_y_leer(archivo):
+    publicados = [publicar(archivo.almacen, numero) for numero in range(12)]
+    for vista, sha256 in publicados:
+        extraer(archivo.manifiesto, vista, sha256)
+
+    resultado = archivo.empaquetar('resoluciones', 2021)
+    assert resultado['reconstruido'] and resultado['documentos'] == 12
+    assert archivo.empaquetar('resoluciones', 2021)['reconstruido'] is False
+    assert archivo.liberar('resoluciones', 2021) > 0
+
+    for numero, (vista, sha256) in enumerate(publicados):
+        assert not os.path.exists(vista)
+        assert not archivo.almacen.existe(sha256)
+        assert archivo.leer(sha256) == documento(numero)
+
+    assert archivo.restaurar('resoluciones', 2021) == 12
+    assert all(os.path.exists(vista) for vista, _ in publicados)
+
+
+def test_liberar_retiene_los_pendientes_de_extraccion_y_ocr(archivo):
+    extraido, sin_texto, escaneado = (publicar(archivo.almacen, numero) for numero in range(3))
+    extraer(archivo.manifiesto, *extraido)
+    extraer(archivo.manifiesto, *escaneado, caracteres=0)
+
+    archivo.empaquetar('resoluciones', 2021)
+    archivo.liberar('resoluciones', 2021)
+
+    assert not os.path.exists(extraido[0])
+    assert os.path.exists(sin_texto[0]) and archivo.almacen.existe(sin_texto[1])
+    assert os.path.exists(escaneado[0]) and archivo.almacen.existe(escaneado[1])
+
+
+def test_ruta_legible_extrae_un_temporal_y_lo_borra(archivo):
+    vista, sha256 = publicar(archivo.almacen, 5)
+    extraer(archivo.manifiesto, vista, sha256)
+
+    with archivo.ruta_legible(sha256, vista) as ruta:
+        assert ruta == vista
+    archivo.empaquetar('resoluciones', 2021)
+    archivo.liberar('resoluciones', 2021)
+
+    with archivo.ruta_legible(sha256, vista) as ruta:
+        assert ruta != vista and ruta.endswith('.pdf')
+        with open(ruta, 'rb') as f:
+            assert f.read() == documento(5)
+    assert not os.path.exists(ruta)
+
+    with pytest.raises(KeyError):
+        with archivo.ruta_legible('f' * 64, 'resoluciones/2021/no_existe.pdf'):
+            pass
+
+
+def test_extraccion_forzada_incluye_los_archivados(archivo):
+    from extraccion_texto import ExtractorTexto
+
+    vista, sha256 = publicar(archivo.almacen, 3)
+    extraer(archivo.manifiesto, vista, sha256)
+    archivo.empaquetar('resoluciones', 2021)
+    archivo.liberar('resoluciones', 2021)
+
+    extractor = ExtractorTexto(archivo.manifiesto)
+    assert extractor.archivados() == []
+    assert extractor.archivados(forzar=True) == [(vista, sha256)]
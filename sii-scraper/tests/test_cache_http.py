@@ -0,0 +1,108 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cache_http import SesionCache
+from manifiesto import Manifiesto
+
+ETAG = '"v1"'
+LAST_MODIFIED = 'Wed, 01 Jan 2025 00:00:00 GMT'
+
+
+@pytest.fixture
+def servidor():
+    """Índice HTML y PDF con ETag y Last-Modified; responde 304 a las solicitudes condicionales que coinciden"""
+    recibidas = []
+    cuerpos = {'/res_ind2024.htm': (b'<html><body>indice 2024</body></html>', 'text/html; charset=iso-8859-1'),
+               '/reso1.pdf': (b'%PDF-1.4 resolucion', 'application/pdf')}
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            recibidas.append(dict(self.headers))
+            cuerpo, tipo = cuerpos[self.path]
+            if self.headers.get('If-None-Match') == ETAG or self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+                self.send_response(304)
+                self.send_header('ETag', ETAG)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.send_header('ETag', ETAG)
+            self.send_header('Last-Modified', LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    http = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{http.server_address[1]}", recibidas
+    http.shutdown()
+    http.server_close()
+
+
+@pytest.fixture
+def sesion(en_tmp):
+    return SesionCache(Manifiesto(), timeout=5)
+
+
+def test_indice_se_guarda_y_luego_se_responde_desde_cache(servidor, sesion):
+    url_base, recibidas = servidor
+    url = f"{url_base}/res_ind2024.htm"
+
+    primera = sesion.get(url)
+    assert primera.status_code == 200 and not primera.from_cache
+    assert 'If-None-Match' not in recibidas[0]
+    entrada = sesion.manifiesto.obtener(url)
+    assert entrada['etag'] == ETAG and os.path.exists(entrada['ruta_cache'])
+
+    segunda = sesion.get(url)
+    assert recibidas[1]['If-None-Match'] == ETAG
+    assert recibidas[1]['If-Modified-Since'] == LAST_MODIFIED
+    assert segunda.status_code == 200 and segunda.from_cache
+    assert segunda.content == primera.content
+    assert sesion.manifiesto.obtener(url)['verificado_en']
+
+
+def test_sin_copia_local_no_se_envian_condicionales(servidor, sesion):
+    url_base, recibidas = servidor
+    url = f"{url_base}/res_ind2024.htm"
+    sesion.get(url)
+    os.remove(sesion.manifiesto.obtener(url)['ruta_cache'])
+
+    # Un 304 no serviría de nada: hay que descargar completo
+    response = sesion.get(url)
+    assert 'If-None-Match' not in recibidas[1] and 'If-Modified-Since' not in recibidas[1]
+    assert response.status_code == 200 and not response.from_cache
+
+
+def test_encabezado_none_suprime_la_revalidacion(servidor, sesion):
+    url_base, recibidas = servidor
+    url = f"{url_base}/res_ind2024.htm"
+    sesion.get(url)
+
+    response = sesion.get(url, headers={'If-None-Match': None, 'If-Modified-Since': None})
+    assert 'If-None-Match' not in recibidas[1] and 'If-Modified-Since' not in recibidas[1]
+    assert response.status_code == 200 and not response.from_cache
+
+
+def test_documento_en_disco_recibe_304_en_streaming(servidor, sesion):
+    url_base, recibidas = servidor
+    url = f"{url_base}/reso1.pdf"
+    ruta = os.path.join('resoluciones', '2024', 'reso1.pdf')
+    os.makedirs(os.path.dirname(ruta))
+    with sesion.get(url, stream=True) as response:
+        assert response.status_code == 200
+        with open(ruta, 'wb') as f:
+            f.write(response.content)
+    # Los documentos no van a la caché de páginas: el scraper los registra con su ruta local
+    assert sesion.manifiesto.obtener(url) is None
+    sesion.manifiesto.registrar(url, etag=ETAG, last_modified=LAST_MODIFIED, ruta_local=ruta)
+
+    with sesion.get(url, stream=True) as response:
+        assert recibidas[1]['If-None-Match'] == ETAG
+        assert response.status_code == 304 and not response.from_cache
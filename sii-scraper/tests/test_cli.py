@@ -0,0 +1,46 @@
+import hashlib
+
+import pytest
+
+import cli
+from frontera import FronteraRastreo
+from manifiesto import Manifiesto
+
+
+def huella(ruta):
+    return hashlib.sha256(ruta.read_bytes()).hexdigest()
+
+
+def test_estado_es_de_solo_lectura_y_encuentra_la_frontera_junto_al_manifiesto(tmp_path, capsys):
+    carpeta = tmp_path / 'compartido'
+    manifiesto = Manifiesto(str(carpeta / 'manifiesto.db'))
+    manifiesto.catalogar('https://www.sii.cl/normativa/res2021/res1.pdf', 'a' * 64, tipo='resoluciones', año=2021)
+    manifiesto.cerrar()
+    frontera = FronteraRastreo(str(carpeta / 'frontera.db'))
+    frontera.registrar_indice('resoluciones', 2022, 'https://www.sii.cl/res_ind2022.htm',
+                              [{'url': 'https://www.sii.cl/res1.pdf', 'texto': 'Resolución 1'}])
+    frontera.cerrar()
+    antes = {ruta.name: huella(ruta) for ruta in carpeta.glob('*.db')}
+
+    assert cli.main(['--manifiesto', str(carpeta / 'manifiesto.db'), 'estado', '--json']) == 0
+    assert '"pendientes_frontera": 1' in capsys.readouterr().out
+    assert {ruta.name: huella(ruta) for ruta in carpeta.glob('*.db')} == antes
+
+
+def test_rastrear_no_ignora_argumentos(en_tmp):
+    with pytest.raises(SystemExit):
+        cli.main(['rastrear', 'todo', '--desconocido'])
+    with pytest.raises(SystemExit):
+        cli.main(['--manifiesto', 'otro.db', 'rastrear', 'sii'])
+
+
+def test_rastrear_retorna_el_codigo_de_la_fuente(en_tmp, capsys):
+    # Con arriendos vigentes en la frontera, sii_scraper se niega a reiniciarla y termina con 1
+    frontera = FronteraRastreo()
+    frontera.registrar_indice('resoluciones', 2022, 'https://www.sii.cl/res_ind2022.htm',
+                              [{'url': 'https://www.sii.cl/res1.pdf', 'texto': 'Resolución 1'}])
+    assert frontera.arrendar('otra-maquina', 10, 600, 3)
+    frontera.cerrar()
+
+    assert cli.main(['rastrear', 'sii']) == 1
+    assert '❌' in capsys.readouterr().out
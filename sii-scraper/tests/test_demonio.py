@@ -0,0 +1,70 @@
+import pytest
+import requests
+
+from demonio import DemonioNormativa
+from servidor_simulado import ServidorSimulado
+from sii_scraper import SIIScraper
+from test_verificacion import pdf_minimo
+
+
+@pytest.fixture
+def demonio(en_tmp):
+    corpus = en_tmp / 'corpus'
+    carpeta = corpus / 'resoluciones' / '2024'
+    carpeta.mkdir(parents=True)
+    for numero in (1, 2):
+        (carpeta / f'reso{numero}.pdf').write_bytes(pdf_minimo(f'Resolucion {numero}'.encode()))
+    servidor = ServidorSimulado(str(corpus))
+    url = servidor.iniciar()
+
+    scraper = SIIScraper(solicitudes_por_segundo=0)
+    scraper.base_url = url
+    scraper.dominios = ('127.0.0.1',)
+    scraper.urls_base = {tipo: base.replace('https://www.sii.cl', url) for tipo, base in scraper.urls_base.items()}
+    demonio = DemonioNormativa(scraper, años_historicos=0, indexar=False, años_calientes=None)
+    demonio.plan = lambda: {('resoluciones', 2024): 60}
+    yield demonio
+    servidor.detener()
+
+
+def test_reintentos_sobreviven_a_un_sondeo_fallido(demonio, monkeypatch):
+    url = demonio.scraper.url_indice('resoluciones', 2024).rsplit('/', 1)[0] + '/reso1.pdf'
+    demonio.reintentos[('resoluciones', 2024)] = [{'url': url, 'texto': 'Resolución Ex. SII N° 1'}]
+
+    def caido(*args, **kwargs):
+        raise requests.ConnectionError('sin red')
+
+    with monkeypatch.context() as parche:
+        parche.setattr(demonio.scraper, 'obtener', caido)
+        assert demonio.vuelta() == 0
+    assert [e['url'] for e in demonio.reintentos[('resoluciones', 2024)]] == [url]
+
+    demonio.proximo.clear()
+    assert demonio.vuelta() == 2
+    assert demonio.reintentos == {}
+    assert demonio.manifiesto.catalogo(url) is not None
+
+
+def test_indice_sin_cambios_recupera_los_documentos_no_descargados(demonio):
+    # Un rastreo previo dejó el índice en caché pero no sus documentos (caída antes de procesar)
+    url_indice = demonio.scraper.url_indice('resoluciones', 2024)
+    assert demonio.scraper.obtener(url_indice).status_code == 200
+    assert demonio.reintentos == {}
+
+    enlaces = demonio.sondear('resoluciones', 2024)
+    assert demonio.metricas.valor('sondeos', resultado='sin_cambios') == 1
+    assert len(enlaces) == 2
+
+    # Recién verificado en el manifiesto: se fuerza el sondeo
+    demonio.proximo[('resoluciones', 2024)] = 0
+    assert demonio.vuelta() == 2
+    assert demonio.sondear('resoluciones', 2024) == []
+
+
+def test_cada_vuelta_reinicia_el_circuito(demonio):
+    circuito = demonio.scraper.session.circuito
+    host = demonio.scraper.base_url.split('//')[1]
+    circuito._estado(host).update(aperturas=circuito.max_aperturas)
+
+    assert demonio.vuelta() == 2
+    assert circuito._estado(host)['aperturas'] == 0
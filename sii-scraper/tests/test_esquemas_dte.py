@@ -0,0 +1,79 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip('xmlschema')
+
+from almacen import AlmacenContenido, migrar
+from esquemas_dte import EsquemasDTE, desempaquetar
+from manifiesto import Manifiesto
+from servidor_simulado import HOST_SII, ServidorSimulado
+from sii_scraper import SIIScraper
+
+XSD = b'''<?xml version="1.0" encoding="ISO-8859-1"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="http://www.sii.cl/SiiDte"
+           xmlns="http://www.sii.cl/SiiDte" elementFormDefault="qualified">
+  <xs:element name="EnvioDTE">
+    <xs:complexType><xs:sequence><xs:element name="Folio" type="xs:positiveInteger"/></xs:sequence></xs:complexType>
+  </xs:element>
+</xs:schema>
+'''
+
+
+def crear_zip(ruta):
+    with zipfile.ZipFile(ruta, 'w') as archivo:
+        archivo.writestr('EnvioDTE_v10.xsd', XSD)
+
+
+def test_zip_rastreado_produce_validadores(en_tmp, tmp_path_factory):
+    corpus = tmp_path_factory.mktemp('corpus')
+    os.makedirs(corpus / 'schemas')
+    crear_zip(corpus / 'schemas' / 'schema_dte.zip')
+    servidor = ServidorSimulado(str(corpus))
+    url = servidor.iniciar()
+    manifiesto = Manifiesto()
+    try:
+        scraper = SIIScraper(max_workers=1, solicitudes_por_segundo=0, manifiesto=manifiesto)
+        scraper.base_url = url
+        scraper.urls_base = {tipo: u.replace(HOST_SII, url) for tipo, u in scraper.urls_base.items()}
+        assert len(scraper.descargar_schemas_xml()) == 1
+    finally:
+        servidor.detener()
+        manifiesto.cerrar()
+
+    # El ZIP conserva su extensión en la vista y los validadores cubren su elemento raíz
+    assert sorted(os.listdir('schemas')) == ['schema_dte.zip', 'xsd']
+    with open('data/esquemas/validadores.json', encoding='utf-8') as f:
+        meta = json.load(f)
+    assert meta['elementos'] == ['{http://www.sii.cl/SiiDte}EnvioDTE']
+
+    esquemas = EsquemasDTE(max_workers=1)
+    _, errores = esquemas.validar_contenido(b'<EnvioDTE xmlns="http://www.sii.cl/SiiDte"><Folio>7</Folio></EnvioDTE>')
+    assert errores == []
+    _, errores = esquemas.validar_contenido(b'<EnvioDTE xmlns="http://www.sii.cl/SiiDte"><Folio>x</Folio></EnvioDTE>')
+    assert errores
+
+
+def test_desempaquetar_reconoce_zip_guardado_como_pdf(en_tmp):
+    os.makedirs('schemas')
+    crear_zip('schemas/schema_Formato_DTE.pdf')
+    with open('schemas/resolucion.pdf', 'wb') as f:
+        f.write(b'%PDF-1.4\n%%EOF\n')
+
+    assert desempaquetar() == 1
+    assert os.path.exists('schemas/xsd/schema_Formato_DTE/EnvioDTE_v10.xsd')
+    # Sin cambios en el ZIP no se vuelve a extraer
+    assert desempaquetar() == 0
+
+
+def test_migrar_no_importa_los_xsd_desempaquetados(en_tmp):
+    os.makedirs('schemas')
+    crear_zip('schemas/schema_dte.zip')
+    desempaquetar()
+    almacen = AlmacenContenido(Manifiesto())
+
+    assert migrar(almacen, carpetas=('schemas',)) == 1
+    xsd = 'schemas/xsd/schema_dte/EnvioDTE_v10.xsd'
+    assert os.stat(xsd).st_nlink == 1
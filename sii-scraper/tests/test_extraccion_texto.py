@@ -0,0 +1,75 @@
+import pdfplumber
+import pytest
+from pdfminer.pdfparser import PDFSyntaxError
+
+from extraccion_texto import ExtractorTexto, cargar_texto, extraer_pdf, normalizar_texto
+from manifiesto import Manifiesto
+
+
+def pdf_con_texto(lineas):
+    """PDF de una página con las líneas en Helvetica, legible por pdfplumber y PyPDF2"""
+    contenido = b'BT /F1 12 Tf 72 720 Td 14 TL ' + b' '.join(b'(' + l + b') Tj T*' for l in lineas) + b' ET'
+    objetos = [b'<< /Type /Catalog /Pages 2 0 R >>',
+               b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+               b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+               b'/Resources << /Font << /F1 5 0 R >> >> >>',
+               b'<< /Length ' + str(len(contenido)).encode() + b' >>\nstream\n' + contenido + b'\nendstream',
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    pdf = b'%PDF-1.4\n'
+    posiciones = []
+    for numero, objeto in enumerate(objetos, start=1):
+        posiciones.append(len(pdf))
+        pdf += str(numero).encode() + b' 0 obj\n' + objeto + b'\nendobj\n'
+    xref = len(pdf)
+    pdf += b'xref\n0 ' + str(len(objetos) + 1).encode() + b'\n0000000000 65535 f \n'
+    pdf += b''.join(b'%010d 00000 n \n' % posicion for posicion in posiciones)
+    return (pdf + b'trailer\n<< /Root 1 0 R /Size ' + str(len(objetos) + 1).encode() + b' >>\nstartxref\n'
+            + str(xref).encode() + b'\n%%EOF\n')
+
+
+@pytest.fixture
+def pdf(en_tmp):
+    ruta = en_tmp / 'resoluciones' / '2024' / 'reso1.pdf'
+    ruta.parent.mkdir(parents=True)
+    ruta.write_bytes(pdf_con_texto([b'Impuesto al valor agregado', b'Resolucion exenta']))
+    return 'resoluciones/2024/reso1.pdf'
+
+
+def test_normalizar_une_palabras_cortadas_y_colapsa_espacios():
+    assert normalizar_texto('contribu-\nyentes   del IVA\n\n\n\nArt. 1') == 'contribuyentes del IVA\n\nArt. 1'
+
+
+def test_extrae_con_pdfplumber(pdf):
+    resultado = extraer_pdf(pdf, 'a' * 64, 'data/textos')
+    assert resultado['extractor'] == 'pdfplumber' and resultado['paginas'] == 1
+    documento = cargar_texto(resultado['ruta_texto'])
+    assert documento['paginas'][0]['texto'] == 'Impuesto al valor agregado\nResolucion exenta'
+
+
+def test_pdf_que_pdfplumber_no_lee_se_extrae_con_pypdf2(pdf, monkeypatch):
+    def sintaxis_invalida(ruta, *args, **kwargs):
+        raise PDFSyntaxError('No /Root object! - Is this really a PDF?')
+    monkeypatch.setattr(pdfplumber, 'open', sintaxis_invalida)
+
+    resultado = extraer_pdf(pdf, 'b' * 64, 'data/textos')
+    assert resultado['extractor'] == 'PyPDF2'
+    assert 'Impuesto al valor agregado' in cargar_texto(resultado['ruta_texto'])['paginas'][0]['texto']
+
+
+def test_pdf_ilegible_falla_y_no_se_registra(en_tmp):
+    ruta = en_tmp / 'resoluciones' / '2024' / 'danado.pdf'
+    ruta.parent.mkdir(parents=True)
+    ruta.write_bytes(b'%PDF-1.4\n' + b'\0' * 64)
+    manifiesto = Manifiesto()
+
+    resultados = ExtractorTexto(manifiesto, max_workers=1).extraer(['resoluciones/2024/danado.pdf'])
+    assert resultados['fallidos'] == 1
+    assert manifiesto.extracciones() == []
+
+
+def test_extraccion_incremental(pdf):
+    manifiesto = Manifiesto()
+    extractor = ExtractorTexto(manifiesto, max_workers=1)
+    assert extractor.extraer([pdf])['procesados'] == 1
+    assert extractor.extraer([pdf])['procesados'] == 0
+    assert cargar_texto(manifiesto.extracciones()[0]['ruta_texto'])['ruta_pdf'] == pdf
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from frontera import COMPLETO, FALLIDO, FronteraRastreo
+
+
+@pytest.fixture
+def frontera(tmp_path):
+    frontera = FronteraRastreo(str(tmp_path / 'cola.db'))
+    enlaces = [{'url': f'https://www.sii.cl/normativa/res2021/res{i}.pdf', 'texto': f'Resolución {i}'}
+               for i in range(6)]
+    frontera.registrar_indice('resoluciones', 2021, 'https://www.sii.cl/normativa/res2021/', enlaces)
+    yield frontera
+    frontera.cerrar()
+
+
+def estados(frontera):
+    return {fila['estado']: fila['cantidad'] for fila in frontera.resumen()}
+
+
+def test_arriendos_no_se_solapan(frontera):
+    primero = frontera.arrendar('a', 4, 60)
+    segundo = frontera.arrendar('b', 4, 60)
+
+    assert len(primero) == 4 and len(segundo) == 2
+    assert not {d['url'] for d in primero} & {d['url'] for d in segundo}
+    assert frontera.arrendar('c', 4, 60) == []
+    assert frontera.pendientes() == 6
+
+
+def test_confirmar_libera_el_arriendo(frontera):
+    documento, = frontera.arrendar('a', 1, 60)
+
+    assert frontera.marcar('resoluciones', 2021, documento['url'], True, 'a')
+    assert estados(frontera)[COMPLETO] == 1
+    assert frontera.pendientes() == 5
+    assert documento['url'] not in {d['url'] for d in frontera.arrendar('a', 10, 60)}
+
+
+def test_arriendo_vencido_vuelve_a_la_cola_y_su_dueño_anterior_no_confirma(frontera):
+    documento, = frontera.arrendar('lento', 1, 0.01)
+    time.sleep(0.05)
+    retomado, = frontera.arrendar('rapido', 1, 60)
+    assert retomado['url'] == documento['url']
+
+    # El trabajador lento termina tarde: su fallo no pisa el arriendo vigente del otro
+    assert not frontera.marcar('resoluciones', 2021, documento['url'], False, 'lento')
+    assert FALLIDO not in estados(frontera)
+    assert frontera.marcar('resoluciones', 2021, documento['url'], True, 'rapido')
+    assert estados(frontera)[COMPLETO] == 1
+
+
+def test_fallidos_se_reintentan_hasta_max_intentos(frontera):
+    for _ in range(2):
+        for documento in frontera.arrendar('a', 10, 60, max_intentos=2):
+            frontera.marcar('resoluciones', 2021, documento['url'], False, 'a')
+    assert frontera.arrendar('a', 10, 60, max_intentos=2) == []
+    assert frontera.pendientes(max_intentos=2) == 0
+    assert estados(frontera)[FALLIDO] == 6
+
+
+def test_reiniciar_no_borra_una_cola_con_arriendos_vigentes(frontera):
+    arrendados = frontera.arrendar('a', 2, 60)
+    with pytest.raises(RuntimeError):
+        frontera.reiniciar()
+    assert frontera.pendientes() == 6
+
+    for documento in arrendados + frontera.arrendar('a', 10, 60):
+        frontera.marcar('resoluciones', 2021, documento['url'], True, 'a')
+    frontera.reiniciar()
+    assert frontera.resumen() == []
+
+
+def test_trabajadores_activos_segun_su_latido(frontera):
+    frontera.latido('maquina1-10', 60)
+    frontera.latido('maquina2-20', 60)
+    frontera.latido('caido', 0.01)
+    time.sleep(0.05)
+    assert frontera.trabajadores_activos() == 2
+
+    frontera.retirar('maquina1-10')
+    assert frontera.trabajadores_activos() == 1
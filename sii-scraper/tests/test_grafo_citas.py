@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+from grafo_citas import (CITA, DEJA_SIN_EFECTO, MODIFICA, GrafoCitas, articulos_citados, modificaciones,
+                         parsear_referencia, parte_dispositiva)
+from manifiesto import Manifiesto
+
+
+@pytest.mark.parametrize('referencia, nodo', [
+    ('Art. 21 LIR', 'DL 824 art. 21'),
+    ('artículo 14 del DL 824', 'DL 824 art. 14'),
+    ('DL 825', 'DL 825'),
+])
+def test_parsear_referencia(referencia, nodo):
+    assert parsear_referencia(referencia) == nodo
+
+
+def test_articulos_citados_con_su_cuerpo_legal():
+    texto = ('Conforme al artículo 60 quinquies del Código Tributario y a los artículos 14, 21 y 31 de la Ley sobre '
+             'Impuesto a la Renta, contenida en el artículo 1° del D.L. N° 824')
+    assert articulos_citados(texto) == {('DL 830', '60 quinquies'), ('DL 824', '14'), ('DL 824', '21'),
+                                        ('DL 824', '31')}
+    # Sin cuerpo legal no hay a qué enlazar
+    assert articulos_citados('según el artículo 3° de esta resolución') == set()
+
+
+def test_modificaciones():
+    texto = 'Déjase sin efecto la Resolución Ex. SII N° 12, de 2019. Modifícase la Circular N° 45 del 10.05.2001.'
+    assert modificaciones(texto) == {(DEJA_SIN_EFECTO, 'resoluciones', '12', 2019),
+                                     (MODIFICA, 'circulares', '45', 2001)}
+    # "deja" solo cuenta en "deja sin efecto"
+    assert modificaciones('Se deja constancia de la Resolución N° 3 de 2020') == set()
+
+
+def test_los_vistos_no_son_modificaciones_del_documento():
+    texto = ('VISTOS: la Resolución N° 5 de 2018, que modifica la Resolución N° 4 de 2017. '
+             'SE RESUELVE: 1. Déjase sin efecto la Resolución N° 9 de 2016.')
+    assert modificaciones(parte_dispositiva(texto)) == {(DEJA_SIN_EFECTO, 'resoluciones', '9', 2016)}
+
+
+def publicar(manifiesto, numero, año, texto):
+    """Resolución catalogada con su texto extraído"""
+    sha256 = f'{numero:064d}'
+    ruta_pdf = os.path.join('resoluciones', str(año), f'reso{numero}.pdf')
+    ruta_texto = os.path.join('data', 'textos', f'{sha256}.json')
+    os.makedirs(os.path.dirname(ruta_texto), exist_ok=True)
+    with open(ruta_texto, 'w', encoding='utf-8') as f:
+        json.dump({'sha256': sha256, 'ruta_pdf': ruta_pdf, 'paginas': [{'numero': 1, 'texto': texto}]}, f)
+    manifiesto.catalogar(f'https://www.sii.cl/normativa/res{año}/reso{numero}.pdf', sha256, tipo='resoluciones',
+                         año=año, numero=str(numero), ruta_vista=ruta_pdf)
+    manifiesto.registrar_extraccion(sha256, ruta_pdf, ruta_texto, 1, len(texto), 'pdfplumber')
+
+
+def test_construir_y_consultar(en_tmp):
+    manifiesto = Manifiesto()
+    publicar(manifiesto, 12, 2019, 'Imparte instrucciones sobre el artículo 21 de la Ley sobre Impuesto a la Renta.')
+    publicar(manifiesto, 30, 2021, 'SE RESUELVE: Déjase sin efecto la Resolución Ex. SII N° 12, de 2019.')
+    publicar(manifiesto, 40, 2022, 'RESUELVO: Modifícase la Resolución Ex. SII N° 30, de 2021.')
+    grafo = GrafoCitas()
+
+    assert grafo.construir(manifiesto)['reconstruido']
+    assert not grafo.construir(manifiesto)['reconstruido']
+
+    assert grafo.citantes(parsear_referencia('Art. 21 LIR')) == ['Resolución 12/2019']
+    assert 'DL 824 art. 21' in grafo.citados_por('Resolución 12/2019', CITA)
+    assert grafo.citados_por('Resolución 40/2022', MODIFICA) == ['Resolución 30/2021']
+    assert not grafo.vigente('Resolución 12/2019') and grafo.vigente('Resolución 30/2021')
+    assert grafo.reemplazado_por('Resolución 12/2019') == ['Resolución 30/2021', 'Resolución 40/2022']
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from indice_texto import IndiceTexto, analizar, crear_servidor
+from manifiesto import Manifiesto
+
+
+def extraer(manifiesto, ruta_pdf, textos, extractor='pdfplumber'):
+    """Extracción simulada: JSON de páginas en data/textos y su registro en el manifiesto"""
+    sha256 = ruta_pdf.replace('/', '_').ljust(64, '0')[:64]
+    ruta_texto = os.path.join('data', 'textos', f'{sha256}.json')
+    os.makedirs(os.path.dirname(ruta_texto), exist_ok=True)
+    paginas = [{'numero': i, 'texto': texto, 'caracteres': len(texto)} for i, texto in enumerate(textos, 1)]
+    with open(ruta_texto, 'w', encoding='utf-8') as f:
+        json.dump({'sha256': sha256, 'ruta_pdf': ruta_pdf, 'extractor': extractor, 'paginas': paginas}, f)
+    manifiesto.registrar_extraccion(sha256, ruta_pdf, ruta_texto, len(paginas), sum(map(len, textos)), extractor)
+    return sha256
+
+
+@pytest.fixture
+def manifiesto(en_tmp):
+    return Manifiesto()
+
+
+@pytest.fixture
+def indice(manifiesto):
+    return IndiceTexto()
+
+
+def test_analizar_pliega_acentos_y_raices():
+    assert analizar('Declaración de IMPUESTOS') == analizar('declaracion impuesto')
+    assert analizar('de la y en') == []
+
+
+def test_construir_y_buscar_con_filtros(indice, manifiesto):
+    extraer(manifiesto, 'resoluciones/2023/reso10.pdf', ['Facturación electrónica de exportación'])
+    extraer(manifiesto, 'circulares/2024/circu5.pdf', ['Impuesto a la renta', 'Facturas electrónicas'])
+
+    assert indice.construir(manifiesto)['agregados'] == 2
+    assert indice.construir(manifiesto)['agregados'] == 0
+
+    resultados = indice.buscar('factura electronica')
+    assert {(r['ruta'], r['pagina']) for r in resultados} == {('resoluciones/2023/reso10.pdf', 1),
+                                                              ('circulares/2024/circu5.pdf', 2)}
+    assert [r['año'] for r in indice.buscar('factura', tipo='resoluciones')] == [2023]
+    assert [r['tipo'] for r in indice.buscar('factura', año=2024)] == ['circulares']
+    assert 'Impuesto' in indice.buscar('impuestos')[0]['fragmento']
+    assert indice.buscar('de la') == []
+
+
+def test_reextraccion_reemplaza_el_texto_indexado(indice, manifiesto):
+    # Primera extracción sin texto (página escaneada); luego OCR o --forzar la reemplazan
+    ruta = 'resoluciones/2024/reso7.pdf'
+    extraer(manifiesto, ruta, [''])
+    indice.construir(manifiesto)
+    assert indice.buscar('timbraje') == []
+
+    time.sleep(0.01)
+    extraer(manifiesto, ruta, ['Timbraje de documentos tributarios'], extractor='pdfplumber+tesseract')
+    resultados = indice.construir(manifiesto)
+    assert (resultados['agregados'], resultados['total']) == (1, 1)
+    assert [r['ruta'] for r in indice.buscar('timbraje')] == [ruta]
+
+
+def test_extraccion_eliminada_sale_del_indice(indice, manifiesto):
+    sha256 = extraer(manifiesto, 'resoluciones/2024/reso8.pdf', ['Boleta de honorarios'])
+    indice.construir(manifiesto)
+    manifiesto.conexion.execute('DELETE FROM extracciones WHERE sha256 = ?', (sha256,))
+    manifiesto.conexion.commit()
+
+    assert indice.construir(manifiesto)['eliminados'] == 1
+    assert indice.buscar('honorarios') == []
+
+
+@pytest.fixture
+def endpoint(indice, manifiesto):
+    extraer(manifiesto, 'resoluciones/2023/reso10.pdf', ['Facturación electrónica de exportación'])
+    indice.construir(manifiesto)
+    servidor = crear_servidor(indice, 0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/buscar"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_endpoint_busca(endpoint):
+    response = requests.get(endpoint, params={'q': 'facturas', 'n': '5', 'año': '2023'}, timeout=5)
+    assert response.status_code == 200
+    assert [r['ruta'] for r in response.json()['resultados']] == ['resoluciones/2023/reso10.pdf']
+
+
+@pytest.mark.parametrize('limite', ['abc', '-1', '0'])
+def test_endpoint_rechaza_un_limite_invalido(endpoint, limite):
+    response = requests.get(endpoint, params={'q': 'factura', 'n': limite}, timeout=5)
+    assert response.status_code == 400
+    assert 'error' in response.json()
@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+import types
+
+from indice_vectorial import EmbebedorHashing, IndiceVectorial, crear_embebedor
+from manifiesto import Manifiesto
+
+
+def registrar(manifiesto, sha256, texto, extractor='pdfplumber'):
+    ruta_pdf = os.path.join('leyes', f'{sha256}.pdf')
+    ruta_texto = os.path.join('data', 'textos', f'{sha256}.json')
+    os.makedirs(os.path.dirname(ruta_texto), exist_ok=True)
+    paginas = [{'numero': 1, 'texto': texto, 'caracteres': len(texto)}]
+    with open(ruta_texto, 'w', encoding='utf-8') as f:
+        json.dump({'sha256': sha256, 'ruta_pdf': ruta_pdf, 'extractor': extractor, 'paginas': paginas}, f)
+    manifiesto.registrar_extraccion(sha256, ruta_pdf, ruta_texto, 1, len(texto), extractor)
+
+
+def test_reconstruye_cuando_se_vuelve_a_extraer_el_mismo_pdf(en_tmp):
+    manifiesto = Manifiesto()
+    indice = IndiceVectorial()
+    registrar(manifiesto, 'a' * 64, 'Artículo 1 El impuesto al valor agregado grava las ventas.')
+    registrar(manifiesto, 'b' * 64, '')
+
+    assert indice.construir(manifiesto, modelo='hashing')['reconstruido']
+    assert not indice.construir(manifiesto, modelo='hashing')['reconstruido']
+
+    # El OCR rellena el documento escaneado: mismo sha256, texto nuevo
+    registrar(manifiesto, 'b' * 64, 'Artículo 2 La retención del impuesto en servicios digitales.',
+              extractor='pdfplumber+tesseract')
+    assert indice.construir(manifiesto, modelo='hashing')['reconstruido']
+    assert indice.buscar('retención servicios digitales', k=1)[0]['sha256'] == 'b' * 64
+
+
+def test_sin_sentence_transformers_el_respaldo_es_hashing():
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        assert isinstance(crear_embebedor(), EmbebedorHashing)
+    assert isinstance(crear_embebedor('hashing'), EmbebedorHashing)
+
+
+def test_modelo_sin_red_ni_cache_cae_a_hashing(monkeypatch):
+    # sentence-transformers instalado pero el modelo no se puede descargar
+    def sin_red(modelo, device=None):
+        raise OSError(f"We couldn't connect to 'https://huggingface.co' to load {modelo}")
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', types.SimpleNamespace(SentenceTransformer=sin_red))
+
+    assert isinstance(crear_embebedor(), EmbebedorHashing)
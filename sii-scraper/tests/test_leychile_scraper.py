@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from leychile_scraper import LeyChileScraper, articulos_de_xml
+
+
+def norma_xml(articulos, fecha='2024-01-01'):
+    """XML de LeyChile (obtxml opt=7) con un EstructuraFuncional por artículo: {idParte: texto}"""
+    partes = ''.join(
+        f'<EstructuraFuncional idParte="{id_parte}" tipoParte="Artículo" fechaVersion="{fecha}">'
+        f'<Texto>{texto}</Texto><Metadatos><NombreParte>{id_parte}</NombreParte></Metadatos>'
+        f'</EstructuraFuncional>'
+        for id_parte, texto in articulos.items())
+    return (f'<?xml version="1.0" encoding="utf-8"?><Norma fechaVersion="{fecha}">'
+            f'<EstructuraFuncionales>{partes}</EstructuraFuncionales></Norma>').encode('utf-8')
+
+
+class RespuestaSimulada:
+    def __init__(self, contenido):
+        self.content = contenido
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def scraper(en_tmp):
+    scraper = LeyChileScraper(solicitudes_por_segundo=0)
+    scraper.leyes_tributarias = {'DL_825_IVA': {'id': '2934', 'nombre': 'Decreto Ley 825 - Ley de IVA'}}
+    scraper.xml = norma_xml({'1': 'Artículo 1 Establécese un impuesto.', '2': 'Artículo 2 Tasa de 18%.',
+                             '3': 'Artículo 3 Exenciones.'})
+    scraper.obtener = lambda url, **kwargs: RespuestaSimulada(scraper.xml)
+    return scraper
+
+
+def test_articulos_de_xml():
+    norma = articulos_de_xml(norma_xml({'1': 'Artículo 1\n  Establécese   un impuesto.'}, fecha='2023-05-02'))
+    articulo, = norma['articulos']
+    assert norma['fecha_version'] == '2023-05-02'
+    assert (articulo['id_parte'], articulo['articulo'], articulo['derogado']) == ('1', '1', False)
+    assert articulo['texto'] == 'Artículo 1\nEstablécese un impuesto.'
+
+
+def test_sincronizar_ley_detecta_cambios_por_articulo(scraper):
+    ley = scraper.leyes_tributarias['DL_825_IVA']
+    inicial = scraper.sincronizar_ley(ley)
+    assert (inicial['estado'], inicial['nuevos'], inicial['cambios']) == ('inicial', 3, [])
+
+    igual = scraper.sincronizar_ley(ley)
+    assert (igual['estado'], igual['sin_cambios']) == ('sin_cambios', 3)
+
+    scraper.xml = norma_xml({'1': 'Artículo 1 Establécese un impuesto.', '2': 'Artículo 2 Tasa de 19%.',
+                             '4': 'Artículo 4 Crédito fiscal.'})
+    resumen = scraper.sincronizar_ley(ley)
+    assert resumen['estado'] == 'actualizada'
+    assert {clave: resumen[clave] for clave in ('nuevos', 'modificados', 'eliminados', 'sin_cambios')} == \
+        {'nuevos': 1, 'modificados': 1, 'eliminados': 1, 'sin_cambios': 1}
+    cambios = {c['articulo']: c for c in resumen['cambios']}
+    assert cambios['2']['tipo'] == 'modificado'
+    assert '-Artículo 2 Tasa de 18%.' in cambios['2']['diff'] and '+Artículo 2 Tasa de 19%.' in cambios['2']['diff']
+    assert cambios['3']['tipo'] == 'eliminado' and cambios['4']['tipo'] == 'nuevo'
+
+    assert scraper.sincronizar_ley(ley)['estado'] == 'sin_cambios'
+
+
+def test_sincronizar_todas_escribe_los_cambios_en_jsonl(scraper):
+    primera = scraper.sincronizar_todas_las_leyes()
+    assert primera['exitosas'] == 1 and 'cambios' not in primera
+
+    scraper.xml = norma_xml({'1': 'Artículo 1 Establécese un impuesto.', '2': 'Artículo 2 Tasa de 19%.',
+                             '3': 'Artículo 3 Exenciones.'})
+    resultados = scraper.sincronizar_todas_las_leyes()
+    assert resultados['articulos'] == {'nuevos': 0, 'modificados': 1, 'eliminados': 0, 'sin_cambios': 2}
+    with open(resultados['cambios'], encoding='utf-8') as f:
+        lineas = [json.loads(linea) for linea in f]
+    assert os.path.dirname(resultados['cambios']) == os.path.join('data', 'cambios_leyes')
+    assert [(c['id_norma'], c['tipo'], c['articulo']) for c in lineas] == [('2934', 'modificado', '2')]
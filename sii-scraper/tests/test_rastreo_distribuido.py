@@ -0,0 +1,35 @@
+from frontera import FronteraRastreo
+from limitador import LimitadorPorHost
+from rastreo_distribuido import trabajar
+
+
+class ScraperSimulado:
+    """Registra la tasa del limitador con que se descargó cada documento"""
+
+    def __init__(self):
+        self.max_workers = 2
+        self.limitador = LimitadorPorHost(solicitudes_por_segundo=4)
+        self.tasas = []
+
+    def descargar_documento(self, documento, carpeta_destino, tipo_documento):
+        self.tasas.append(self.limitador.solicitudes_por_segundo)
+        return True
+
+    def registrar_documento(self, exito, segundos):
+        pass
+
+
+def test_el_presupuesto_se_reparte_entre_las_maquinas(en_tmp):
+    cola = str(en_tmp / 'data' / 'cola_distribuida.db')
+    frontera = FronteraRastreo(cola, modo_diario='DELETE')
+    frontera.registrar_indice('resoluciones', 2021, 'https://www.sii.cl/normativa/res2021/',
+                              [{'url': f'https://www.sii.cl/res{i}.pdf', 'texto': f'Resolución {i}'} for i in range(5)])
+    # Un trabajador de otra máquina sobre el mismo volumen
+    otra_maquina = FronteraRastreo(cola, modo_diario='DELETE')
+    otra_maquina.latido('otra-maquina-1', 60)
+
+    scraper = ScraperSimulado()
+    assert trabajar(frontera, scraper, 'esta-maquina-1', presupuesto=4) == (5, 0)
+    assert scraper.tasas == [2.0] * 5
+    # Al terminar se retira y su parte vuelve al otro
+    assert otra_maquina.trabajadores_activos() == 1
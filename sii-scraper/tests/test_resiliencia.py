@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import resiliencia
+from limitador import LimitadorPorHost
+from resiliencia import CircuitBreaker, PoliticaReintentos, SesionResiliente
+
+
+@pytest.fixture
+def servidor_inestable():
+    """Responde 503 a las dos primeras solicitudes y 200 después"""
+    solicitudes = []
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            solicitudes.append(self.path)
+            estado = 503 if len(solicitudes) <= 2 else 200
+            self.send_response(estado)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}", solicitudes
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_cada_reintento_toma_ficha_y_espera_sin_ocupar_la_conexion(servidor_inestable, monkeypatch):
+    url, solicitudes = servidor_inestable
+    limitador = LimitadorPorHost(solicitudes_por_segundo=1000, max_conexiones_por_host=1)
+    fichas = []
+    esperar = limitador.esperar
+    monkeypatch.setattr(limitador, 'esperar', lambda u: (fichas.append(u), esperar(u)))
+
+    libre_en_esperas = []
+
+    def dormir(segundos):
+        # Durante el backoff otro worker debe poder tomar la única conexión del host
+        semaforo = limitador._semaforo(url.split('//')[1])
+        libre = semaforo.acquire(blocking=False)
+        if libre:
+            semaforo.release()
+        libre_en_esperas.append(libre)
+    monkeypatch.setattr(resiliencia.time, 'sleep', dormir)
+
+    sesion = SesionResiliente(timeout=5, reintentos=PoliticaReintentos(reintentos_maximos=3), limitador=limitador)
+    with sesion.get(f"{url}/documento.pdf", stream=True) as response:
+        assert response.status_code == 200
+        assert not limitador._semaforo(url.split('//')[1]).acquire(blocking=False)
+    assert limitador._semaforo(url.split('//')[1]).acquire(blocking=False)
+
+    assert len(solicitudes) == 3
+    assert len(fichas) == 3
+    assert libre_en_esperas == [True, True]
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba():
+    circuito = CircuitBreaker(umbral_fallos=1, pausa=0.05, max_aperturas=5)
+    circuito.registrar_fallo('sii.cl')
+    pasaron = []
+
+    def solicitar(numero):
+        circuito.antes_de_solicitar('sii.cl')
+        pasaron.append(numero)
+
+    hilos = [threading.Thread(target=solicitar, args=(i,)) for i in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.3)
+    assert len(pasaron) == 1
+
+    # La prueba responde bien: el circuito se cierra y pasan los demás
+    circuito.registrar_exito('sii.cl')
+    for hilo in hilos:
+        hilo.join(timeout=2)
+    assert len(pasaron) == 5
+
+
+def test_si_la_prueba_falla_el_circuito_se_reabre():
+    circuito = CircuitBreaker(umbral_fallos=3, pausa=0.05, max_aperturas=5)
+    for _ in range(3):
+        circuito.registrar_fallo('sii.cl')
+    circuito.antes_de_solicitar('sii.cl')
+
+    # Un solo fallo de la prueba basta para volver a abrir, con el doble de pausa
+    circuito.registrar_fallo('sii.cl')
+    estado = circuito.estado['sii.cl']
+    assert estado['aperturas'] == 2 and not estado['sondeando']
+    assert estado['abierto_hasta'] - time.monotonic() > 0.05
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from servidor_simulado import ServidorSimulado
+from sii_scraper import SIIScraper
+from test_verificacion import pdf_minimo
+
+
+@pytest.fixture
+def scraper(en_tmp):
+    corpus = en_tmp / 'corpus'
+    carpeta = corpus / 'resoluciones' / '2024'
+    carpeta.mkdir(parents=True)
+    (carpeta / 'reso1.pdf').write_bytes(pdf_minimo(b'Resolucion 1'))
+    servidor = ServidorSimulado(str(corpus))
+    url = servidor.iniciar()
+
+    scraper = SIIScraper(solicitudes_por_segundo=0)
+    scraper.base_url = url
+    scraper.dominios = ('127.0.0.1',)
+    scraper.urls_base = {tipo: base.replace('https://www.sii.cl', url) for tipo, base in scraper.urls_base.items()}
+    yield scraper
+    servidor.detener()
+
+
+def test_archivo_truncado_se_descarga_de_nuevo(scraper):
+    enlace = {'url': scraper.url_indice('resoluciones', 2024).rsplit('/', 1)[0] + '/reso1.pdf',
+              'texto': 'Resolución Ex. SII N° 1'}
+    os.makedirs('resoluciones/2024')
+    assert scraper.descargar_documento(enlace, 'resoluciones/2024', 'resolucion')
+    entrada = scraper.manifiesto.obtener(enlace['url'])
+    vista = entrada['ruta_local']
+    with open(vista, 'rb') as f:
+        contenido = f.read()
+
+    # Una copia a medias en la vista (el blob es de solo lectura y queda intacto)
+    os.remove(vista)
+    with open(vista, 'wb') as f:
+        f.write(contenido[:10])
+
+    assert scraper.descargar_documento(enlace, 'resoluciones/2024', 'resolucion')
+    with open(vista, 'rb') as f:
+        assert f.read() == contenido
+    nueva = scraper.manifiesto.obtener(enlace['url'])
+    assert (nueva['sha256'], nueva['bytes']) == (entrada['sha256'], entrada['bytes'])
+    assert scraper.manifiesto.catalogo(enlace['url'])['sha256'] == entrada['sha256']
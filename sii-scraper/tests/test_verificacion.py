@@ -0,0 +1,130 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from almacen import AlmacenContenido
+from manifiesto import Manifiesto
+from nucleo_scraper import ScraperBase
+from servidor_simulado import ServidorSimulado
+import verificacion
+from verificacion import VerificadorIntegridad, revisar_archivo, revisar_contenido
+
+
+def pdf_minimo(texto=b'Resolucion'):
+    """PDF con una tabla de referencias real: startxref apunta a 'xref'"""
+    cabecera = b'%PDF-1.4\n'
+    objeto = b'1 0 obj\n<< /Type /Catalog /Titulo (' + texto + b') >>\nendobj\n'
+    xref = len(cabecera) + len(objeto)
+    return (cabecera + objeto + b'xref\n0 2\n0000000000 65535 f \n0000000009 00000 n \n'
+            b'trailer\n<< /Root 1 0 R /Size 2 >>\nstartxref\n' + str(xref).encode() + b'\n%%EOF\n')
+
+
+def zip_minimo():
+    memoria = io.BytesIO()
+    with zipfile.ZipFile(memoria, 'w') as archivo:
+        archivo.writestr('EnvioDTE_v10.xsd', b'<?xml version="1.0"?><xs:schema/>')
+    return memoria.getvalue()
+
+
+@pytest.mark.parametrize('contenido, extension, estado', [
+    (pdf_minimo(), '.pdf', verificacion.CORRECTO),
+    (b'', '.pdf', verificacion.VACIO),
+    (b'<!DOCTYPE html><html><body>Error 500</body></html>', '.pdf', verificacion.HTML),
+    (pdf_minimo()[:60], '.pdf', verificacion.TRUNCADO),
+    (pdf_minimo().replace(b'startxref\n', b'startxref\n1'), '.pdf', verificacion.XREF_INVALIDO),
+    (b'GIF89a' + b'\0' * 100, '.pdf', verificacion.NO_ES_PDF),
+    (zip_minimo(), '.zip', verificacion.CORRECTO),
+    (zip_minimo()[:30], '.zip', verificacion.TRUNCADO),
+    (b'<?xml version="1.0"?><EnvioDTE/>', '.xml', verificacion.CORRECTO),
+    (b'Folio;Monto', '.xml', verificacion.NO_ES_XML),
+    # El formato sale de la firma, no del nombre: un ZIP o un XML guardado como .pdf está sano
+    (zip_minimo(), '.pdf', verificacion.CORRECTO),
+    (b'<?xml version="1.0"?><xs:schema/>', '.pdf', verificacion.CORRECTO),
+])
+def test_revisar_archivo_clasifica(tmp_path, contenido, extension, estado):
+    ruta = tmp_path / f'documento{extension}'
+    ruta.write_bytes(contenido)
+    assert revisar_archivo(str(ruta)) == estado
+
+
+def test_revisar_contenido_tamaño_y_hash():
+    import hashlib
+    contenido = pdf_minimo()
+    sha256 = hashlib.sha256(contenido).hexdigest()
+    assert revisar_contenido(contenido, '.pdf', sha256, len(contenido)) == verificacion.CORRECTO
+    assert revisar_contenido(contenido, '.pdf', sha256, len(contenido) + 1) == verificacion.TAMAÑO_DISTINTO
+    assert revisar_contenido(contenido, '.pdf', '0' * 64) == verificacion.HASH_DISTINTO
+    assert revisar_archivo('/no/existe.pdf') == verificacion.AUSENTE
+
+
+class FuenteLocal(ScraperBase):
+    nombre = 'prueba'
+    dominios = ('127.0.0.1',)
+
+
+@pytest.fixture
+def corpus_servido(tmp_path_factory):
+    corpus = tmp_path_factory.mktemp('corpus')
+    carpeta = corpus / 'resoluciones' / '2024'
+    carpeta.mkdir(parents=True)
+    servidor = ServidorSimulado(str(corpus))
+    url = servidor.iniciar()
+    yield carpeta, f"{url}/normativa_legislacion/resoluciones/2024"
+    servidor.detener()
+
+
+def publicar(almacen, url, ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    sha256 = almacen.importar(ruta)
+    almacen.registrar(url, sha256, ruta)
+    almacen.manifiesto.registrar(url, sha256=sha256, bytes=len(contenido), ruta_local=ruta)
+    return sha256
+
+
+def test_verificar_no_encola_zip_con_nombre_pdf(en_tmp):
+    manifiesto = Manifiesto()
+    publicar(AlmacenContenido(manifiesto), 'https://www.sii.cl/schemas/dte.zip', 'schemas/schema_dte.pdf',
+             zip_minimo())
+    resultados = VerificadorIntegridad(manifiesto, max_workers=2).verificar()
+    assert resultados['dañados'] == [] and manifiesto.reparaciones() == []
+
+
+def test_reparar_reemplaza_solo_con_descarga_valida(en_tmp, corpus_servido):
+    carpeta_servida, url_base = corpus_servido
+    original = pdf_minimo(b'Resolucion 1')
+    (carpeta_servida / 'reso1.pdf').write_bytes(original)
+    # El servidor responde una página de error con el nombre del segundo documento
+    (carpeta_servida / 'reso2.pdf').write_bytes(b'<html><body>Mantencion</body></html>')
+
+    manifiesto = Manifiesto()
+    almacen = AlmacenContenido(manifiesto)
+    publicar(almacen, f"{url_base}/reso1.pdf", 'resoluciones/2024/reso1.pdf', original)
+    publicar(almacen, f"{url_base}/reso2.pdf", 'resoluciones/2024/reso2.pdf', pdf_minimo(b'Resolucion 2'))
+
+    # La vista es un hardlink al blob: truncarla daña los dos
+    for ruta in ('resoluciones/2024/reso1.pdf', 'resoluciones/2024/reso2.pdf'):
+        os.chmod(ruta, 0o644)
+        with open(ruta, 'r+b') as f:
+            f.truncate(40)
+    dañada = open('resoluciones/2024/reso2.pdf', 'rb').read()
+
+    resultados = VerificadorIntegridad(manifiesto, max_workers=2).verificar()
+    assert sorted(d['estado'] for d in resultados['dañados']) == [verificacion.TRUNCADO] * 2
+    assert len(manifiesto.reparaciones()) == 2
+
+    fuente = FuenteLocal(manifiesto=manifiesto, almacen=almacen, solicitudes_por_segundo=0)
+    assert fuente.reparar_pendientes() == (1, 1)
+
+    with open('resoluciones/2024/reso1.pdf', 'rb') as f:
+        assert f.read() == original
+    # La descarga inválida no reemplaza ni borra la vista
+    with open('resoluciones/2024/reso2.pdf', 'rb') as f:
+        assert f.read() == dañada
+    pendientes = manifiesto.reparaciones()
+    assert [p['ruta'] for p in pendientes] == ['resoluciones/2024/reso2.pdf']
+    assert pendientes[0]['intentos'] == 1 and 'pagina_html' in pendientes[0]['ultimo_error']
+    assert os.listdir(almacen.carpeta_entrantes) == []
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Verificación de integridad del corpus descargado y cola de reparación
+Revisa en paralelo (hilos + mmap) que cada archivo no esté vacío, que su formato corresponda a su extensión
+(PDF con encabezado, startxref y %%EOF; ZIP con directorio central; XML que no sea una página de error) y que
+su sha256 coincida con el registrado. Los dañados quedan en la tabla `reparaciones` del manifiesto, que los
+scrapers consumen para volver a descargar solo esos archivos
+"""
+
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from manifiesto import RUTA_MANIFIESTO, Manifiesto
+
+CARPETAS_VISTA = ('resoluciones', 'circulares', 'oficios', 'schemas', 'leyes')
+
+# Estados de un archivo
+CORRECTO = 'correcto'
+VACIO = 'vacio'
+AUSENTE = 'ausente'
+HTML = 'pagina_html'
+NO_ES_PDF = 'no_es_pdf'
+TRUNCADO = 'truncado'
+XREF_INVALIDO = 'xref_invalido'
+NO_ES_ZIP = 'no_es_zip'
+NO_ES_XML = 'no_es_xml'
+TAMAÑO_DISTINTO = 'tamaño_distinto'
+HASH_DISTINTO = 'hash_distinto'
+PAQUETE_DAÑADO = 'paquete_dañado'
+
+# El encabezado %PDF- puede venir tras algunos bytes; %%EOF y startxref van en la cola del archivo
+CABECERA = 1024
+COLA = 2048
+STARTXREF = re.compile(rb'startxref\s+(\d+)')
+OBJETO = re.compile(rb'\s*(?:xref|\d+\s+\d+\s+obj)')
+PAGINA_HTML = re.compile(rb'^\s*(?:<!doctype\s+html|<html|<head|<body)', re.IGNORECASE)
+FIRMA_ZIP = b'PK\x03\x04'
+FIN_ZIP = b'PK\x05\x06'
+
+
+def revisar_pdf(contenido):
+    tamaño = len(contenido)
+    if contenido.find(b'%PDF-', 0, CABECERA) < 0:
+        return NO_ES_PDF
+    cola = contenido[max(0, tamaño - COLA):]
+    if b'%%EOF' not in cola:
+        return TRUNCADO
+    # La última tabla de referencias (o stream xref) debe estar donde dice startxref
+    referencias = list(STARTXREF.finditer(cola))
+    if not referencias:
+        return XREF_INVALIDO
+    offset = int(referencias[-1].group(1))
+    if offset >= tamaño or not OBJETO.match(contenido[offset:offset + 64]):
+        return XREF_INVALIDO
+    return CORRECTO
+
+
+def revisar_zip(contenido):
+    if contenido[:4] != FIRMA_ZIP:
+        return NO_ES_ZIP
+    # El registro de fin del directorio central está en los últimos 22 bytes + comentario (hasta 64 KiB)
+    if contenido.rfind(FIN_ZIP, max(0, len(contenido) - 65557)) < 0:
+        return TRUNCADO
+    return CORRECTO
+
+
+def revisar_xml(contenido):
+    inicio = contenido[:CABECERA].lstrip(b'\xef\xbb\xbf \t\r\n')
+    return CORRECTO if inicio.startswith(b'<') else NO_ES_XML
+
+
+REVISIONES = {'.pdf': revisar_pdf, '.zip': revisar_zip, '.xml': revisar_xml, '.xsd': revisar_xml}
+
+
+def detectar_formato(contenido):
+    """Extensión que corresponde a la firma del contenido, o None si no se reconoce"""
+    if contenido[:4] == FIRMA_ZIP:
+        return '.zip'
+    if contenido.find(b'%PDF-', 0, CABECERA) >= 0:
+        return '.pdf'
+    if contenido[:CABECERA].lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<?xml'):
+        return '.xml'
+    return None
+
+
+def revisar_contenido(contenido, extension, sha256=None, tamaño=None):
+    """Estado de un contenido (mmap o bytes) según su formato, tamaño y hash esperados
+
+    El formato sale de la firma del contenido; la extensión solo decide cuando la firma no se reconoce
+    (p. ej. un PDF sin encabezado), porque el nombre de la vista no siempre es el del formato
+    """
+    if not len(contenido):
+        return VACIO
+    # Página de error del servidor guardada con el nombre del documento
+    if extension != '.html' and PAGINA_HTML.match(contenido[:CABECERA]):
+        return HTML
+    revision = REVISIONES.get(detectar_formato(contenido) or extension)
+    if revision is not None:
+        estado = revision(contenido)
+        if estado != CORRECTO:
+            return estado
+    if tamaño is not None and len(contenido) != tamaño:
+        return TAMAÑO_DISTINTO
+    if sha256 and hashlib.sha256(contenido).hexdigest() != sha256:
+        return HASH_DISTINTO
+    return CORRECTO
+
+
+def revisar_archivo(ruta, sha256=None, tamaño=None, extension=None):
+    """Estado de un archivo en disco, leído por mmap (hashlib libera el GIL sobre el mapa)
+
+    Los blobs y temporales no tienen la extensión del documento: se puede indicar la de su vista
+    """
+    if extension is None:
+        extension = os.path.splitext(ruta)[1].lower()
+    try:
+        with open(ruta, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return VACIO
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                return revisar_contenido(mapa, extension, sha256, tamaño)
+    except FileNotFoundError:
+        return AUSENTE
+
+
+class VerificadorIntegridad:
+    def __init__(self, manifiesto=None, max_workers=None, carpetas=CARPETAS_VISTA):
+        self.manifiesto = manifiesto if manifiesto is not None else Manifiesto()
+        # Lectura de disco y hash: con hilos basta, hashlib y mmap no retienen el GIL
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.carpetas = carpetas
+        self._archivo = None
+
+    def _archivo_frio(self):
+        if self._archivo is None:
+            from archivo_frio import ArchivoFrio
+            self._archivo = ArchivoFrio(self.manifiesto)
+        return self._archivo
+
+    def objetivos(self):
+        """Archivos a revisar: los del manifiesto (con URL, reparables) y los sueltos de las vistas"""
+        objetivos = {}
+        for entrada in self.manifiesto.entradas():
+            if entrada['ruta_local']:
+                objetivos[os.path.normpath(entrada['ruta_local'])] = {
+                    'url': entrada['url'], 'ruta': entrada['ruta_local'], 'sha256': entrada['sha256'],
+                    'bytes': entrada['bytes']}
+        for entrada in self.manifiesto.catalogados():
+            if entrada['ruta_vista'] and os.path.normpath(entrada['ruta_vista']) not in objetivos:
+                objetivos[os.path.normpath(entrada['ruta_vista'])] = {
+                    'url': entrada['url'], 'ruta': entrada['ruta_vista'], 'sha256': entrada['sha256'],
+                    'bytes': None}
+        # Archivos anteriores al manifiesto: solo se revisa el formato, no hay URL para repararlos
+        for carpeta in self.carpetas:
+            for raiz, _, archivos in os.walk(carpeta):
+                for archivo in archivos:
+                    ruta = os.path.join(raiz, archivo)
+                    if not archivo.startswith('.') and os.path.normpath(ruta) not in objetivos:
+                        objetivos[os.path.normpath(ruta)] = {'url': None, 'ruta': ruta, 'sha256': None,
+                                                             'bytes': None}
+        return list(objetivos.values())
+
+    def revisar(self, objetivo):
+        """(estado, origen, bytes leídos) de un objetivo; los documentos archivados se revisan desde su paquete"""
+        estado = revisar_archivo(objetivo['ruta'], objetivo['sha256'], objetivo['bytes'])
+        if estado != AUSENTE or not objetivo['sha256'] or not self.manifiesto.paquete_de(objetivo['sha256']):
+            leidos = os.path.getsize(objetivo['ruta']) if estado != AUSENTE else 0
+            return estado, 'archivo', leidos
+        try:
+            contenido = self._archivo_frio().leer(objetivo['sha256'])
+        except Exception as e:
+            logging.error(f"Error leyendo {objetivo['sha256']} del archivo frío: {str(e)}")
+            return PAQUETE_DAÑADO, 'paquete', 0
+        extension = os.path.splitext(objetivo['ruta'])[1].lower()
+        estado = revisar_contenido(contenido, extension, objetivo['sha256'], objetivo['bytes'])
+        return estado, 'paquete', len(contenido)
+
+    def verificar(self, encolar=True):
+        """Revisa todo el corpus; los dañados con URL quedan en la cola de reparación"""
+        inicio = time.perf_counter()
+        objetivos = self.objetivos()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            estados = list(executor.map(self.revisar, objetivos))
+
+        resultados = {'archivos': len(objetivos), 'correctos': 0, 'dañados': [], 'encolados': 0,
+                      'bytes': 0, 'workers': self.max_workers}
+        for objetivo, (estado, origen, leidos) in zip(objetivos, estados):
+            resultados['bytes'] += leidos
+            if estado == CORRECTO:
+                resultados['correctos'] += 1
+                continue
+            resultados['dañados'].append(dict(objetivo, estado=estado, origen=origen))
+            if encolar and objetivo['url']:
+                self.manifiesto.encolar_reparacion(objetivo['url'], objetivo['ruta'], estado)
+                resultados['encolados'] += 1
+
+        segundos = time.perf_counter() - inicio
+        resultados['segundos'] = round(segundos, 2)
+        if segundos:
+            resultados['mib_por_segundo'] = round(resultados['bytes'] / 1024 / 1024 / segundos, 1)
+        logging.info(f"Verificación: {resultados['correctos']}/{resultados['archivos']} correctos, "
+                     f"{len(resultados['dañados'])} dañados, {resultados['encolados']} encolados")
+        return resultados
+
+
+def main(argv=None, prog=None):
+    """Función principal (`argv` y `prog` los pasa cli.py)"""
+    parser = argparse.ArgumentParser(prog=prog, description="Verificación de integridad del corpus descargado")
+    parser.add_argument('--manifiesto', default=RUTA_MANIFIESTO,
+                        help="Manifiesto SQLite (por defecto: data/manifiesto.db)")
+    parser.add_argument('--workers', type=int, help="Hilos de lectura (por defecto: 4 por núcleo, hasta 32)")
+    parser.add_argument('--sin-encolar', action='store_true', help="Solo informar, sin llenar la cola de reparación")
+    parser.add_argument('--reparar', action='store_true',
+                        help="Volver a descargar de inmediato los archivos de la cola (requiere red)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    manifiesto = Manifiesto(args.manifiesto)
+    resultados = VerificadorIntegridad(manifiesto, args.workers).verificar(encolar=not args.sin_encolar)
+
+    for dañado in resultados['dañados']:
+        origen = ' (archivo frío)' if dañado['origen'] == 'paquete' else ''
+        reparable = '' if dañado['url'] else '  ⚠️  sin URL en el manifiesto'
+        print(f"❌ {dañado['ruta']}: {dañado['estado']}{origen}{reparable}")
+    print(f"\n✅ Correctos: {resultados['correctos']}/{resultados['archivos']}  "
+          f"❌ Dañados: {len(resultados['dañados'])}  🔧 En cola de reparación: {resultados['encolados']}")
+    print(f"⏱️  {resultados['segundos']}s, {resultados.get('mib_por_segundo', 0)} MiB/s con "
+          f"{resultados['workers']} hilos")
+
+    if args.reparar and manifiesto.reparaciones():
+        # Las fuentes (y requests) solo se cargan si hay algo que descargar
+        from leychile_scraper import LeyChileScraper
+        from sii_scraper import SIIScraper
+
+        for scraper in (SIIScraper(manifiesto=manifiesto), LeyChileScraper(manifiesto=manifiesto)):
+            reparados, fallidos = scraper.reparar_pendientes()
+            print(f"🔧 {scraper.nombre}: {reparados} reparados, {fallidos} fallidos")
+    return 1 if resultados['dañados'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())